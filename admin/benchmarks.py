@@ -207,6 +207,25 @@ def test_context_calls():
         ctx.verify_and_update(OTHER, hash)
     return helper
 
+@benchmark.constructor()
+def test_context_calls_cheap():
+    """test CryptContext dispatch overhead using a cheap scheme"""
+    ctx = CryptContext(
+        schemes=["ldap_salted_sha1", "sha256_crypt", "md5_crypt"],
+        default="ldap_salted_sha1",
+        ldap_salted_sha1__salt_size=8,
+        sha256_crypt__min_rounds=5000,
+        deprecated=["md5_crypt"],
+    )
+    hash = ctx.encrypt(SECRET)
+    def helper():
+        ctx.encrypt(SECRET)
+        ctx.verify(SECRET, hash)
+        ctx.verify(OTHER, hash)
+        ctx.needs_update(hash)
+        ctx.verify_and_update(SECRET, hash)
+    return helper
+
 #=============================================================================
 # handler benchmarks
 #=============================================================================
@@ -224,6 +243,27 @@ def test_bcrypt_builtin():
         bcrypt.verify(OTHER, hash)
     return helper
 
+def _bcrypt_engine_helper(module):
+    mod = __import__("passlib.utils._blowfish." + module, fromlist=["BlowfishEngine"])
+    engine_class = mod.BlowfishEngine
+    key_words = engine_class.key_to_words(SECRET.encode("utf-8") + b"\x00")
+    salt_words = engine_class.key_to_words(b"0123456789abcdef")
+    def helper():
+        engine = engine_class()
+        engine.eks_salted_expand(key_words, salt_words[:4])
+        engine.eks_repeated_expand(key_words, salt_words, 16)
+    return helper
+
+@benchmark.constructor()
+def test_bcrypt_engine_base():
+    """test bcrypt 'base' blowfish engine (16 rounds)"""
+    return _bcrypt_engine_helper("base")
+
+@benchmark.constructor()
+def test_bcrypt_engine_unrolled():
+    """test bcrypt 'unrolled' blowfish engine (16 rounds)"""
+    return _bcrypt_engine_helper("unrolled")
+
 @benchmark.constructor()
 def test_bcrypt_ffi():
     "test bcrypt 'bcrypt' backend"
@@ -247,6 +287,116 @@ def test_md5_crypt_builtin():
         md5_crypt.verify(OTHER, hash)
     return helper
 
+# NOTE: the following compare the md5-crypt engines used by the builtin
+#       md5_crypt backend & apr_md5_crypt (the default htpasswd scheme);
+#       each call computes a single hash.
+def _md5_engine_helper(name):
+    from passlib.handlers.md5_crypt import _md5_engines
+    engine = _md5_engines[name]
+    def helper():
+        engine(SECRET, u("saltsalt"), use_apr=True)
+    return helper
+
+@benchmark.constructor()
+def test_md5_engine_reference():
+    """test md5_crypt 'reference' engine"""
+    return _md5_engine_helper("reference")
+
+@benchmark.constructor()
+def test_md5_engine_fast():
+    """test md5_crypt 'fast' engine"""
+    return _md5_engine_helper("fast")
+
+# NOTE: the following compare the sha2-crypt engines used by the builtin
+#       sha256_crypt / sha512_crypt backend, at each hash's default rounds.
+def _sha2_engine_helper(name, use_512):
+    from passlib.handlers.sha2_crypt import _sha2_engines, sha256_crypt, sha512_crypt
+    engine = _sha2_engines[name]
+    rounds = (sha512_crypt if use_512 else sha256_crypt).default_rounds
+    def helper():
+        engine(SECRET, u("saltsaltsaltsalt"), rounds, use_512)
+    return helper
+
+@benchmark.constructor()
+def test_sha256_engine_reference():
+    """test sha256_crypt 'reference' engine"""
+    return _sha2_engine_helper("reference", False)
+
+@benchmark.constructor()
+def test_sha256_engine_fast():
+    """test sha256_crypt 'fast' engine"""
+    return _sha2_engine_helper("fast", False)
+
+@benchmark.constructor()
+def test_sha512_engine_reference():
+    """test sha512_crypt 'reference' engine"""
+    return _sha2_engine_helper("reference", True)
+
+@benchmark.constructor()
+def test_sha512_engine_fast():
+    """test sha512_crypt 'fast' engine"""
+    return _sha2_engine_helper("fast", True)
+
+# NOTE: the following compare the DES engines used by des_crypt & variants.
+#       the bitsliced benchmark encrypts DES_BATCH_SIZE blocks per call,
+#       the others time a single des_crypt-style (25 round) encryption;
+#       since they reuse the same salt, the 'table' engine will be using
+#       salt-specialized tables from the DesCache.
+DES_BATCH_SIZE = 1024
+
+def _des_engine_helper(name):
+    from passlib.utils.des import get_des_engine
+    engine = get_des_engine(name)
+    def helper():
+        engine(0x1234567890abcdef, 0, 1234, 25)
+    return helper
+
+@benchmark.constructor()
+def test_des_engine_reference():
+    """test des_crypt 'reference' DES engine (1 block)"""
+    return _des_engine_helper("reference")
+
+@benchmark.constructor()
+def test_des_engine_table():
+    """test des_crypt 'table' DES engine (1 block)"""
+    return _des_engine_helper("table")
+
+@benchmark.constructor()
+def test_des_engine_table_uncached():
+    """test des_crypt 'table' DES engine w/o salt tables (1 block)"""
+    from passlib.utils import des
+    cache = des.DesCache(max_salts=0)
+    engine = des.get_des_engine("table")
+    def helper():
+        orig = des._des_cache
+        des._des_cache = cache
+        try:
+            engine(0x1234567890abcdef, 0, 1234, 25)
+        finally:
+            des._des_cache = orig
+    return helper
+
+@benchmark.constructor()
+def test_des_engine_bitslice():
+    """test des_crypt bitsliced DES engine (1024 blocks)"""
+    from passlib.utils.des import des_encrypt_int_blocks
+    keys = [0x1234567890abcdef + idx for idx in range(DES_BATCH_SIZE)]
+    salts = [idx & 0xfff for idx in range(DES_BATCH_SIZE)]
+    def helper():
+        des_encrypt_int_blocks(keys, 0, salts, 25)
+    return helper
+
+@benchmark.constructor()
+def test_des_crypt_builtin():
+    """test des_crypt builtin backend"""
+    from passlib.hash import des_crypt
+    des_crypt.set_backend("builtin")
+    def helper():
+        hash = des_crypt.encrypt(SECRET)
+        des_crypt.verify(SECRET, hash)
+        des_crypt.verify(OTHER, hash)
+    return helper
+
 @benchmark.constructor()
 def test_ldap_salted_md5():
     """test ldap_salted_md5"""
@@ -297,6 +447,56 @@ def test_pbkdf2_sha256():
         assert result == 'fadef97054306c93c55213cd57111d6c0791735dcdde8ac32f9f934b49c5af1e', result
     return helper
 
+# NOTE: the following compare the pure-python pbkdf2 backend (which reuses
+#       precomputed hmac digest states) against the generic keyed-prf loop
+#       it replaced. both are timed over PBKDF2_ROUNDS rounds, so dividing
+#       the reported time by that gives the per-round cost.
+PBKDF2_ROUNDS = 1000
+
+def _pbkdf2_builtin_helper(digest, engine):
+    from passlib.utils.pbkdf2 import get_keyed_prf, _pbkdf2_builtin_loop, \
+        _load_pbkdf2_backend_builtin
+    secret, salt = b"abracadabra", b"open sesame"
+    if engine == "backend":
+        backend = _load_pbkdf2_backend_builtin(digest)
+        def helper():
+            backend(secret, salt, PBKDF2_ROUNDS, 20)
+    else:
+        def helper():
+            keyed_prf, digest_size = get_keyed_prf("hmac-" + digest, secret)
+            _pbkdf2_builtin_loop(keyed_prf, digest_size, salt, PBKDF2_ROUNDS, 20)
+    return helper
+
+@benchmark.constructor()
+def test_pbkdf2_builtin_sha1_prf_loop():
+    """test pbkdf2 hmac-sha1 keyed prf loop (1000 rounds)"""
+    return _pbkdf2_builtin_helper("sha1", "prf_loop")
+
+@benchmark.constructor()
+def test_pbkdf2_builtin_sha1_backend():
+    """test pbkdf2 hmac-sha1 builtin backend (1000 rounds)"""
+    return _pbkdf2_builtin_helper("sha1", "backend")
+
+@benchmark.constructor()
+def test_pbkdf2_builtin_sha256_prf_loop():
+    """test pbkdf2 hmac-sha256 keyed prf loop (1000 rounds)"""
+    return _pbkdf2_builtin_helper("sha256", "prf_loop")
+
+@benchmark.constructor()
+def test_pbkdf2_builtin_sha256_backend():
+    """test pbkdf2 hmac-sha256 builtin backend (1000 rounds)"""
+    return _pbkdf2_builtin_helper("sha256", "backend")
+
+@benchmark.constructor()
+def test_pbkdf2_builtin_sha512_prf_loop():
+    """test pbkdf2 hmac-sha512 keyed prf loop (1000 rounds)"""
+    return _pbkdf2_builtin_helper("sha512", "prf_loop")
+
+@benchmark.constructor()
+def test_pbkdf2_builtin_sha512_backend():
+    """test pbkdf2 hmac-sha512 builtin backend (1000 rounds)"""
+    return _pbkdf2_builtin_helper("sha512", "backend")
+
 #=============================================================================
 # entropy estimates
 #=============================================================================
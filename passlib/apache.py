@@ -5,20 +5,32 @@
 #=============================================================================
 from __future__ import with_statement
 # core
+from array import array
+from bisect import bisect_left
+from itertools import chain, compress, count, islice, repeat
 import logging; log = logging.getLogger(__name__)
+import mmap
+from operator import add, and_, gt, itemgetter, lshift, methodcaller, ne, not_, or_, xor
 import os
+import shutil
+import struct
+import tempfile
 from warnings import warn
+import zlib
 # site
 # pkg
 from passlib.context import CryptContext
 from passlib.exc import ExpectedStringError
 from passlib.hash import htdigest
 from passlib.utils import render_bytes, to_bytes, deprecated_method, is_ascii_codec
-from passlib.utils.compat import join_bytes, unicode, BytesIO, iteritems, PY3, OrderedDict
+from passlib.utils.compat import join_bytes, join_byte_values, unicode, BytesIO, \
+                                 iteritems, irange, imap, PY3, OrderedDict
+from passlib.utils.filewatch import FileWatcher, file_signature
 # local
 __all__ = [
     'HtpasswdFile',
     'HtdigestFile',
+    'HtpasswdSnapshot',
 ]
 
 #=============================================================================
@@ -27,10 +39,540 @@ __all__ = [
 _UNSET = object()
 
 _BCOLON = b":"
+_BHASH = b"#"
+_BNEWLINE = b"\n"
 
 # byte values that aren't allowed in fields.
 _INVALID_FIELD_CHARS = b":\n\r\t\x00"
 
+def _file_identity(st):
+    """return tuple identifying a file's inode, from :func:`os.stat` result"""
+    return (st.st_dev, st.st_ino)
+
+def _write_file_atomic(path, lines):
+    """write lines to tempfile in same directory as *path*,
+    then rename it over *path*, so readers never see a partial file.
+    """
+    dirname = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".tmp-",
+                               suffix="-" + os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.writelines(lines)
+            fh.flush()
+            os.fsync(fh.fileno())
+        if os.path.exists(path):
+            # preserve original file's permissions
+            shutil.copymode(path, tmp)
+            if os.name == "nt":
+                os.remove(path)
+        os.rename(tmp, path)
+    except:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+if PY3:
+    def _buffer_crc32(buf, start, end, crc=0):
+        """return crc32 of ``buf[start:end]`` (without copying the slice)"""
+        view = memoryview(buf)
+        try:
+            part = view[start:end]
+            try:
+                return zlib.crc32(part, crc)
+            finally:
+                part.release()
+        finally:
+            view.release()
+else:
+    def _buffer_crc32(buf, start, end, crc=0):
+        """return crc32 of ``buf[start:end]``"""
+        return zlib.crc32(buf[start:end], crc)
+
+# helpers used by _IndexedRecords to index records
+_is_comment = methodcaller("startswith", _BHASH)
+_count_colons = methodcaller("count", _BCOLON)
+_split_value = methodcaller("rsplit", _BCOLON, 1)
+_split_fields = methodcaller("split", _BCOLON)
+_NON_SEPARATORS = join_byte_values(value for value in irange(256)
+                                   if value not in bytearray(_BCOLON + _BNEWLINE))
+if PY3:
+    _NEWLINE_TO_COLON = bytes.maketrans(_BNEWLINE, _BCOLON)
+else:
+    from string import maketrans
+    _NEWLINE_TO_COLON = maketrans(_BNEWLINE, _BCOLON)
+    del maketrans
+
+try:
+    from itertools import accumulate as _accumulate
+except ImportError: # pragma: no cover -- py < 3.2
+    def _accumulate(source):
+        total = 0
+        for value in source:
+            total += value
+            yield total
+
+# array typecodes used for _IndexedRecords' offset & hash tables.
+# key hashes are truncated to 32 bits, and packed into a 64 bit int along with
+# the record's index in the offset table (see _IndexedRecords._build_index).
+try:
+    array("q")
+    _OFFSET_TYPECODE = "q"
+    _PACKED_TYPECODE = "Q"
+except ValueError: # pragma: no cover -- py2 lacks "q"
+    _OFFSET_TYPECODE = "l"
+    _PACKED_TYPECODE = "L" if array("L").itemsize >= 8 else None
+_HASH_MASK = 0xffffffff
+_SLOT_BITS = 32
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+
+def _render_tombstone(line):
+    """return comment line of same size as *line*,
+    used to blank out a record without moving the following lines.
+    """
+    if line.endswith(_BNEWLINE):
+        return _BHASH * (len(line) - 1) + _BNEWLINE
+    return _BHASH * len(line)
+
+class _IndexedRecords(object):
+    """mapping of key -> value for records stored in a raw file buffer.
+
+    used by :class:`_CommonFile` when ``lazy=True``. rather than storing
+    parsed records, this keeps a compact index of each record's line,
+    and only parses a record when it's requested. changes are
+    kept in a separate dict, so the buffer is never modified.
+    behaves like an OrderedDict: records iterate in file order,
+    followed by any new keys in the order they were added.
+
+    the index consists of two arrays: the offset of each record's line
+    (in file order), and a sorted table of truncated key hashes, each packed
+    together with the index of the record it belongs to. so besides the buffer,
+    this takes up around 16 bytes per record, and lookups are a binary search.
+
+    when ``incremental=True``, :meth:`write_changes` is used to
+    save changes by patching the file, rather than rewriting it.
+    """
+    #===================================================================
+    # instance attrs
+    #===================================================================
+
+    # buffer records are read from (bytes).
+    # NOTE: this is a private copy of the file, rather than an mmap,
+    #       since an mmap'd file which is truncated or rewritten in place
+    #       by another program (e.g. htpasswd) raises SIGBUS on access.
+    _buf = None
+
+    # function used to parse lines, ``parse(line, lineno) -> (key, value)``
+    _parse = None
+
+    # number of ':'-separated fields at the start of each line which form the record's key
+    _key_fields = 1
+
+    # array of line offsets for records indexed when buffer was loaded, in file order.
+    # offsets are set to -1 when a record is deleted, or moved into _extra.
+    _offsets = None
+
+    # sorted array of ``(hash(key) << 32) | index into _offsets``, for each record in _offsets.
+    # (this is a list if the platform lacks 64 bit arrays).
+    _packed = None
+
+    # number of live records in _offsets
+    _count = 0
+
+    # ordered map of key -> position, for records which aren't in _offsets:
+    # records indexed by extend(), records moved to end of file by write_changes(),
+    # and new records (which are assigned positions past the end of the file).
+    _extra = None
+
+    # map of key -> value for records added / changed since load
+    _values = None
+
+    # keys added / changed since last write_changes()
+    _changed = None
+
+    # map of key -> offset of line, for records deleted since last write_changes()
+    _deleted = None
+
+    # position to assign to next new key
+    _next_pos = 0
+
+    # set when records have been changed since last load / write_changes()
+    modified = False
+
+    # number of bytes & lines in buffer that have been indexed,
+    # and crc32 of those bytes (used to detect when buffer was only appended to)
+    size = 0
+    lines = 0
+    crc = 0
+
+    # size of file, including any records appended by write_changes()
+    file_end = 0
+
+    # number of lines in file which don't contain a live record
+    # (comments, tombstones, and duplicate entries)
+    dead = 0
+
+    # set of keys which have duplicate entries in file
+    dups = None
+
+    #===================================================================
+    # init
+    #===================================================================
+    def __init__(self, parse, buf=b"", key_fields=1):
+        self._parse = parse
+        self._buf = buf
+        self._key_fields = key_fields
+        self._extra = OrderedDict()
+        self._values = {}
+        self._changed = set()
+        self._deleted = {}
+        self.dups = set()
+        self._build_index()
+
+    def _scan(self, start):
+        """index lines of buffer, starting at offset *start*.
+        updates line count, dead line count, crc, and size.
+
+        :raises ValueError: if any of the lines are malformed.
+
+        :returns:
+            ``(offsets, hashes)``, where *offsets* is an array of the offset of each
+            record, and *hashes* is an iterator over the hash of each record's key.
+        """
+        # NOTE: this avoids python-level loops over the records,
+        #       so that indexing a file isn't any slower than parsing it.
+        buf = self._buf
+        end = len(buf)
+        data = buf[start:] if start else buf
+        if data and not data.endswith(_BNEWLINE):
+            data += _BNEWLINE
+        size = data.count(_BNEWLINE)
+        fields_per_line = self._key_fields + 1
+        if (_BNEWLINE + _BHASH) not in data and not data.startswith(_BHASH) and \
+                data.translate(None, _NON_SEPARATORS) == \
+                (_BCOLON * self._key_fields + _BNEWLINE) * size:
+            # fast path: no comments, and every line has the right number of fields.
+            # splitting on both separators gives a flat list of every line's fields.
+            fields = data.translate(_NEWLINE_TO_COLON).split(_BCOLON)
+            del data
+            fields.pop()
+            # line N starts after N*fields_per_line fields & separators
+            ends = _accumulate(imap(len, fields))
+            starts = imap(add, islice(ends, fields_per_line-1, None, fields_per_line),
+                          count(start + fields_per_line, fields_per_line))
+            offsets = array(_OFFSET_TYPECODE, chain([start], islice(starts, size-1)) if size else ())
+            if fields_per_line == 2:
+                keys = fields[::2]
+            else:
+                keys = zip(*[fields[idx::fields_per_line] for idx in irange(fields_per_line-1)])
+            hashes = imap(hash, keys)
+        else:
+            # slow path: check each line separately
+            lines = data.split(_BNEWLINE)
+            del data
+            lines.pop()
+            is_record = list(imap(not_, imap(_is_comment, lines)))
+            # records should have key_fields+1 fields, just like _parse() checks
+            # (any other line is malformed, so let _parse() report the error)
+            colons = imap(_count_colons, lines)
+            bad = imap(and_, is_record, imap(ne, colons, repeat(self._key_fields)))
+            for idx in compress(count(), bad):
+                self._parse(lines[idx], self.lines + idx + 1)
+                raise AssertionError("line should have failed to parse: %r" % (lines[idx],)) # pragma: no cover
+            # line N starts after sum(len(line) + 1 for each previous line)
+            starts = chain([start], imap(add, _accumulate(imap(len, lines)), count(start + 1)))
+            offsets = array(_OFFSET_TYPECODE, compress(starts, is_record))
+            keys = imap(itemgetter(0), imap(_split_value, compress(lines, is_record)))
+            if fields_per_line > 2:
+                keys = imap(tuple, imap(_split_fields, keys))
+            hashes = imap(hash, keys)
+        self.dead += size - len(offsets)
+        self.lines += size
+        self.crc = _buffer_crc32(buf, start, end, self.crc)
+        self.size = self.file_end = end
+        self._next_pos = end + 1
+        return offsets, hashes
+
+    def _build_index(self):
+        """index all records in buffer"""
+        offsets, hashes = self._scan(0)
+        self._offsets = offsets
+        self._count = len(offsets)
+
+        # sort hashes, keeping track of which record each belongs to.
+        # NOTE: packing them into a single int is much faster than sorting
+        #       with a key function; and keeps duplicate keys in file order.
+        packed = sorted(imap(or_, imap(lshift, imap(and_, hashes, repeat(_HASH_MASK)),
+                                       repeat(_SLOT_BITS)), count()))
+        if _PACKED_TYPECODE:
+            packed = array(_PACKED_TYPECODE, packed)
+        self._packed = packed
+
+        # find duplicate entries, which will have adjacent hashes
+        same_hash = imap(gt, repeat(1 << _SLOT_BITS),
+                         imap(xor, packed, islice(packed, 1, None)))
+        for idx in compress(count(1), same_hash):
+            slot = packed[idx] & _SLOT_MASK
+            key = self._key_at(offsets[slot])
+            if self._find_slot(key) != slot:
+                offsets[slot] = -1
+                self._count -= 1
+                self.dead += 1
+                self.dups.add(key)
+
+    def _key_at(self, pos):
+        """return key of record whose line starts at *pos* in buffer"""
+        return self._read_record(pos)[0]
+
+    def _read_record(self, pos):
+        """parse record whose line starts at *pos* in buffer,
+        returning ``(key, value)``, or ``None`` if it's not a record"""
+        buf = self._buf
+        end = buf.find(_BNEWLINE, pos)
+        if end == -1:
+            end = len(buf)
+        return self._parse_line(buf[pos:end])
+
+    def _find_slot(self, key):
+        """return index of key's entry in _offsets, or ``None`` if not present"""
+        packed = self._packed
+        offsets = self._offsets
+        target = (hash(key) & _HASH_MASK) << _SLOT_BITS
+        idx = bisect_left(packed, target)
+        size = len(packed)
+        while idx < size and packed[idx] & ~_SLOT_MASK == target:
+            slot = packed[idx] & _SLOT_MASK
+            pos = offsets[slot]
+            if pos >= 0:
+                result = self._read_record(pos)
+                if result is not None and result[0] == key:
+                    return slot
+            idx += 1
+        return None
+
+    def _get_pos(self, key):
+        """return position of key (raising KeyError if not present)"""
+        try:
+            return self._extra[key]
+        except KeyError:
+            pass
+        slot = self._find_slot(key)
+        if slot is None:
+            raise KeyError(key)
+        return self._offsets[slot]
+
+    def _pop_pos(self, key):
+        """remove key from index, returning its position (raising KeyError if not present)"""
+        pos = self._extra.pop(key, None)
+        if pos is not None:
+            return pos
+        slot = self._find_slot(key)
+        if slot is None:
+            raise KeyError(key)
+        offsets = self._offsets
+        pos = offsets[slot]
+        offsets[slot] = -1
+        self._count -= 1
+        return pos
+
+    def extend(self, buf):
+        """replace buffer with *buf*, which must start with the same data
+        as the old one (e.g. file has been appended to),
+        and index just the new records.
+        """
+        assert not self.modified, "can't extend modified records"
+        size = self.size
+        if len(buf) < size or _buffer_crc32(buf, 0, size) != self.crc:
+            raise ValueError("buffer contents have changed")
+        self.close()
+        self._buf = buf
+        extra = self._extra
+        for pos in self._scan(size)[0]:
+            key = self._key_at(pos)
+            if key in self:
+                self.dead += 1
+                self.dups.add(key)
+            else:
+                extra[key] = pos
+
+    def close(self):
+        """release underlying buffer"""
+        self._buf = None
+
+    #===================================================================
+    # mapping interface
+    #===================================================================
+    def __len__(self):
+        return self._count + len(self._extra)
+
+    def __contains__(self, key):
+        return key in self._extra or self._find_slot(key) is not None
+
+    def __iter__(self):
+        key_at = self._key_at
+        for pos in self._offsets:
+            if pos >= 0:
+                yield key_at(pos)
+        for key in list(self._extra):
+            yield key
+
+    keys = __iter__
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        pos = self._extra.get(key)
+        if pos is None:
+            slot = self._find_slot(key)
+            if slot is None:
+                raise KeyError(key)
+            pos = self._offsets[slot]
+        # NOTE: if another process has tombstoned the line,
+        #       treating record as missing until file is reloaded.
+        result = self._read_record(pos)
+        if result is None or result[0] != key:
+            raise KeyError(key)
+        return result[1]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._extra[key] = self._next_pos
+            self._next_pos += 1
+        self._values[key] = value
+        self._changed.add(key)
+        self.modified = True
+
+    def __delitem__(self, key):
+        pos = self._pop_pos(key)
+        self._values.pop(key, None)
+        self._changed.discard(key)
+        if pos < self.file_end:
+            self._deleted[key] = pos
+        self.modified = True
+
+    def items(self):
+        for key in self:
+            yield key, self[key]
+
+    iteritems = items
+
+    #===================================================================
+    # incremental saving
+    #===================================================================
+    def _parse_line(self, line):
+        """parse line, returning ``(key, value)``, or ``None`` if not a record"""
+        if line[:1] == _BHASH:
+            return None
+        try:
+            return self._parse(line, None)
+        except ValueError:
+            return None
+
+    def write_changes(self, fh, render):
+        """save changes since last load / write_changes() to *fh*,
+        which should be the file the records were loaded from, opened in ``r+b`` mode.
+
+        changed records are overwritten in place if their new line is the same
+        length, otherwise the old line is replaced with a tombstone (a ``#`` comment),
+        and the record is appended to the file (along with any new records).
+        deleted records are replaced with tombstones.
+
+        :arg render: function used to render ``(key, value)`` as a line.
+
+        :returns:
+            ``False`` if the file doesn't match the records, or has duplicate
+            entries for a changed record, in which case nothing is written
+            and the caller should rewrite the whole file.
+        """
+        fh.seek(0, 2)
+        end = fh.tell()
+        if end != self.file_end:
+            # file has been changed by someone else
+            return False
+        get_pos = self._get_pos
+        values = self._values
+        dups = self.dups
+        changed = sorted(self._changed, key=get_pos)
+        deleted = self._deleted
+        if dups and any(key in dups for key in changed + list(deleted)):
+            # would have to tombstone all of key's lines, which aren't indexed.
+            return False
+
+        # make list of writes before touching file,
+        # so nothing is written if file doesn't match records.
+        def read_record_line(key, pos):
+            fh.seek(pos)
+            line = fh.readline()
+            result = self._parse_line(line)
+            if result is None or result[0] != key:
+                return None
+            return line
+        patches = []
+        appends = []
+        tombstones = 0
+        for key, pos in iteritems(deleted):
+            line = read_record_line(key, pos)
+            if line is None:
+                return False
+            patches.append((pos, _render_tombstone(line)))
+            tombstones += 1
+        for key in changed:
+            pos = get_pos(key)
+            data = render(key, values[key])
+            if pos < end:
+                line = read_record_line(key, pos)
+                if line is None:
+                    return False
+                if len(line) == len(data) and line.endswith(_BNEWLINE):
+                    patches.append((pos, data))
+                    continue
+                patches.append((pos, _render_tombstone(line)))
+                tombstones += 1
+            appends.append((key, data))
+
+        # write changes
+        for pos, data in patches:
+            fh.seek(pos)
+            fh.write(data)
+        if appends:
+            chunks = []
+            if end:
+                fh.seek(end - 1)
+                if fh.read(1) != _BNEWLINE:
+                    chunks.append(_BNEWLINE)
+                    end += 1
+            for key, data in appends:
+                # NOTE: re-inserting key, so it's ordered the same as it is in file
+                self._pop_pos(key)
+                self._extra[key] = end
+                end += len(data)
+                chunks.append(data)
+            fh.seek(0, 2)
+            fh.write(join_bytes(chunks))
+        fh.flush()
+        os.fsync(fh.fileno())
+
+        # update state
+        self.dead += tombstones
+        self.file_end = end
+        self._next_pos = end + 1
+        self._changed.clear()
+        self._deleted.clear()
+        self.modified = False
+        return True
+
+    #===================================================================
+    # eoc
+    #===================================================================
+
 #=============================================================================
 # common helpers
 #=============================================================================
@@ -50,10 +592,27 @@ class _CommonFile(object):
     # if bound to local file, these will be set.
     _path = None # local file path
     _mtime = None # mtime when last loaded, or 0
+    _file_sig = None # file_signature() when last loaded / saved, or None
 
     # if true, automatically save to local file after changes are made.
     autosave = False
 
+    # if true, only an index of record offsets is built, and records are parsed on demand.
+    lazy = False
+
+    # number of ':'-separated fields at the start of each line which form the record's key
+    _key_fields = 1
+
+    # if true, save() patches changed records in place, rather than rewriting file.
+    incremental = False
+
+    # if true, a FileWatcher is used to detect changes to local file.
+    watch = False
+    _watcher = None
+
+    # (st_dev, st_ino) of file when last loaded (only used by lazy mode)
+    _file_id = None
+
     # ordered dict mapping key -> value for all records in database.
     # (e.g. user => hash for Htpasswd)
     _records = None
@@ -97,8 +656,8 @@ class _CommonFile(object):
     # init
     #===================================================================
     def __init__(self, path=None, new=False, autoload=True, autosave=False,
-                 encoding="utf-8", return_unicode=PY3,
-                 ):
+                 encoding="utf-8", return_unicode=PY3, lazy=False,
+                 incremental=False, watch=False):
         # set encoding
         if not encoding:
             warn("``encoding=None`` is deprecated as of Passlib 1.6, "
@@ -116,6 +675,9 @@ class _CommonFile(object):
         # set other attrs
         self.return_unicode = return_unicode
         self.autosave = autosave
+        self.lazy = lazy or incremental
+        self.incremental = incremental
+        self.watch = watch
         self._path = path
         self._mtime = 0
 
@@ -138,6 +700,10 @@ class _CommonFile(object):
             tail += ' path=%r' % self._path
         if self.encoding != "utf-8":
             tail += ' encoding=%r' % self.encoding
+        if self.incremental:
+            tail += ' incremental=True'
+        elif self.lazy:
+            tail += ' lazy=True'
         return "<%s 0x%0x%s>" % (self.__class__.__name__, id(self), tail)
 
     # NOTE: ``path`` is a property so that ``_mtime`` is wiped when it's set.
@@ -145,7 +711,8 @@ class _CommonFile(object):
         return self._path
     def _set_path(self, value):
         if value != self._path:
-            self._mtime = 0
+            self._clear_file_sig()
+            self._stop_watching()
         self._path = value
     path = property(_get_path, _set_path)
 
@@ -154,6 +721,32 @@ class _CommonFile(object):
         """modify time when last loaded (if bound to a local file)"""
         return self._mtime
 
+    def _set_file_sig(self, st):
+        """record state of local file, from :func:`os.stat` result"""
+        self._file_sig = file_signature(st)
+        self._mtime = st.st_mtime
+
+    def _clear_file_sig(self):
+        self._file_sig = None
+        self._mtime = 0
+
+    #===================================================================
+    # watching
+    #===================================================================
+    def _start_watching(self):
+        """start watching ``self.path`` (if not already), and clear changed flag"""
+        watcher = self._watcher
+        if watcher is None or watcher.closed:
+            self._watcher = FileWatcher(self._path)
+        else:
+            watcher.changed = False
+
+    def _stop_watching(self):
+        watcher = self._watcher
+        if watcher is not None:
+            watcher.close()
+            self._watcher = None
+
     #===================================================================
     # loading
     #===================================================================
@@ -161,7 +754,15 @@ class _CommonFile(object):
         """Reload from ``self.path`` only if file has changed since last load"""
         if not self._path:
             raise RuntimeError("%r is not bound to a local file" % self)
-        if self._mtime and self._mtime == os.path.getmtime(self._path):
+        watcher = self._watcher
+        if watcher is not None:
+            if not watcher.changed and not watcher.closed:
+                return False
+            # NOTE: flag is cleared *before* checking the file,
+            #       so changes made after this point aren't missed.
+            self._start_watching()
+        if self._file_sig and self._file_sig == file_signature(os.stat(self._path)):
+            # e.g. watcher noticed our own save()
             return False
         self.load()
         return True
@@ -184,8 +785,8 @@ class _CommonFile(object):
         """
         if path is not None:
             with open(path, "rb") as fh:
-                self._mtime = 0
-                self._load_lines(fh)
+                self._clear_file_sig()
+                self._load_file(fh)
         elif not force:
             warn("%(name)s.load(force=False) is deprecated as of Passlib 1.6,"
                  "and will be removed in Passlib 1.8; "
@@ -194,9 +795,11 @@ class _CommonFile(object):
                  DeprecationWarning, stacklevel=2)
             return self.load_if_changed()
         elif self._path:
+            if self.watch:
+                self._start_watching()
             with open(self._path, "rb") as fh:
-                self._mtime = os.path.getmtime(self._path)
-                self._load_lines(fh)
+                self._set_file_sig(os.fstat(fh.fileno()))
+                self._load_file(fh)
         else:
             raise RuntimeError("%s().path is not set, an explicit path is required" %
                                self.__class__.__name__)
@@ -205,14 +808,36 @@ class _CommonFile(object):
     def load_string(self, data):
         """Load state from unicode or bytes string, replacing current state"""
         data = to_bytes(data, self.encoding, "data")
-        self._mtime = 0
+        self._clear_file_sig()
         self._load_lines(BytesIO(data))
 
+    def _load_file(self, fh):
+        """load from open file"""
+        if not self.lazy:
+            self._load_lines(fh)
+            return
+        st = os.fstat(fh.fileno())
+        buf = fh.read()
+        file_id = _file_identity(st)
+        records = self._records
+        if isinstance(records, _IndexedRecords):
+            if not records.modified and file_id == self._file_id:
+                # same file as before, try to index just the appended records
+                try:
+                    records.extend(buf)
+                    return
+                except ValueError:
+                    pass
+            records.close()
+        self._file_id = file_id
+        self._records = _IndexedRecords(self._parse_record, buf, self._key_fields)
+
     def _load_lines(self, lines):
         """load from sequence of lists"""
-        # XXX: found reference that "#" comment lines may be supported by
-        #      htpasswd, should verify this, and figure out how to handle them.
-        #      if true, this would also affect what can be stored in user field.
+        # NOTE: lines starting with "#" are skipped as comments, same as
+        #       apache's mod_authn_file; they're also used to blank out
+        #       old entries when saving incrementally. for the same reason,
+        #       usernames may not start with "#" (see _encode_user()).
         # XXX: if multiple entries for a key, should we use the first one
         #      or the last one? going w/ first entry for now.
         # XXX: how should this behave if parsing fails? currently
@@ -221,6 +846,9 @@ class _CommonFile(object):
         parse = self._parse_record
         records = self._records = OrderedDict()
         for idx, line in enumerate(lines):
+            if line.startswith(_BHASH):
+                # skip comments (as apache does)
+                continue
             key, value = parse(line, idx+1)
             if key not in records:
                 records[key] = value
@@ -242,15 +870,45 @@ class _CommonFile(object):
         If no path is specified, attempts to save to ``self.path``.
         """
         if path is not None:
-            with open(path, "wb") as fh:
-                fh.writelines(self._iter_lines())
+            if isinstance(self._records, _IndexedRecords):
+                # NOTE: writing new file & renaming it into place,
+                #       so readers never see a partially written file.
+                _write_file_atomic(path, self._iter_lines())
+            else:
+                with open(path, "wb") as fh:
+                    fh.writelines(self._iter_lines())
         elif self._path:
-            self.save(self._path)
-            self._mtime = os.path.getmtime(self._path)
+            if self.incremental:
+                self._save_incremental()
+            else:
+                self.save(self._path)
+            self._set_file_sig(os.stat(self._path))
         else:
             raise RuntimeError("%s().path is not set, cannot autosave" %
                                self.__class__.__name__)
 
+    def _save_incremental(self):
+        """save changes to ``self.path`` by patching the file in place,
+        falling back to rewriting (and reloading) it when needed."""
+        path = self._path
+        records = self._records
+        if isinstance(records, _IndexedRecords) and self._file_id:
+            try:
+                fh = open(path, "r+b")
+            except (IOError, OSError):
+                fh = None
+            if fh is not None:
+                with fh:
+                    if (_file_identity(os.fstat(fh.fileno())) == self._file_id and
+                            records.write_changes(fh, self._render_record)):
+                        if records.dead <= len(records) // 2:
+                            return
+                        log.debug("compacting %r (%d dead lines)", path, records.dead)
+        # rewrite whole file, and reload so records are indexed against it.
+        _write_file_atomic(path, self._iter_lines())
+        with open(path, "rb") as fh:
+            self._load_file(fh)
+
     def to_string(self):
         """Export current state as a string of bytes"""
         return join_bytes(self._iter_lines())
@@ -268,7 +926,11 @@ class _CommonFile(object):
     #===================================================================
     def _encode_user(self, user):
         """user-specific wrapper for _encode_field()"""
-        return self._encode_field(user, "user")
+        user = self._encode_field(user, "user")
+        if user.startswith(_BHASH):
+            # apache treats these lines as comments
+            raise ValueError("user must not start with '#': %r" % (user,))
+        return user
 
     def _encode_realm(self, realm): # pragma: no cover - abstract method
         """realm-specific wrapper for _encode_field()"""
@@ -404,6 +1066,50 @@ class HtpasswdFile(_CommonFile):
 
         This is also exposed as a readonly instance attribute.
 
+    :type lazy: bool
+    :param lazy:
+
+        If ``True``, the file's contents are kept as a single buffer,
+        along with a compact index of each entry's offset (around 16 bytes
+        per entry); entries are parsed as they're needed. For large files,
+        this uses roughly a third of the memory of parsing every entry
+        (little more than the size of the file), and takes about as long to load.
+        Reloading a file which has only been appended to will only index the new entries.
+        Changes are kept in memory until saved, and :meth:`save` will
+        write to a temporary file and rename it over the original.
+
+        .. versionadded:: 1.7
+
+    :type incremental: bool
+    :param incremental:
+
+        If ``True``, :meth:`save` will only write the entries which have changed
+        since the file was loaded (this implies ``lazy=True``), making each update
+        take constant time regardless of the size of the file; which is
+        especially useful with ``autosave=True``. New entries are appended to
+        the file, changed entries are overwritten in place if the new line
+        is the same length (otherwise the old line is blanked out,
+        and the entry appended), and deleted entries are blanked out
+        with ``#`` comment lines (which apache ignores).
+        Once blanked lines outnumber half the entries, or if the file was
+        changed by another program, the whole file is rewritten instead
+        (via a temporary file which is renamed into place).
+
+        .. versionadded:: 1.7
+
+    :type watch: bool
+    :param watch:
+
+        If ``True``, a background thread watches the file for changes
+        (using inotify under Linux, and polling the file once a second elsewhere),
+        so that :meth:`load_if_changed` only has to check a flag,
+        rather than calling :func:`!os.stat` every time.
+        Whether or not this is enabled, files are considered changed if
+        their size or inode differs, as well as their mtime; so files
+        which are replaced by renaming a new file into place are always detected.
+
+        .. versionadded:: 1.7
+
     :type default_scheme: str
     :param default_scheme:
         Optionally specify default scheme to use when encoding new passwords.
@@ -458,12 +1164,14 @@ class HtpasswdFile(_CommonFile):
     Inspection
     ================
     .. automethod:: users
+    .. automethod:: iter_records
     .. automethod:: check_password
     .. automethod:: get_hash
 
     Modification
     ================
     .. automethod:: set_password
+    .. automethod:: set_passwords
     .. automethod:: delete
 
     Alternate Constructors
@@ -532,6 +1240,21 @@ class HtpasswdFile(_CommonFile):
         """Return list of all users in database"""
         return [self._decode_field(user) for user in self._records]
 
+    def iter_records(self):
+        """Iterate over ``(user, hash)`` for all users in database,
+        in the same order as they'll be written to the file.
+
+        Unlike calling :meth:`users` and :meth:`get_hash`, this doesn't
+        build a list of users; and when the file was loaded with ``lazy=True``,
+        each hash is parsed only as it's reached, so even very large files
+        can be exported without copying the whole database into memory.
+
+        .. versionadded:: 1.7
+        """
+        decode = self._decode_field
+        for user, hash in iteritems(self._records):
+            yield decode(user), hash
+
     ##def has_user(self, user):
     ##    "check whether entry is present for user"
     ##    return self._encode_user(user) in self._records
@@ -565,6 +1288,70 @@ class HtpasswdFile(_CommonFile):
         self._autosave()
         return existing
 
+    #: number of entries :meth:`set_passwords` reads from its input at once.
+    set_passwords_batch_size = 10000
+
+    def set_passwords(self, items, workers=None, executor=None):
+        """Set passwords for multiple users; adding users as needed.
+
+        This is equivalent to calling :meth:`set_password` for each
+        ``(user, password)`` pair in *items*, except that the hashes can be
+        calculated in parallel, and (if ``autosave=True``) the file is only
+        written once, after all the users have been set.
+
+        :arg items:
+            iterable of ``(user, password)`` pairs. This is read in batches
+            of :attr:`set_passwords_batch_size` entries, so it may be a generator.
+            If a user appears more than once, only the first entry is used
+            (as when loading a file with duplicate entries).
+
+        :param workers:
+        :param executor:
+            Passed to :meth:`CryptContext.encrypt_many() <passlib.context.CryptContext.encrypt_many>`,
+            to control how the hashes are calculated in parallel
+            (by default, they're calculated serially in the current thread).
+
+        :returns:
+            number of users which were added
+            (i.e. not counting existing users whose passwords were updated).
+
+        .. versionadded:: 1.7
+        """
+        records = self._records
+        context = self.context
+        encoding = self.encoding
+        batch_size = self.set_passwords_batch_size
+        seen = set()
+        added = 0
+        items = iter(items)
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+            users = []
+            passwords = []
+            for user, password in batch:
+                user = self._encode_user(user)
+                if user in seen:
+                    continue
+                seen.add(user)
+                users.append(user)
+                passwords.append(password)
+            if not users:
+                # whole batch was duplicates, but there may be more after it
+                continue
+            hashes = context.encrypt_many(passwords, workers=workers,
+                                          executor=executor)
+            for user, hash in zip(users, hashes):
+                if PY3:
+                    hash = hash.encode(encoding)
+                if user not in records:
+                    added += 1
+                records[user] = hash
+        if seen:
+            self._autosave()
+        return added
+
     @deprecated_method(deprecated="1.6", removed="1.8",
                        replacement="set_password")
     def update(self, user, password):
@@ -643,6 +1430,308 @@ class HtpasswdFile(_CommonFile):
     # eoc
     #===================================================================
 
+#=============================================================================
+# shared snapshots
+#=============================================================================
+
+# snapshot file layout (all integers little-endian):
+#
+#   header      magic, generation, current generation, version, entry count
+#   entries     (offset, user length, hash length) for each user, sorted by user
+#   data        user & hash bytes for each entry, concatenated
+#
+# "current generation" is the only field which is ever modified: when a new
+# snapshot is published, it's written into the old file, telling any processes
+# which still have the old file mapped that they should re-attach.
+_SNAPSHOT_MAGIC = b"PLHTSNAP"
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<8sQQII")
+_SNAPSHOT_CURRENT = struct.Struct("<Q")
+_SNAPSHOT_CURRENT_OFFSET = 16
+_SNAPSHOT_ENTRY = struct.Struct("<IHH")
+
+def _read_snapshot_header(buf):
+    """parse & validate snapshot header, returning ``(generation, current, count)``"""
+    if len(buf) < _SNAPSHOT_HEADER.size:
+        raise ValueError("not an htpasswd snapshot")
+    magic, generation, current, version, count = _SNAPSHOT_HEADER.unpack_from(buf)
+    if magic != _SNAPSHOT_MAGIC:
+        raise ValueError("not an htpasswd snapshot")
+    if version != _SNAPSHOT_VERSION:
+        raise ValueError("unsupported htpasswd snapshot version: %r" % (version,))
+    return generation, current, count
+
+class HtpasswdSnapshot(object):
+    """read-only view of an htpasswd file, shared between processes.
+
+    Servers which fork many worker processes normally have each
+    worker load (and periodically re-stat) its own :class:`HtpasswdFile`.
+    Instead, a single loader process can :meth:`publish` the file's
+    users & hashes as a compact binary snapshot, which each worker then
+    memory-maps via this class. Since the mapping is read-only, the
+    operating system shares a single copy of it between all the workers,
+    and attaching to it takes constant time regardless of the number of users.
+
+    Each published snapshot has a generation number.
+    When a new snapshot is published, the old file is marked as stale,
+    so workers can detect it by reading from their existing mapping,
+    without any system calls; :meth:`check_password` and :meth:`get_hash`
+    do this automatically, and re-attach to the latest snapshot as needed.
+
+    :type path: str
+    :arg path:
+        path of snapshot file to attach to (as written by :meth:`publish`).
+
+    :param context:
+        :class:`~passlib.context.CryptContext` used to verify passwords,
+        defaults to the same one as :class:`HtpasswdFile`.
+
+    :param encoding:
+        encoding used to encode usernames & passwords (defaults to ``utf-8``),
+        should match the *encoding* of the published file.
+
+    :param return_unicode:
+        if ``True`` (the default under Python 3), :meth:`users` returns unicode.
+
+    :raises ValueError: if file isn't a valid snapshot.
+
+    Example usage::
+
+        >>> from passlib.apache import HtpasswdFile, HtpasswdSnapshot
+
+        >>> # in loader process: publish snapshot, and re-publish when file changes
+        >>> ht = HtpasswdFile("/etc/myapp/htpasswd", lazy=True)
+        >>> HtpasswdSnapshot.publish(ht, "/run/myapp/htpasswd.snapshot")
+        1
+        >>> if ht.load_if_changed():
+        ...     HtpasswdSnapshot.publish(ht, "/run/myapp/htpasswd.snapshot")
+
+        >>> # in each worker process
+        >>> users = HtpasswdSnapshot("/run/myapp/htpasswd.snapshot")
+        >>> users.check_password("user1", "pass1")
+        True
+
+    .. note::
+
+        Only one process should publish to a given path at a time.
+        Snapshots are replaced by renaming a new file into place,
+        so the directory must be writable by the loader process.
+
+    .. versionadded:: 1.7
+
+    .. automethod:: publish
+    .. automethod:: refresh
+    .. automethod:: is_stale
+    .. automethod:: users
+    .. automethod:: get_hash
+    .. automethod:: check_password
+
+    .. attribute:: generation
+
+        Generation number of the snapshot currently attached.
+    """
+    #===================================================================
+    # instance attrs
+    #===================================================================
+
+    #: path of snapshot file
+    path = None
+
+    #: generation of snapshot currently attached
+    generation = None
+
+    # mmap (or bytes, for empty snapshots) of current snapshot file
+    _buf = None
+
+    # number of entries in current snapshot
+    _count = 0
+
+    #===================================================================
+    # publishing
+    #===================================================================
+    @classmethod
+    def publish(cls, source, path):
+        """Write snapshot of *source*'s users & hashes to *path*,
+        replacing any existing snapshot there.
+
+        :type source: HtpasswdFile
+        :arg source: htpasswd file to take snapshot of.
+
+        :type path: str
+        :arg path: path to write snapshot to.
+
+        :returns: generation number of the new snapshot.
+        """
+        records = sorted(iteritems(source._records))
+
+        # build entry table & data
+        offset = _SNAPSHOT_HEADER.size + len(records) * _SNAPSHOT_ENTRY.size
+        entries = []
+        data = []
+        for user, hash in records:
+            entries.append(_SNAPSHOT_ENTRY.pack(offset, len(user), len(hash)))
+            data.append(user)
+            data.append(hash)
+            offset += len(user) + len(hash)
+        if offset > 0xFFFFFFFF:
+            raise ValueError("too many users for htpasswd snapshot")
+
+        # open old snapshot (if any), to determine the next generation number
+        try:
+            old = open(path, "r+b")
+        except (IOError, OSError):
+            old = None
+        try:
+            generation = 1
+            if old is not None:
+                try:
+                    header = old.read(_SNAPSHOT_HEADER.size)
+                    current = _read_snapshot_header(header)[1]
+                except ValueError:
+                    # not a snapshot (or invalid), don't try to update it.
+                    old.close()
+                    old = None
+                else:
+                    generation = current + 1
+
+            # write new snapshot, and rename it into place
+            header = _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, generation, generation,
+                                           _SNAPSHOT_VERSION, len(records))
+            _write_file_atomic(path, [header, join_bytes(entries), join_bytes(data)])
+
+            # mark old snapshot as stale, so attached processes will refresh.
+            if old is not None:
+                old.seek(_SNAPSHOT_CURRENT_OFFSET)
+                old.write(_SNAPSHOT_CURRENT.pack(generation))
+                old.flush()
+        finally:
+            if old is not None:
+                old.close()
+        return generation
+
+    #===================================================================
+    # init & attaching
+    #===================================================================
+    def __init__(self, path, context=htpasswd_context, encoding="utf-8",
+                 return_unicode=PY3):
+        if not is_ascii_codec(encoding):
+            raise ValueError("encoding must be 7-bit ascii compatible")
+        self.path = path
+        self.context = context
+        self.encoding = encoding
+        self.return_unicode = return_unicode
+        self._attach()
+
+    def __repr__(self):
+        return "<%s 0x%0x path=%r generation=%r>" % (self.__class__.__name__,
+                id(self), self.path, self.generation)
+
+    def _attach(self):
+        """map latest snapshot file"""
+        with open(self.path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size:
+                buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = b""
+        generation, _, count = _read_snapshot_header(buf)
+        if len(buf) < _SNAPSHOT_HEADER.size + count * _SNAPSHOT_ENTRY.size:
+            raise ValueError("htpasswd snapshot is truncated")
+        # NOTE: old mapping isn't closed explicitly, since other threads
+        #       may still be reading from it; it's released once unreferenced.
+        self._buf = buf
+        self._count = count
+        self.generation = generation
+
+    def is_stale(self):
+        """Return ``True`` if a newer snapshot has been published.
+
+        This only reads from the mapped snapshot, so it's cheap enough
+        to call on every request.
+        """
+        current = _SNAPSHOT_CURRENT.unpack_from(self._buf, _SNAPSHOT_CURRENT_OFFSET)[0]
+        return current != self.generation
+
+    def refresh(self):
+        """Re-attach to latest snapshot, if a newer one has been published.
+
+        :returns: ``True`` if snapshot was reloaded, else ``False``.
+        """
+        if not self.is_stale():
+            return False
+        self._attach()
+        return True
+
+    #===================================================================
+    # lookup
+    #===================================================================
+    def __len__(self):
+        return self._count
+
+    def _iter_entries(self, buf, count):
+        """iterate over (user, hash) pairs in snapshot"""
+        unpack = _SNAPSHOT_ENTRY.unpack_from
+        pos = _SNAPSHOT_HEADER.size
+        for _ in range(count):
+            offset, ulen, hlen = unpack(buf, pos)
+            yield buf[offset:offset+ulen], buf[offset+ulen:offset+ulen+hlen]
+            pos += _SNAPSHOT_ENTRY.size
+
+    def _lookup(self, user):
+        """return hash for encoded *user*, or ``None`` if not found"""
+        self.refresh()
+        buf = self._buf
+        unpack = _SNAPSHOT_ENTRY.unpack_from
+        base = _SNAPSHOT_HEADER.size
+        size = _SNAPSHOT_ENTRY.size
+        # binary search of entry table
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, ulen, hlen = unpack(buf, base + mid * size)
+            other = buf[offset:offset+ulen]
+            if other < user:
+                lo = mid + 1
+            elif other > user:
+                hi = mid
+            else:
+                return buf[offset+ulen:offset+ulen+hlen]
+        return None
+
+    def users(self):
+        """Return list of all users in snapshot"""
+        self.refresh()
+        users = [user for user, _ in self._iter_entries(self._buf, self._count)]
+        if self.return_unicode:
+            users = [user.decode(self.encoding) for user in users]
+        return users
+
+    def get_hash(self, user):
+        """Return hash stored for user, or ``None`` if user not found."""
+        return self._lookup(to_bytes(user, self.encoding, "user"))
+
+    def check_password(self, user, password):
+        """Verify password for specified user.
+
+        :returns:
+            * ``None`` if user not found.
+            * ``False`` if user found, but password does not match.
+            * ``True`` if user found and password matches.
+
+        Unlike :meth:`HtpasswdFile.check_password`, this never
+        updates deprecated hashes, since snapshots are read-only.
+        """
+        hash = self._lookup(to_bytes(user, self.encoding, "user"))
+        if hash is None:
+            return None
+        if isinstance(password, unicode):
+            password = password.encode(self.encoding)
+        return self.context.verify(password, hash)
+
+    #===================================================================
+    # eoc
+    #===================================================================
+
 #=============================================================================
 # htdigest editing
 #=============================================================================
@@ -716,6 +1805,50 @@ class HtdigestFile(_CommonFile):
 
         This is also exposed as a readonly instance attribute.
 
+    :type lazy: bool
+    :param lazy:
+
+        If ``True``, the file's contents are kept as a single buffer,
+        along with a compact index of each entry's offset (around 16 bytes
+        per entry); entries are parsed as they're needed. For large files,
+        this uses roughly a third of the memory of parsing every entry
+        (little more than the size of the file), and takes about as long to load.
+        Reloading a file which has only been appended to will only index the new entries.
+        Changes are kept in memory until saved, and :meth:`save` will
+        write to a temporary file and rename it over the original.
+
+        .. versionadded:: 1.7
+
+    :type incremental: bool
+    :param incremental:
+
+        If ``True``, :meth:`save` will only write the entries which have changed
+        since the file was loaded (this implies ``lazy=True``), making each update
+        take constant time regardless of the size of the file; which is
+        especially useful with ``autosave=True``. New entries are appended to
+        the file, changed entries are overwritten in place if the new line
+        is the same length (otherwise the old line is blanked out,
+        and the entry appended), and deleted entries are blanked out
+        with ``#`` comment lines (which apache ignores).
+        Once blanked lines outnumber half the entries, or if the file was
+        changed by another program, the whole file is rewritten instead
+        (via a temporary file which is renamed into place).
+
+        .. versionadded:: 1.7
+
+    :type watch: bool
+    :param watch:
+
+        If ``True``, a background thread watches the file for changes
+        (using inotify under Linux, and polling the file once a second elsewhere),
+        so that :meth:`load_if_changed` only has to check a flag,
+        rather than calling :func:`!os.stat` every time.
+        Whether or not this is enabled, files are considered changed if
+        their size or inode differs, as well as their mtime; so files
+        which are replaced by renaming a new file into place are always detected.
+
+        .. versionadded:: 1.7
+
     :param autoload:
         Set to ``False`` to prevent the constructor from automatically
         loaded the file from disk.
@@ -788,6 +1921,9 @@ class HtdigestFile(_CommonFile):
     # NOTE: unlike htpasswd, this class doesn't use a CryptContext,
     # as only one hash format is supported: htdigest.
 
+    # records are keyed by user & realm fields
+    _key_fields = 2
+
     # optionally specify default realm that will be used if none
     # is provided to a method call. otherwise realm is always required.
     default_realm = None
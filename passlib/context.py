@@ -5,16 +5,22 @@
 from __future__ import with_statement
 # core
 from math import log as logb, ceil
+from bisect import bisect_left
 import logging; log = logging.getLogger(__name__)
+import sys
+import threading
 from time import sleep
 from warnings import warn
 # site
 # pkg
+import passlib.exc as exc
 from passlib.exc import PasslibConfigWarning, ExpectedStringError, ExpectedTypeError
 from passlib.registry import get_crypt_handler, _validate_handler_name
 from passlib.utils import rng, tick, to_bytes, deprecated_method, \
                           to_unicode, splitcomma
-from passlib.utils.compat import iteritems, num_types, \
+import passlib.utils.handlers as uh
+from passlib.utils.verify_cache import VerifyCache
+from passlib.utils.compat import iteritems, irange, num_types, \
                                  PY2, PY3, unicode, SafeConfigParser, \
                                  NativeStringIO, BytesIO, unicode_or_bytes_types
 # local
@@ -47,6 +53,9 @@ def _coerce_vary_rounds(value):
 _forbidden_scheme_options = set(["salt"])
     # 'salt' - not allowed since a fixed salt would defeat the purpose.
 
+# context options which can't be set per-category
+_global_context_options = set(["schemes", "verify_cache", "verify_cache_size"])
+
 # dict containing funcs used to coerce strings to correct type
 # for scheme option keys.
 _coerce_scheme_options = dict(
@@ -54,6 +63,7 @@ _coerce_scheme_options = dict(
     max_rounds=int,
     default_rounds=int,
     vary_rounds=_coerce_vary_rounds,
+    target_time=float,
     salt_size=int,
 )
 
@@ -61,6 +71,144 @@ def _is_handler_registered(handler):
     """detect if handler is registered or a custom handler"""
     return get_crypt_handler(handler.name, None) is handler
 
+# backends which are known to release the GIL while hashing,
+# allowing the batch methods to use threads instead of processes.
+_gil_free_backends = frozenset(["bcrypt", "pybcrypt"])
+
+# passlib.utils.oscrypt modes under which the "os_crypt" backends release the GIL
+_gil_free_crypt_modes = frozenset(["crypt_r", "process"])
+
+def _releases_gil(handler):
+    """check if handler's active backend releases the GIL"""
+    if not hasattr(handler, "get_backend"):
+        return False
+    try:
+        backend = handler.get_backend()
+    except exc.MissingBackendError:
+        return False
+    if backend == "os_crypt":
+        from passlib.utils.oscrypt import get_crypt_mode
+        return get_crypt_mode() in _gil_free_crypt_modes
+    return backend in _gil_free_backends
+
+def _call_batch(task):
+    """worker function used by CryptContext's batch methods.
+
+    *task* should be a ``(func, items)`` tuple, where *items* is a list
+    of ``(args, kwds)`` tuples. *func* is either a callable, or
+    a ``(handler, attr)`` tuple; the latter form is used when the task
+    has to be pickled, in which case registered handlers are passed by name.
+    since the latter bypasses the context's records, each call is timed,
+    and ``(result, elapsed)`` tuples are returned for the parent to process.
+    """
+    func, items = task
+    if isinstance(func, tuple):
+        handler, attr = func
+        if isinstance(handler, str):
+            handler = get_crypt_handler(handler)
+        func = getattr(handler, attr)
+        results = []
+        for args, kwds in items:
+            start = tick()
+            value = func(*args, **kwds)
+            results.append((value, tick() - start))
+        return results
+    return [func(*args, **kwds) for args, kwds in items]
+
+def _is_thread_executor(executor):
+    """check if executor runs tasks in threads of the current process"""
+    from multiprocessing.pool import ThreadPool
+    if isinstance(executor, ThreadPool):
+        return True
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError: # pragma: no cover -- py2 w/o futures backport
+        return False
+    return isinstance(executor, ThreadPoolExecutor)
+
+def _get_defining_class(handler, attr):
+    """return class in handler's mro which defines attribute, or None"""
+    for base in getattr(handler, "__mro__", ()):
+        if attr in base.__dict__:
+            return base
+    return None
+
+def _is_ascii(value):
+    try:
+        value.encode("ascii")
+    except UnicodeError:
+        return False
+    return True
+
+def _get_identify_prefixes(handler):
+    """return tuple of unicode prefixes, one of which *must* be present
+    for ``handler.identify(hash)`` to return ``True``; or ``None`` if
+    this can't be determined from the handler's attributes.
+
+    this is used by _CryptConfig to build its dispatch table.
+    it errs on the side of returning ``None``, since that merely
+    causes the handler to be checked against every hash.
+    """
+    if isinstance(handler, uh.PrefixWrapper):
+        prefix = handler.prefix
+        if not prefix:
+            return None
+        if not handler.orig_prefix:
+            # wrapped handler sees remainder of hash, so can narrow things down
+            # by appending its prefixes to our own.
+            inner = _get_identify_prefixes(handler.wrapped)
+            if inner:
+                return tuple(prefix + value for value in inner)
+        return (prefix,)
+    owner = _get_defining_class(handler, "identify")
+    if owner is uh.HasManyIdents:
+        prefixes = handler.ident_values
+    elif owner is not uh.GenericHandler:
+        # custom identify() method, can't make any assumptions.
+        return None
+    elif handler.ident is not None:
+        prefixes = (handler.ident,)
+    elif handler._hash_regex is None and \
+            _get_defining_class(handler, "from_string") is uh.StaticHandler:
+        # GenericHandler.identify() falls back to from_string(),
+        # which requires StaticHandler._hash_prefix after calling _norm_hash().
+        # _norm_hash() is only supposed to normalize case, so prefix
+        # is only trusted if it's unaffected by that.
+        prefix = handler._hash_prefix
+        if _get_defining_class(handler, "_norm_hash") is not uh.StaticHandler \
+                and prefix.lower() != prefix.upper():
+            return None
+        prefixes = (prefix,)
+    else:
+        return None
+    if not prefixes or not all(prefixes) or \
+            not all(isinstance(value, unicode) and _is_ascii(value)
+                    for value in prefixes):
+        return None
+    return tuple(prefixes)
+
+def _get_identify_size(handler):
+    """return exact length (in characters) of all hashes recognized
+    by ``handler.identify()``, or ``None`` if it can't be determined.
+
+    this covers unprefixed StaticHandler subclasses (e.g. the hex digests),
+    whose identify() method just checks if from_string() succeeds.
+    """
+    if not isinstance(handler, type) or not issubclass(handler, uh.StaticHandler):
+        return None
+    if _get_defining_class(handler, "identify") is not uh.GenericHandler or \
+            _get_defining_class(handler, "from_string") is not uh.StaticHandler:
+        return None
+    if handler.ident is not None or handler._hash_regex is not None:
+        return None
+    size = handler.checksum_size
+    if not size or handler._checksum_is_bytes:
+        return None
+    stub = handler._stub_checksum
+    if stub is not None and len(stub) != size:
+        return None
+    return len(handler._hash_prefix) + size
+
 #=============================================================================
 # crypt policy
 #=============================================================================
@@ -592,6 +740,9 @@ class _CryptRecord(object):
 
     # verify() attrs
     _min_verify_time = None
+    _sleep = staticmethod(sleep) # function used to pad failed verify() calls
+    _mvt_overruns = 0 # number of times verify() took longer than min_verify_time
+    _mvt_lock = threading.Lock() # lock held while updating _mvt_overruns (shared by all records)
 
     # needs_update() attrs
     _needs_update = None # optional callable provided by handler
@@ -606,7 +757,7 @@ class _CryptRecord(object):
     #===================================================================
     def __init__(self, handler, category=None, deprecated=False,
                  min_rounds=None, max_rounds=None, default_rounds=None,
-                 vary_rounds=None, min_verify_time=None,
+                 vary_rounds=None, min_verify_time=None, target_time=None,
                  **settings):
         # store basic bits
         self.handler = handler
@@ -614,6 +765,11 @@ class _CryptRecord(object):
         self.deprecated = deprecated
         self.settings = settings
 
+        # fill in rounds options based on handler's measured speed
+        if target_time is not None:
+            min_rounds, max_rounds, default_rounds = self._calibrate_rounds(
+                target_time, min_rounds, max_rounds, default_rounds)
+
         # validate & normalize rounds options
         self._init_rounds_options(min_rounds, max_rounds, default_rounds,
                              vary_rounds)
@@ -650,6 +806,30 @@ class _CryptRecord(object):
     #===================================================================
     # rounds generation & limits - used by encrypt & deprecation code
     #===================================================================
+    def _calibrate_rounds(self, target_time, mn, mx, df):
+        """derive default_rounds from target_time, if not set explicitly.
+
+        default_rounds is chosen so verify() takes about *target_time*
+        seconds on this host, clamped to any configured min_rounds and
+        max_rounds. those limits are never derived from the measurement,
+        since they'd vary between hosts sharing the same hashes.
+        measurements are cached, see :mod:`passlib.utils.calibrate`.
+        """
+        handler = self.handler
+        if 'rounds' not in handler.setting_kwds:
+            # doesn't even support rounds keyword.
+            return mn, mx, df
+        if target_time <= 0:
+            raise ValueError("%s: target_time must be > 0" % self._errprefix)
+        if df is None:
+            from passlib.utils.calibrate import calibrate_rounds
+            df = calibrate_rounds(handler, target_time)
+            if mn is not None and df < mn:
+                df = mn
+            if mx is not None and df > mx:
+                df = mx
+        return mn, mx, df
+
     def _init_rounds_options(self, mn, mx, df, vr):
         """parse options and compile efficient generate_rounds function"""
         #----------------------------------------------------
@@ -809,6 +989,33 @@ class _CryptRecord(object):
         if not (settings or self._has_rounds_options):
             self.genconfig = handler.genconfig
             self.encrypt = handler.encrypt
+        else:
+            self.encrypt = self._compile_encrypt()
+
+    def _compile_encrypt(self):
+        """build encrypt() wrapper specialized for this record's settings.
+
+        the returned function binds the handler & settings directly,
+        and only falls back to :meth:`_prepare_settings` when the caller
+        passes in keywords of its own (the uncommon case).
+        """
+        handler_encrypt = self.handler.encrypt
+        prepare = self._prepare_settings
+        settings = self.settings
+        gen = self._generate_rounds
+        if gen and "rounds" not in settings:
+            def encrypt(secret, **kwds):
+                if kwds:
+                    prepare(kwds)
+                    return handler_encrypt(secret, **kwds)
+                return handler_encrypt(secret, rounds=gen(), **settings)
+        else:
+            def encrypt(secret, **kwds):
+                if kwds:
+                    prepare(kwds)
+                    return handler_encrypt(secret, **kwds)
+                return handler_encrypt(secret, **settings)
+        return encrypt
 
     def genconfig(self, **kwds):
         """wrapper for handler.genconfig() which adds custom settings/rounds"""
@@ -869,26 +1076,48 @@ class _CryptRecord(object):
             self._min_verify_time = mvt
         else:
             # no mvt wrapper needed, so just use handler.verify directly
-            self.verify = self.handler.verify
+            handler_verify = self.verify = self.handler.verify
+            def verify_deferred(secret, hash, **context):
+                return handler_verify(secret, hash, **context), 0
+            self.verify_deferred = verify_deferred
 
     def verify(self, secret, hash, **context):
         """verify helper - adds min_verify_time delay"""
-        mvt = self._min_verify_time
-        assert mvt > 0, "wrapper should have been replaced for mvt=0"
+        result, delay = self.verify_deferred(secret, hash, **context)
+        if delay:
+            self._sleep(delay)
+        return result
+
+    def verify_deferred(self, secret, hash, **context):
+        """verify helper - returns ``(result, delay)``, where *delay* is
+        the remaining time (in seconds) a failed verify should be padded by
+        in order to satisfy min_verify_time (or ``0``).
+        """
+        assert self._min_verify_time > 0, "wrapper should have been replaced for mvt=0"
         start = tick()
         if self.handler.verify(secret, hash, **context):
-            return True
-        end = tick()
-        delta = mvt + start - end
+            return True, 0
+        return False, self._get_verify_delay(tick() - start)
+
+    def _get_verify_delay(self, elapsed):
+        """return delay needed to pad failed verify which took *elapsed* seconds"""
+        mvt = self._min_verify_time
+        delta = mvt - elapsed
         if delta > 0:
-            sleep(delta)
-        elif delta < 0:
-            # warn app they exceeded bounds (this might reveal
-            # relative costs of different hashes if under migration)
-            warn("CryptContext: verify exceeded min_verify_time: "
-                 "scheme=%r min_verify_time=%r elapsed=%r" %
-                 (self.scheme, mvt, end-start), PasslibConfigWarning)
-        return False
+            return delta
+        if delta < 0:
+            # count how often this happens, and warn app the first time
+            # (this might reveal relative costs of different hashes
+            # if under migration). warning every time would just flood logs.
+            # NOTE: overruns should be rare, so sharing one lock is fine.
+            with self._mvt_lock:
+                self._mvt_overruns += 1
+                count = self._mvt_overruns
+            if count == 1:
+                warn("CryptContext: verify exceeded min_verify_time: "
+                     "scheme=%r min_verify_time=%r elapsed=%r" %
+                     (self.scheme, mvt, elapsed), PasslibConfigWarning)
+        return 0
 
     #===================================================================
     # needs_update()
@@ -920,16 +1149,16 @@ class _CryptRecord(object):
         if self._has_rounds_bounds and hasattr(handler, "from_string"):
             self._has_rounds_introspection = True
 
-    def needs_update(self, hash, secret):
-        # init replaces this method entirely for this case.
-        ### check if handler has been deprecated
-        ##if self.deprecated:
-        ##    return True
+        self.needs_update = self._compile_needs_update()
+
+    def _compile_needs_update(self):
+        """build needs_update() function specialized for this record.
 
+        only the checks which can actually fire for this configuration
+        are included in the returned function.
+        """
         # check handler's detector if it provided one.
         check = self._needs_update
-        if check and check(hash, secret):
-            return True
 
         # XXX: should we use from_string() call below to check
         #      for config strings, and flag them as needing update?
@@ -937,25 +1166,36 @@ class _CryptRecord(object):
         #      or leave that as an explicitly undefined border case,
         #      to keep the codepath simpler & faster?
 
+        if not self._has_rounds_introspection:
+            if check:
+                def needs_update(hash, secret):
+                    return bool(check(hash, secret))
+            else:
+                def needs_update(hash, secret):
+                    return False
+            return needs_update
+
         # if we can parse rounds parameter, check if it's w/in bounds.
-        if self._has_rounds_introspection:
+        from_string = self.handler.from_string
+        mn = self._min_rounds
+        mx = self._max_rounds
+        def needs_update(hash, secret):
+            if check and check(hash, secret):
+                return True
             # XXX: this might be a good place to use parsehash()
-            hash_obj = self.handler.from_string(hash)
+            hash_obj = from_string(hash)
             try:
                 rounds = hash_obj.rounds
             except AttributeError: # pragma: no cover -- sanity check
                 # XXX: all builtin hashes should have rounds attr,
                 #      so should a warning be issues here?
-                pass
-            else:
-                mn = self._min_rounds
-                if mn is not None and rounds < mn:
-                    return True
-                mx = self._max_rounds
-                if mx and rounds > mx:
-                    return True
-
-        return False
+                return False
+            if mn is not None and rounds < mn:
+                return True
+            if mx and rounds > mx:
+                return True
+            return False
+        return needs_update
 
     #===================================================================
     # eoc
@@ -1005,11 +1245,21 @@ class _CryptConfig(object):
     # in order of schemes(). populated on demand by _get_record_list()
     _record_lists = None
 
+    # identify_record() dispatch tables - filled in by _init_identify_index().
+    # these map hash properties -> indexes into schemes / record lists.
+    _identify_prefixes = None # dict mapping prefix -> list of indexes
+    _identify_prefix_sizes = None # sorted tuple of distinct prefix lengths
+    _identify_sizes = None # dict mapping hash length -> list of indexes
+    _identify_wildcards = None # list of indexes which must always be checked
+    _identify_exact = None # set of indexes whose identify() is just a prefix check
+    _identify_cache = None # dict mapping dispatch key -> tuple of indexes
+
     #===================================================================
     # constructor
     #===================================================================
     def __init__(self, source):
         self._init_scheme_list(source.get((None,None,"schemes")))
+        self._init_identify_index()
         self._init_options(source)
         self._init_default_schemes()
         self._init_records()
@@ -1045,6 +1295,38 @@ class _CryptConfig(object):
         self.handlers = tuple(handlers)
         self.schemes = tuple(schemes)
 
+    def _init_identify_index(self):
+        """build dispatch tables used by identify_record().
+
+        each handler is filed under the prefixes its hashes must start with;
+        or failing that, under the exact length its hashes must have;
+        or failing that, as a "wildcard" which is checked against every hash.
+        """
+        prefixes = self._identify_prefixes = {}
+        sizes = self._identify_sizes = {}
+        wildcards = self._identify_wildcards = []
+        exact = self._identify_exact = set()
+        self._identify_cache = {}
+        for idx, handler in enumerate(self.handlers):
+            values = _get_identify_prefixes(handler)
+            if values:
+                for prefix in values:
+                    prefixes.setdefault(prefix, []).append(idx)
+                # if identify() does nothing besides check the same prefixes,
+                # a match in the dispatch table is enough to settle things.
+                owner = _get_defining_class(handler, "identify")
+                if owner is uh.HasManyIdents or (owner is uh.GenericHandler
+                                                 and handler.ident is not None):
+                    exact.add(idx)
+                continue
+            size = _get_identify_size(handler)
+            if size:
+                sizes.setdefault(size, []).append(idx)
+            else:
+                wildcards.append(idx)
+        self._identify_prefix_sizes = tuple(sorted(set(len(prefix)
+                                                       for prefix in prefixes)))
+
     #===================================================================
     # lowlevel options
     #===================================================================
@@ -1085,9 +1367,9 @@ class _CryptConfig(object):
                         option_map[key] = value
             else:
                 # normalize context option
-                if cat and key == "schemes":
-                    raise KeyError("'schemes' context option is not allowed "
-                                   "per category")
+                if cat and key in _global_context_options:
+                    raise KeyError("%r context option is not allowed "
+                                   "per category" % (key,))
                 key, value = norm_context_option(key, value)
 
                 # store in context_options
@@ -1152,6 +1434,19 @@ class _CryptConfig(object):
             value = float(value)
             if value < 0:
                 raise ValueError("'min_verify_time' must be >= 0")
+        elif key == "verify_cache":
+            if isinstance(value, str) and value.lower() in ("true", "false"):
+                value = (value.lower() == "true")
+            if value is True:
+                value = VerifyCache.ttl
+            else:
+                value = float(value or 0)
+                if value < 0:
+                    raise ValueError("'verify_cache' must be >= 0")
+        elif key == "verify_cache_size":
+            value = int(value)
+            if value < 1:
+                raise ValueError("'verify_cache_size' must be >= 1")
         elif key != "schemes":
             raise KeyError("unknown CryptContext keyword: %r" % (key,))
         return key, value
@@ -1408,6 +1703,14 @@ class _CryptConfig(object):
         # scheme not found in configuration for default category
         raise KeyError("crypt algorithm not found in policy: %r" % (scheme,))
 
+    def iter_records(self):
+        """iterate over all distinct _CryptRecord instances"""
+        seen = set()
+        for record in self._records.values():
+            if id(record) not in seen:
+                seen.add(id(record))
+                yield record
+
     def _get_record_list(self, category=None):
         """return list of records for category (cached)
 
@@ -1426,6 +1729,35 @@ class _CryptConfig(object):
             ]
         return value
 
+    def _get_identify_candidates(self, hash):
+        """return indexes of schemes which might identify hash (cached)
+
+        this is an internal helper used only by identify_record().
+        the indexes are returned in order of schemes(), so the first
+        match is the same as if every scheme had been checked.
+        """
+        if not isinstance(hash, unicode):
+            hash = uh.to_unicode_for_identify(hash)
+        prefixes = self._identify_prefixes
+        matched = [hash[:size] for size in self._identify_prefix_sizes
+                   if hash[:size] in prefixes]
+        size = len(hash)
+        if size not in self._identify_sizes:
+            size = None
+        key = (tuple(matched), size)
+        try:
+            return self._identify_cache[key]
+        except KeyError:
+            pass
+        # cache miss - merge the relevant buckets
+        value = set(self._identify_wildcards)
+        for prefix in matched:
+            value.update(prefixes[prefix])
+        if size is not None:
+            value.update(self._identify_sizes[size])
+        value = self._identify_cache[key] = tuple(sorted(value))
+        return value
+
     def identify_record(self, hash, category, required=True):
         """internal helper to identify appropriate _CryptRecord for hash"""
         # NOTE: this is part of the critical path shared by
@@ -1435,13 +1767,16 @@ class _CryptConfig(object):
         #        this will only return first match. might want to do something
         #        about this in future, but for now only hashes with
         #        unique identifiers will work properly in a CryptContext.
-        # XXX: if all handlers have a unique prefix (e.g. all are MCF / LDAP),
-        #      could use dict-lookup to speed up this search.
+        # NOTE: _get_identify_candidates() uses the handlers' prefixes
+        #       to narrow down which records need to be checked.
         if not isinstance(hash, unicode_or_bytes_types):
             raise ExpectedStringError(hash, "hash")
         # type check of category - handled by _get_record_list()
-        for record in self._get_record_list(category):
-            if record.identify(hash):
+        records = self._get_record_list(category)
+        exact = self._identify_exact
+        for idx in self._get_identify_candidates(hash):
+            record = records[idx]
+            if idx in exact or record.identify(hash):
                 return record
         if not required:
             return None
@@ -1505,6 +1840,143 @@ class _CryptConfig(object):
     # eoc
     #===================================================================
 
+#=============================================================================
+# _CryptStats helper class
+#=============================================================================
+class _CryptStats(object):
+    """collects call counts & latency histograms for CryptContext.
+
+    this is a helper used internally by CryptContext when stats are enabled
+    (see :meth:`CryptContext.enable_stats`). it wraps the methods of each
+    _CryptRecord with timing code; when stats are disabled, the records are
+    left untouched, so the normal code path has no extra overhead.
+
+    :arg callback:
+        optional callable invoked after each timed call, as
+        ``callback(op, scheme, category, backend, elapsed)``.
+    """
+    #===================================================================
+    # class attrs
+    #===================================================================
+
+    # upper bounds (in seconds) of histogram buckets;
+    # an implicit final bucket catches anything slower.
+    buckets = (.0001, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+
+    # record methods which are wrapped, and the op they're reported under.
+    # NOTE: verify() is only wrapped when it doesn't call verify_deferred()
+    #       itself (i.e. when min_verify_time isn't set), to avoid counting
+    #       calls twice. this also means min_verify_time padding isn't timed.
+    _wrapped_methods = [
+        ("encrypt", "encrypt"),
+        ("verify", "verify"),
+        ("verify_deferred", "verify"),
+        ("needs_update", "needs_update"),
+    ]
+
+    #===================================================================
+    # instance attrs
+    #===================================================================
+    callback = None
+
+    # dict mapping (op, scheme, category, backend) -> [count, total, max, hist]
+    _data = None
+
+    # lock protecting _data
+    _lock = None
+
+    #===================================================================
+    # init
+    #===================================================================
+    def __init__(self, callback=None):
+        if callback is not None and not callable(callback):
+            raise ExpectedTypeError(callback, "callable or None", "callback")
+        self.callback = callback
+        self._data = {}
+        self._lock = threading.Lock()
+
+    #===================================================================
+    # record wrapping
+    #===================================================================
+    def wrap_record(self, record):
+        """replace record's methods with timed versions"""
+        originals = record.__dict__.get("_stats_originals")
+        if originals is None:
+            originals = {}
+            for attr, _ in self._wrapped_methods:
+                if attr == "verify" and record._min_verify_time:
+                    continue
+                originals[attr] = getattr(record, attr)
+            record._stats_originals = originals
+        for attr, op in self._wrapped_methods:
+            if attr in originals:
+                setattr(record, attr, self._wrap(record, op, originals[attr]))
+
+    @staticmethod
+    def unwrap_record(record):
+        """restore record's original methods"""
+        originals = record.__dict__.pop("_stats_originals", None)
+        if originals:
+            for attr, func in iteritems(originals):
+                if attr in type(record).__dict__ and \
+                        getattr(func, "__self__", None) is record:
+                    # was bound method, let class attr show through again
+                    delattr(record, attr)
+                else:
+                    setattr(record, attr, func)
+
+    def _wrap(self, record, op, func):
+        """return timed wrapper for record method"""
+        scheme = record.scheme
+        category = record.category
+        get_backend = getattr(record.handler, "get_backend", None)
+        add = self.add
+        def wrapper(*args, **kwds):
+            start = tick()
+            result = func(*args, **kwds)
+            elapsed = tick() - start
+            add(op, scheme, category,
+                get_backend() if get_backend else None, elapsed)
+            return result
+        return wrapper
+
+    #===================================================================
+    # data collection
+    #===================================================================
+    def add(self, op, scheme, category, backend, elapsed):
+        """record a single timed call"""
+        key = (op, scheme, category, backend)
+        idx = bisect_left(self.buckets, elapsed)
+        with self._lock:
+            try:
+                entry = self._data[key]
+            except KeyError:
+                entry = self._data[key] = [0, 0, 0, [0] * (len(self.buckets)+1)]
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed > entry[2]:
+                entry[2] = elapsed
+            entry[3][idx] += 1
+        callback = self.callback
+        if callback:
+            callback(op, scheme, category, backend, elapsed)
+
+    def snapshot(self, reset=False):
+        """return copy of collected data, see :meth:`CryptContext.stats`"""
+        with self._lock:
+            data = self._data
+            if reset:
+                self._data = {}
+            return dict(
+                (key, dict(count=count, total=total, max=slowest,
+                           histogram=tuple(hist)))
+                for key, (count, total, slowest, hist) in iteritems(data)
+            )
+
+    #===================================================================
+    # eoc
+    #===================================================================
+
 #=============================================================================
 # main CryptContext class
 #=============================================================================
@@ -1547,6 +2019,20 @@ class CryptContext(object):
     _get_record = None
     _identify_record = None
 
+    # asyncio options - set via configure_async(), used by passlib.utils._async
+    _async_executor = None # executor for offloaded calls, or None for loop's default
+    _async_max_concurrency = None # max offloaded calls at once (per loop), or None
+    _async_semaphores = None # weak dict mapping event loop -> Semaphore
+
+    # custom function for padding verify() to min_verify_time, set via set_verify_sleep()
+    _verify_sleep = None
+
+    # _CryptStats instance, if enabled via enable_stats()
+    _stats = None
+
+    # VerifyCache instance, if enabled via the verify_cache option
+    _verify_cache = None
+
     #===================================================================
     # secondary constructors
     #===================================================================
@@ -1899,6 +2385,9 @@ class CryptContext(object):
         self._config = config
         self._get_record = config.get_record
         self._identify_record = config.identify_record
+        if self._verify_sleep or self._stats:
+            self._apply_record_hooks()
+        self._init_verify_cache()
 
     @staticmethod
     def _parse_config_key(ckey):
@@ -2559,8 +3048,16 @@ class CryptContext(object):
         # XXX: have record strip context kwds if scheme doesn't use them?
         # XXX: could insert normalization to preferred unicode encoding here
         # XXX: what about supporting a setter() callback ala django 1.4 ?
-        record = self._get_or_identify_record(hash, scheme, category)
-        return record.verify(secret, hash, **kwds)
+        if scheme:
+            record = self._get_or_identify_record(hash, scheme, category)
+        else:
+            # NOTE: inlined _get_or_identify_record() for the common case,
+            #       since this is the most heavily used context method.
+            record = self._identify_record(hash, category)
+        cache = self._verify_cache
+        if cache is None or kwds:
+            return record.verify(secret, hash, **kwds)
+        return self._verify_cached(cache, record, secret, hash)
 
     def verify_and_update(self, secret, hash, scheme=None, category=None, **kwds):
         """verify password and re-hash the password if needed, all in a single call.
@@ -2621,7 +3118,19 @@ class CryptContext(object):
         """
         # XXX: have record strip context kwds if scheme doesn't use them?
         # XXX: could insert normalization to preferred unicode encoding here.
-        record = self._get_or_identify_record(hash, scheme, category)
+        if scheme:
+            record = self._get_or_identify_record(hash, scheme, category)
+        else:
+            record = self._identify_record(hash, category)
+        cache = self._verify_cache
+        if cache is not None and not kwds:
+            if not record.needs_update(hash, secret):
+                return self._verify_cached(cache, record, secret, hash), None
+            # NOTE: bypassing cache when a rehash is pending,
+            #       so a replacement hash is never issued based on a cached result.
+            if not record.verify(secret, hash):
+                return False, None
+            return True, self.encrypt(secret, None, category)
         if not record.verify(secret, hash, **kwds):
             return False, None
         elif record.needs_update(hash, secret):
@@ -2630,6 +3139,582 @@ class CryptContext(object):
         else:
             return True, None
 
+    def verify_deferred(self, secret, hash, scheme=None, category=None, **kwds):
+        """variant of :meth:`verify` which doesn't sleep to satisfy
+        :ref:`min_verify_time <context-min-verify-time-option>`.
+
+        Accepts the same arguments as :meth:`verify`.
+        Instead of blocking the calling thread, this returns
+        a ``(verified, delay)`` tuple, where *delay* is the number of
+        seconds the caller should wait before reporting a failed login
+        (or ``0`` if no wait is needed). This allows applications running
+        under event loops (e.g. trio) to pad failed attempts using
+        their own sleep primitive.
+
+        .. versionadded:: 1.7
+        """
+        if scheme:
+            record = self._get_or_identify_record(hash, scheme, category)
+        else:
+            record = self._identify_record(hash, category)
+        cache = self._verify_cache
+        if cache is None or kwds:
+            return record.verify_deferred(secret, hash, **kwds)
+        key = self._get_verify_cache_key(cache, record, secret, hash)
+        if cache.check(key):
+            return True, 0
+        result = record.verify_deferred(secret, hash)
+        if result[0]:
+            cache.add(key)
+        return result
+
+    #===================================================================
+    # verify cache
+    #===================================================================
+    def _init_verify_cache(self):
+        """(re)create verify cache from current config (called by load)"""
+        old = self._verify_cache
+        if old is not None:
+            # wipe old entries, since config may have removed schemes
+            old.clear()
+        config = self._config
+        ttl = config.get_context_option_with_flag(None, "verify_cache")[0]
+        if ttl:
+            size = config.get_context_option_with_flag(None, "verify_cache_size")[0]
+            self._verify_cache = VerifyCache(size, ttl)
+        else:
+            self._verify_cache = None
+
+    @staticmethod
+    def _get_verify_cache_key(cache, record, secret, hash):
+        """return verify cache key for record, secret & hash"""
+        # NOTE: checking secret here, since handler won't see it on cache hit
+        uh.validate_secret(secret)
+        # NOTE: record's scheme & category are included, since the same
+        #       hash may verify differently when an explicit scheme is passed in.
+        return cache.digest(record.scheme, record.category or "", secret, hash)
+
+    def _verify_cached(self, cache, record, secret, hash):
+        """verify() helper which consults verify cache"""
+        key = self._get_verify_cache_key(cache, record, secret, hash)
+        if cache.check(key):
+            return True
+        if record.verify(secret, hash):
+            cache.add(key)
+            return True
+        return False
+
+    def clear_verify_cache(self):
+        """discard all entries in the :ref:`verify cache <context-verify-cache-option>`
+        (this is a noop if the cache isn't enabled).
+
+        .. versionadded:: 1.7
+        """
+        cache = self._verify_cache
+        if cache is not None:
+            cache.clear()
+
+    #===================================================================
+    # min_verify_time support
+    #===================================================================
+    def set_verify_sleep(self, func=None):
+        """set function used to pad failed :meth:`verify` calls
+        to :ref:`min_verify_time <context-min-verify-time-option>`.
+
+        :param func:
+            Callable with the signature ``func(seconds)``,
+            e.g. :func:`!gevent.sleep`, so that padding a failed login
+            yields to other greenlets instead of blocking the worker.
+            If ``None``, restores the default (:func:`!time.sleep`).
+
+        This setting persists across :meth:`load` and :meth:`update`,
+        but is not preserved by :meth:`copy`. Note that the asyncio methods
+        (:meth:`averify` etc) always use :func:`!asyncio.sleep`;
+        and :meth:`verify_deferred` leaves the wait up to the caller.
+
+        .. versionadded:: 1.7
+        """
+        if func is not None and not callable(func):
+            raise ExpectedTypeError(func, "callable or None", "func")
+        self._verify_sleep = func
+        self._apply_record_hooks()
+
+    def _apply_record_hooks(self):
+        """helper which applies custom sleep function & stats wrappers
+        to the current config's records (called again whenever it's replaced)"""
+        func = self._verify_sleep or sleep
+        stats = self._stats
+        for record in self._config.iter_records():
+            record._sleep = func
+            if stats:
+                stats.wrap_record(record)
+            else:
+                _CryptStats.unwrap_record(record)
+
+    def min_verify_time_overruns(self):
+        """report how often :meth:`verify` took longer than
+        :ref:`min_verify_time <context-min-verify-time-option>`.
+
+        Only the first overrun of each scheme / category issues a warning;
+        this method provides the running totals (reset when the
+        configuration is reloaded).
+
+        :returns:
+            dict mapping scheme name -> number of overruns
+            (only includes schemes which have had any).
+
+        .. versionadded:: 1.7
+        """
+        result = {}
+        for record in self._config.iter_records():
+            if record._mvt_overruns:
+                scheme = record.scheme
+                result[scheme] = result.get(scheme, 0) + record._mvt_overruns
+        return result
+
+    #===================================================================
+    # stats
+    #===================================================================
+    def enable_stats(self, callback=None):
+        """start collecting call counts and timing data.
+
+        Once enabled, every call to :meth:`encrypt`, :meth:`verify`
+        (and it's variants), and :meth:`needs_update` is timed,
+        and recorded under the scheme, user category, and backend
+        (as reported by the handler's :meth:`!get_backend` method,
+        or ``None`` for handlers with only a single backend).
+        This helps track down whether a latency change is due
+        to rounds drift, a backend change, or a shift in which schemes
+        are being used.
+
+        :param callback:
+            Optional callable which will be invoked after each timed call,
+            as ``callback(op, scheme, category, backend, elapsed)``;
+            e.g. for forwarding data to an external metrics system.
+            *op* is one of ``"encrypt"``, ``"verify"``, or ``"needs_update"``.
+
+        Calling this again will replace the callback, and discard
+        any data collected so far. Stats are preserved across :meth:`load`,
+        but not by :meth:`copy`.
+        When stats aren't enabled, there is no overhead.
+
+        .. note::
+
+            Only calls which complete successfully are recorded.
+            For failed :meth:`verify` calls,
+            :ref:`min_verify_time <context-min-verify-time-option>`
+            padding isn't included in the reported time.
+            Work done by :meth:`verify_many` in a process pool isn't recorded.
+
+        .. versionadded:: 1.7
+        """
+        self._stats = _CryptStats(callback)
+        self._apply_record_hooks()
+
+    def disable_stats(self):
+        """stop collecting timing data, and discard anything collected.
+
+        .. versionadded:: 1.7
+        """
+        if self._stats:
+            self._stats = None
+            self._apply_record_hooks()
+
+    def stats(self, reset=False):
+        """return snapshot of data collected since :meth:`enable_stats`.
+
+        :param reset:
+            if ``True``, clears the collected data after taking the snapshot.
+
+        :returns:
+            dict mapping ``(op, scheme, category, backend)`` to a dict
+            containing the following keys:
+
+            * ``count`` -- number of calls.
+            * ``total`` -- total time spent in those calls, in seconds.
+            * ``max`` -- slowest call, in seconds.
+            * ``histogram`` -- tuple of call counts, one for each bucket in
+              :attr:`!CryptContext.stats_buckets` (the upper bound, in seconds,
+              of each bucket), plus a final count for slower calls.
+
+        :raises RuntimeError: if stats haven't been enabled.
+
+        .. versionadded:: 1.7
+        """
+        if not self._stats:
+            raise RuntimeError("stats not enabled, see CryptContext.enable_stats()")
+        return self._stats.snapshot(reset)
+
+    #: upper bounds of histogram buckets reported by :meth:`stats`
+    stats_buckets = _CryptStats.buckets
+
+    #===================================================================
+    # batch api
+    #===================================================================
+
+    # NOTE: the batch methods group their inputs by _CryptRecord,
+    #       and hand each worker a homogenous chunk of work.
+    #       records whose backend releases the GIL are run in a thread pool;
+    #       everything else is assumed to be pure-python, and is run in a
+    #       process pool (unless the handler isn't registered, in which
+    #       case it probably can't be pickled, and threads are used instead).
+
+    def _parse_batch_items(self, items, scheme, category):
+        """helper for batch methods - returns list of ``(record, secret, hash, kwds)``"""
+        get_record = self._get_or_identify_record
+        result = []
+        for item in items:
+            if len(item) == 3:
+                secret, hash, kwds = item
+                kwds = kwds or {}
+            else:
+                secret, hash = item
+                kwds = {}
+            result.append((get_record(hash, scheme, category), secret, hash, kwds))
+        return result
+
+    @staticmethod
+    def _get_batch_pool(pools, kind, workers):
+        """helper for batch methods - return pool of specified kind
+        (``"process"`` or ``"thread"``) from *pools* dict, creating it if needed."""
+        pool = pools.get(kind)
+        if pool is None:
+            from multiprocessing.pool import Pool, ThreadPool
+            pool = pools[kind] = (Pool if kind == "process" else ThreadPool)(workers)
+        return pool
+
+    @staticmethod
+    def _close_batch_pools(pools):
+        """helper for batch methods - shut down pools created by _get_batch_pool()"""
+        for pool in pools.values():
+            pool.terminate()
+        pools.clear()
+
+    def _run_batch(self, attr, jobs, workers, executor, chunksize, pools=None):
+        """helper for batch methods - invokes method of each record.
+
+        :arg attr: name of record / handler method to call.
+        :arg jobs: list of ``(record, args, kwds)`` tuples.
+        :param pools:
+            optional dict of pools to use / reuse (see :meth:`_get_batch_pool`).
+            if not provided, any pools needed are created & shut down by this call.
+        :returns: list of results, in same order as *jobs*.
+        """
+        results = [None] * len(jobs)
+
+        # run everything in current thread if no pool was requested.
+        if executor is None and (workers is None or workers < 2):
+            for idx, (record, args, kwds) in enumerate(jobs):
+                results[idx] = getattr(record, attr)(*args, **kwds)
+            return results
+
+        # group jobs by record
+        groups = {}
+        order = []
+        for idx, (record, args, kwds) in enumerate(jobs):
+            try:
+                group = groups[record]
+            except KeyError:
+                group = groups[record] = []
+                order.append(record)
+            group.append((idx, args, kwds))
+
+        # split groups into chunks, and decide which pool each should use.
+        # NOTE: record methods may be closures, so they can only be passed
+        #       to pools which run tasks in this process. everything else
+        #       is sent as a (handler name, attr) tuple, which can be pickled.
+        in_process = executor is None or _is_thread_executor(executor)
+        threaded = []
+        pickled = []
+        for record in order:
+            group = groups[record]
+            handler = record.handler
+            registered = _is_handler_registered(handler)
+            if in_process and (_releases_gil(handler) or not registered):
+                func = getattr(record, attr)
+                target = threaded
+            else:
+                func = (handler.name if registered else handler, attr)
+                target = pickled
+            size = chunksize or max(1, -(-len(group) // (4 * (workers or 1))))
+            for start in irange(0, len(group), size):
+                chunk = group[start:start+size]
+                target.append(([(idx, record) for idx, _, _ in chunk],
+                               (func, [(args, kwds) for _, args, kwds in chunk])))
+
+        # dispatch chunks to the executor / pools
+        if executor is not None:
+            tasks = threaded + pickled
+            outputs = executor.map(_call_batch, [task for _, task in tasks])
+        else:
+            owns_pools = pools is None
+            if owns_pools:
+                pools = {}
+            try:
+                if pickled:
+                    pool = self._get_batch_pool(pools, "process", workers)
+                    pending = pool.map_async(_call_batch,
+                                             [task for _, task in pickled])
+                if threaded:
+                    pool = self._get_batch_pool(pools, "thread", workers)
+                    outputs = pool.map(_call_batch,
+                                       [task for _, task in threaded])
+                else:
+                    outputs = []
+                if pickled:
+                    outputs += pending.get()
+            finally:
+                if owns_pools:
+                    self._close_batch_pools(pools)
+            tasks = threaded + pickled
+
+        # reassemble results in original order
+        for (positions, _), values in zip(tasks, outputs):
+            for (idx, _), value in zip(positions, values):
+                results[idx] = value
+
+        # pickled calls bypassed the records, so apply the stats
+        # and min_verify_time padding they would have recorded.
+        if pickled:
+            stats = self._stats
+            delay = 0
+            for positions, _ in pickled:
+                for idx, record in positions:
+                    value, elapsed = results[idx]
+                    results[idx] = value
+                    if stats:
+                        handler = record.handler
+                        stats.add(attr, record.scheme, record.category,
+                                  handler.get_backend() if hasattr(handler, "get_backend") else None,
+                                  elapsed)
+                    if attr == "verify" and not value and record._min_verify_time:
+                        delay = max(delay, record._get_verify_delay(elapsed))
+            if delay:
+                (self._verify_sleep or sleep)(delay)
+        return results
+
+    def verify_many(self, items, scheme=None, category=None, workers=None,
+                    executor=None, chunksize=None):
+        """verify a batch of secrets against their hashes.
+
+        This is equivalent to calling :meth:`verify` for each element
+        of *items*, but can spread the work across a pool of workers.
+
+        :arg items:
+            iterable of ``(secret, hash)`` or ``(secret, hash, kwds)`` tuples,
+            where *kwds* is an optional dict of additional keywords
+            to pass to the handler (as with :meth:`verify`).
+
+        :type scheme: str or None
+        :param scheme:
+            Optionally force context to use specific scheme for all items.
+
+        :type category: str or None
+        :param category:
+            Optional :ref:`user category <user-categories>` string.
+
+        :type workers: int or None
+        :param workers:
+            Number of workers to use. If omitted, and no *executor* is provided,
+            all the items will be verified serially in the current thread.
+            Otherwise, handlers whose backend releases the GIL (e.g. bcrypt's
+            ``"bcrypt"`` backend, or any ``"os_crypt"`` backend when
+            :mod:`passlib.utils.oscrypt` is using ``crypt_r()`` or a process pool)
+            will be run in a thread pool, and all other
+            handlers will be run in a process pool.
+            Either way, calls are counted by :meth:`stats`;
+            and if :ref:`min_verify_time <context-min-verify-time-option>` is set,
+            a batch containing failed verifies is padded by the largest
+            delay needed (the serial path pads each call individually).
+            Batch methods never consult the ``verify_cache``, regardless of *workers*.
+
+        :param executor:
+            Optional executor object to use instead of creating
+            a private pool (e.g. a :class:`!multiprocessing.Pool`,
+            or a :mod:`!concurrent.futures` executor). It must provide
+            a ``map(func, iterable)`` method. Unless it's a
+            :class:`!multiprocessing.pool.ThreadPool` or :class:`!concurrent.futures.ThreadPoolExecutor`,
+            it's assumed to run tasks in other processes, so tasks are sent
+            in a form which can be pickled (custom handlers must be
+            importable by the worker processes).
+
+        :type chunksize: int or None
+        :param chunksize:
+            Optional number of items to hand each worker at once.
+            By default, each scheme's items are divided into ``4 * workers`` chunks.
+
+        :returns:
+            list of ``True`` / ``False`` values, in the same order as *items*.
+
+        :raises TypeError, ValueError:
+            For the same reasons as :meth:`verify`.
+            Note that all the hashes are identified before any are verified.
+
+        .. versionadded:: 1.7
+        """
+        jobs = [(record, (secret, hash), kwds) for record, secret, hash, kwds
+                in self._parse_batch_items(items, scheme, category)]
+        return self._run_batch("verify", jobs, workers, executor, chunksize)
+
+    def verify_and_update_many(self, items, scheme=None, category=None,
+                               workers=None, executor=None, chunksize=None):
+        """verify a batch of secrets, and re-hash any which need updating.
+
+        This is equivalent to calling :meth:`verify_and_update` for each
+        element of *items*, and accepts the same arguments as :meth:`verify_many`.
+
+        :returns:
+            list of ``(verified, replacement_hash)`` tuples,
+            in the same order as *items*.
+
+        .. versionadded:: 1.7
+        """
+        entries = self._parse_batch_items(items, scheme, category)
+        jobs = [(record, (secret, hash), kwds)
+                for record, secret, hash, kwds in entries]
+        # NOTE: sharing pools between both batches, so they're only started once.
+        pools = {}
+        try:
+            verified = self._run_batch("verify", jobs, workers, executor,
+                                       chunksize, pools)
+
+            # re-hash secrets which verified, but need updating,
+            # using the default scheme for the category.
+            # NOTE: settings (e.g. rounds) are prepared here, so they're chosen
+            #       the same way no matter what process does the hashing.
+            jobs = []
+            positions = []
+            for idx, (record, secret, hash, kwds) in enumerate(entries):
+                if verified[idx] and record.needs_update(hash, secret):
+                    target = self._get_record(None, category)
+                    kwds = kwds.copy()
+                    target._prepare_settings(kwds)
+                    jobs.append((target, (secret,), kwds))
+                    positions.append(idx)
+            updated = self._run_batch("encrypt", jobs, workers, executor,
+                                      chunksize, pools)
+        finally:
+            self._close_batch_pools(pools)
+
+        results = [(ok, None) for ok in verified]
+        for idx, new_hash in zip(positions, updated):
+            results[idx] = (True, new_hash)
+        return results
+
+    def encrypt_many(self, secrets, scheme=None, category=None, workers=None,
+                     executor=None, chunksize=None, **kwds):
+        """encrypt a batch of secrets.
+
+        This is equivalent to calling :meth:`encrypt` for each element
+        of *secrets*, and accepts the same *workers*, *executor*,
+        and *chunksize* arguments as :meth:`verify_many`.
+
+        :arg secrets: iterable of secrets to encrypt.
+
+        :param \*\*kwds:
+            All other keyword options are passed to the selected algorithm's
+            :meth:`PasswordHash.encrypt() <passlib.ifc.PasswordHash.encrypt>` method,
+            as with :meth:`encrypt`.
+
+        :returns:
+            list of hashes, in the same order as *secrets*.
+
+        .. versionadded:: 1.7
+        """
+        record = self._get_record(scheme, category)
+        # NOTE: settings (e.g. rounds) are prepared here, so they're chosen
+        #       the same way no matter what process does the hashing.
+        jobs = []
+        for secret in secrets:
+            settings = kwds.copy()
+            record._prepare_settings(settings)
+            jobs.append((record, (secret,), settings))
+        return self._run_batch("encrypt", jobs, workers, executor, chunksize)
+
+    #===================================================================
+    # asyncio api
+    #===================================================================
+
+    # NOTE: the coroutines themselves live in passlib.utils._async,
+    #       since they require python 3.5+ syntax. the methods below
+    #       just return the coroutine objects, which the caller awaits.
+
+    def configure_async(self, executor=None, max_concurrency=None):
+        """configure how the asyncio methods offload work.
+
+        :param executor:
+            :class:`concurrent.futures.Executor` which hashes should be
+            calculated in. Defaults to the event loop's default executor.
+
+        :type max_concurrency: int or None
+        :param max_concurrency:
+            If set, limits how many hashes this context will calculate at once
+            (separately for each event loop). Additional calls will wait
+            for a free slot *before* being submitted to the executor,
+            so a flood of login attempts can't fill the executor's queue.
+
+        These settings are not preserved by :meth:`copy`.
+
+        .. versionadded:: 1.7
+        """
+        if max_concurrency is not None:
+            if not isinstance(max_concurrency, int):
+                raise ExpectedTypeError(max_concurrency, "int or None",
+                                        "max_concurrency")
+            if max_concurrency < 1:
+                raise ValueError("max_concurrency must be >= 1")
+        self._async_executor = executor
+        self._async_max_concurrency = max_concurrency
+        self._async_semaphores = None
+
+    @staticmethod
+    def _load_async():
+        """helper which imports async implementation"""
+        if sys.version_info < (3,5):
+            raise NotImplementedError("asyncio methods require Python 3.5 or newer")
+        import passlib.utils._async as mod
+        return mod
+
+    def averify(self, secret, hash, scheme=None, category=None, **kwds):
+        """asyncio version of :meth:`verify`.
+
+        The hash is calculated in the executor configured via
+        :meth:`configure_async`, so the event loop isn't blocked.
+        If :ref:`min_verify_time <context-min-verify-time-option>` is set,
+        failed attempts are padded using :func:`!asyncio.sleep`,
+        rather than by holding an executor thread.
+
+        Accepts the same arguments as :meth:`verify`; and returns a coroutine
+        which resolves to ``True`` or ``False``.
+
+        .. versionadded:: 1.7
+        """
+        return self._load_async().averify(self, secret, hash, scheme,
+                                          category, kwds)
+
+    def aencrypt(self, secret, scheme=None, category=None, **kwds):
+        """asyncio version of :meth:`encrypt`.
+
+        Accepts the same arguments as :meth:`encrypt`; and returns a coroutine
+        which resolves to the new hash.
+
+        .. versionadded:: 1.7
+        """
+        return self._load_async().aencrypt(self, secret, scheme, category,
+                                           kwds)
+
+    def averify_and_update(self, secret, hash, scheme=None, category=None,
+                           **kwds):
+        """asyncio version of :meth:`verify_and_update`.
+
+        Accepts the same arguments as :meth:`verify_and_update`; and returns
+        a coroutine which resolves to a ``(verified, replacement_hash)`` tuple.
+
+        .. versionadded:: 1.7
+        """
+        return self._load_async().averify_and_update(self, secret, hash,
+                                                     scheme, category, kwds)
+
     #===================================================================
     # eoc
     #===================================================================
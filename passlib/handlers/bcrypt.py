@@ -225,6 +225,95 @@ class bcrypt(uh.HasManyIdents, uh.HasRounds, uh.HasSalt, uh.HasManyBackends, uh.
                 PasslibHashWarning)
         return checksum
 
+    #===================================================================
+    # verify cache
+    #===================================================================
+
+    # VerifyCache instance, set by enable_verify_cache().
+    # NOTE: this is looked up via _get_verify_cache(), so each subclass
+    #       (e.g. bcrypt_sha256) has its own cache, rather than inheriting ours.
+    _verify_cache = None
+
+    @classmethod
+    def _get_verify_cache(cls):
+        """return VerifyCache enabled for this class (ignoring parents), or ``None``"""
+        return cls.__dict__.get("_verify_cache")
+
+    @classmethod
+    def enable_verify_cache(cls, max_entries=1024, ttl=60):
+        """enable cache of successful :meth:`verify` calls (disabled by default).
+        Each class has its own cache, so enabling it for :class:`bcrypt`
+        doesn't affect subclasses such as :class:`bcrypt_sha256`.
+
+        This lets bursts of logins for the same user (retries, token refresh, etc)
+        skip the expensive key schedule after the first one.
+        Only successful verifications are cached, under an HMAC of
+        the hash & secret (using a random per-process key),
+        so the secret itself is never retained.
+
+        :param max_entries:
+            max number of entries to keep; least recently used entries
+            are evicted once this is exceeded.
+
+        :param ttl:
+            number of seconds a successful verification is remembered for.
+
+        .. warning::
+
+            Once a password has been changed, the old one will continue
+            to verify against the *old* hash until the entry expires.
+            Applications should call :meth:`invalidate_verify_cache`
+            with the old hash when changing a password.
+
+        .. versionadded:: 1.7
+        """
+        from passlib.utils.verify_cache import VerifyCache
+        cls.disable_verify_cache()
+        cls._verify_cache = VerifyCache(max_entries, ttl)
+
+    @classmethod
+    def disable_verify_cache(cls):
+        """disable (and wipe) the cache enabled by :meth:`enable_verify_cache`
+
+        .. versionadded:: 1.7
+        """
+        cache = cls._get_verify_cache()
+        if cache is not None:
+            cache.clear()
+            cls._verify_cache = None
+
+    @classmethod
+    def invalidate_verify_cache(cls, hash=None):
+        """remove any cached verifications for the specified hash
+        (or all entries if no hash is provided).
+        this is a noop if the cache isn't enabled.
+
+        .. versionadded:: 1.7
+        """
+        cache = cls._get_verify_cache()
+        if cache is None:
+            return
+        if hash is None:
+            cache.clear()
+        else:
+            hash = to_unicode(hash, "ascii", "hash")
+            cache.discard_matching(lambda key: key[0] == hash)
+
+    @classmethod
+    def verify(cls, secret, hash, **context):
+        cache = cls._get_verify_cache()
+        if cache is None:
+            return super(bcrypt, cls).verify(secret, hash, **context)
+        uh.validate_secret(secret)
+        hash = to_unicode(hash, "ascii", "hash")
+        key = (hash, cache.digest(hash, secret))
+        if cache.check(key):
+            return True
+        if super(bcrypt, cls).verify(secret, hash, **context):
+            cache.add(key)
+            return True
+        return False
+
     #===================================================================
     # backend configuration
     #===================================================================
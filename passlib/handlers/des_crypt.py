@@ -8,9 +8,9 @@ import logging; log = logging.getLogger(__name__)
 from warnings import warn
 # site
 # pkg
-from passlib.utils import h64, h64big, safe_crypt, test_crypt, to_unicode
+from passlib.utils import consteq, h64, h64big, safe_crypt, test_crypt, to_unicode
 from passlib.utils.compat import byte_elem_value, u, uascii_to_str, unicode
-from passlib.utils.des import des_encrypt_int_block
+from passlib.utils.des import get_des_engine, des_encrypt_int_blocks
 import passlib.utils.handlers as uh
 # local
 __all__ = [
@@ -25,6 +25,9 @@ __all__ = [
 #=============================================================================
 _BNULL = b'\x00'
 
+# DES engine used by default (see get_des_engine())
+_default_engine = get_des_engine()
+
 def _crypt_secret_to_key(secret):
     """convert secret to 64-bit DES key.
 
@@ -39,7 +42,7 @@ def _crypt_secret_to_key(secret):
     return sum((byte_elem_value(c) & 0x7f) << (57-i*8)
                for i, c in enumerate(secret[:8]))
 
-def _raw_des_crypt(secret, salt):
+def _raw_des_crypt(secret, salt, engine=_default_engine):
     """pure-python backed for des_crypt"""
     assert len(salt) == 2
 
@@ -64,12 +67,27 @@ def _raw_des_crypt(secret, salt):
     key_value = _crypt_secret_to_key(secret)
 
     # run data through des using input of 0
-    result = des_encrypt_int_block(key_value, 0, salt_value, 25)
+    result = engine(key_value, 0, salt_value, 25)
 
     # run h64 encode on result
     return h64big.encode_int64(result)
 
-def _bsdi_secret_to_key(secret):
+def _raw_des_crypt_many(secrets, salts):
+    """pure-python backend for des_crypt, for a batch of secrets
+    (one salt per secret); uses the bitsliced DES engine."""
+    keys = []
+    for secret in secrets:
+        if isinstance(secret, unicode):
+            secret = secret.encode("utf-8")
+        assert isinstance(secret, bytes)
+        if _BNULL in secret:
+            raise uh.exc.NullPasswordError(des_crypt)
+        keys.append(_crypt_secret_to_key(secret))
+    salt_values = [h64.decode_int12(salt) for salt in salts]
+    results = des_encrypt_int_blocks(keys, 0, salt_values, 25)
+    return [h64big.encode_int64(result) for result in results]
+
+def _bsdi_secret_to_key(secret, engine=_default_engine):
     """convert secret to DES key used by bsdi_crypt"""
     key_value = _crypt_secret_to_key(secret)
     idx = 8
@@ -77,11 +95,11 @@ def _bsdi_secret_to_key(secret):
     while idx < end:
         next = idx + 8
         tmp_value = _crypt_secret_to_key(secret[idx:next])
-        key_value = des_encrypt_int_block(key_value, key_value) ^ tmp_value
+        key_value = engine(key_value, key_value, 0, 1) ^ tmp_value
         idx = next
     return key_value
 
-def _raw_bsdi_crypt(secret, rounds, salt):
+def _raw_bsdi_crypt(secret, rounds, salt, engine=_default_engine):
     """pure-python backend for bsdi_crypt"""
 
     # decode salt
@@ -97,10 +115,10 @@ def _raw_bsdi_crypt(secret, rounds, salt):
         raise uh.exc.NullPasswordError(bsdi_crypt)
 
     # convert secret string into an integer
-    key_value = _bsdi_secret_to_key(secret)
+    key_value = _bsdi_secret_to_key(secret, engine)
 
     # run data through des using input of 0
-    result = des_encrypt_int_block(key_value, 0, salt_value, rounds)
+    result = engine(key_value, 0, salt_value, rounds)
 
     # run h64 encode on result
     return h64big.encode_int64(result)
@@ -191,12 +209,77 @@ class des_crypt(uh.HasManyBackends, uh.HasSalt, uh.GenericHandler):
     #---------------------------------------------------------------
     # builtin backend
     #---------------------------------------------------------------
+    #: DES engine used by builtin backend (see :func:`~passlib.utils.des.get_des_engine`)
+    des_engine = "table"
+
     @classmethod
     def _load_backend_builtin(cls):
         return cls._calc_checksum_builtin
 
     def _calc_checksum_builtin(self, secret):
-        return _raw_des_crypt(secret, self.salt.encode("ascii")).decode("ascii")
+        return _raw_des_crypt(secret, self.salt.encode("ascii"),
+                              get_des_engine(self.des_engine)).decode("ascii")
+
+    #===================================================================
+    # batch api
+    #===================================================================
+    @classmethod
+    def _calc_checksum_many(cls, secrets, salts):
+        """return list of checksums for each secret & salt"""
+        if cls.get_backend() == "builtin":
+            return [chk.decode("ascii") for chk in _raw_des_crypt_many(
+                secrets, [salt.encode("ascii") for salt in salts])]
+        return [cls(salt=salt)._calc_checksum(secret)
+                for secret, salt in zip(secrets, salts)]
+
+    @classmethod
+    def encrypt_many(cls, secrets, **kwds):
+        """encrypt a batch of secrets.
+
+        This is equivalent to calling :meth:`~passlib.ifc.PasswordHash.encrypt`
+        for each of *secrets* (and accepts the same keywords),
+        returning a list of hashes in the same order.
+
+        When the builtin backend is in use, the batch is encrypted using the
+        bitsliced engine (see :func:`~passlib.utils.des.des_encrypt_int_blocks`),
+        which is many times faster than encrypting them one at a time
+        for batches of a hundred or more.
+
+        .. versionadded:: 1.7
+        """
+        secrets = list(secrets)
+        for secret in secrets:
+            uh.validate_secret(secret)
+        objs = [cls(use_defaults=True, **kwds) for _ in secrets]
+        checksums = cls._calc_checksum_many(secrets, [obj.salt for obj in objs])
+        for obj, checksum in zip(objs, checksums):
+            obj.checksum = checksum
+        return [obj.to_string() for obj in objs]
+
+    @classmethod
+    def verify_many(cls, items):
+        """verify a batch of ``(secret, hash)`` pairs.
+
+        This is equivalent to calling :meth:`~passlib.ifc.PasswordHash.verify`
+        for each pair, returning a list of ``True`` / ``False`` values
+        in the same order; and uses the bitsliced engine in the same
+        way as :meth:`encrypt_many`. This makes it well suited to bulk audits,
+        where candidate passwords are checked against many hashes.
+
+        .. versionadded:: 1.7
+        """
+        secrets = []
+        objs = []
+        for secret, hash in items:
+            uh.validate_secret(secret)
+            obj = cls.from_string(hash)
+            if obj.checksum is None:
+                raise uh.exc.MissingDigestError(cls)
+            secrets.append(secret)
+            objs.append(obj)
+        checksums = cls._calc_checksum_many(secrets, [obj.salt for obj in objs])
+        return [consteq(checksum, obj.checksum)
+                for checksum, obj in zip(checksums, objs)]
 
     #===================================================================
     # eoc
@@ -339,12 +422,16 @@ class bsdi_crypt(uh.HasManyBackends, uh.HasRounds, uh.HasSalt, uh.GenericHandler
     #---------------------------------------------------------------
     # builtin backend
     #---------------------------------------------------------------
+    #: DES engine used by builtin backend (see :func:`~passlib.utils.des.get_des_engine`)
+    des_engine = "table"
+
     @classmethod
     def _load_backend_builtin(cls):
         return cls._calc_checksum_builtin
 
     def _calc_checksum_builtin(self, secret):
-        return _raw_bsdi_crypt(secret, self.rounds, self.salt.encode("ascii")).decode("ascii")
+        return _raw_bsdi_crypt(secret, self.rounds, self.salt.encode("ascii"),
+                               get_des_engine(self.des_engine)).decode("ascii")
 
     #===================================================================
     # eoc
@@ -508,13 +595,13 @@ class crypt16(uh.HasSalt, uh.GenericHandler):
         key1 = _crypt_secret_to_key(secret)
 
         # run data through des using input of 0
-        result1 = des_encrypt_int_block(key1, 0, salt_value, 20)
+        result1 = _default_engine(key1, 0, salt_value, 20)
 
         # convert next 8 bytes of secret string into integer (key=0 if secret < 8 chars)
         key2 = _crypt_secret_to_key(secret[8:16])
 
         # run data through des using input of 0
-        result2 = des_encrypt_int_block(key2, 0, salt_value, 5)
+        result2 = _default_engine(key2, 0, salt_value, 5)
 
         # done
         chk = h64big.encode_int64(result1) + h64big.encode_int64(result2)
@@ -40,19 +40,14 @@ _c_digest_offsets = (
 # map used to transpose bytes when encoding final digest
 _transpose_map = (12, 6, 0, 13, 7, 1, 14, 8, 2, 15, 9, 3, 5, 10, 4, 11)
 
-def _raw_md5_crypt(pwd, salt, use_apr=False):
-    """perform raw md5-crypt calculation
+def _md5_crypt_digest_a(pwd, salt, use_apr):
+    """validate inputs, and calculate md5-crypt's initial digest (A).
 
-    this function provides a pure-python implementation of the internals
-    for the MD5-Crypt algorithms; it doesn't handle any of the
-    parsing/validation of the hash strings themselves.
-
-    :arg pwd: password chars/bytes to encrypt
-    :arg salt: salt chars to use
-    :arg use_apr: use apache variant
+    this is shared by :func:`_raw_md5_crypt` and :func:`_fast_md5_crypt`,
+    which differ only in how they perform the 1000 rounds of digest C.
 
     :returns:
-        encoded checksum chars
+        ``(pwd, salt, da)`` -- password & salt as bytes, and raw digest A.
     """
     # NOTE: regarding 'apr' format:
     # really, apache? you had to invent a whole new "$apr1$" format,
@@ -114,7 +109,23 @@ def _raw_md5_crypt(pwd, salt, use_apr=False):
         i >>= 1
 
     # finish A
-    da = a_ctx.digest()
+    return pwd, salt, a_ctx.digest()
+
+def _raw_md5_crypt(pwd, salt, use_apr=False):
+    """perform raw md5-crypt calculation
+
+    this function provides a pure-python implementation of the internals
+    for the MD5-Crypt algorithms; it doesn't handle any of the
+    parsing/validation of the hash strings themselves.
+
+    :arg pwd: password chars/bytes to encrypt
+    :arg salt: salt chars to use
+    :arg use_apr: use apache variant
+
+    :returns:
+        encoded checksum chars
+    """
+    pwd, salt, da = _md5_crypt_digest_a(pwd, salt, use_apr)
 
     #===================================================================
     # digest C - for a 1000 rounds, combine A, S, and P
@@ -185,6 +196,50 @@ def _raw_md5_crypt(pwd, salt, use_apr=False):
     #===================================================================
     return h64.encode_transposed_bytes(dc, _transpose_map).decode("ascii")
 
+def _fast_md5_crypt(pwd, salt, use_apr=False):
+    """faster version of :func:`_raw_md5_crypt`, same arguments & result.
+
+    since the odd rounds all have the form ``md5(perm + digest)``, this
+    precomputes an md5 state for each of the 6 permutations, and copies it
+    for each round, rather than concatenating a new string each time
+    (for long passwords, this also skips re-hashing the permutation's
+    leading blocks).
+    """
+    pwd, salt, dc = _md5_crypt_digest_a(pwd, salt, use_apr)
+
+    # prepare the 6 combinations of pwd & salt, as in _raw_md5_crypt(),
+    # along with copy() method of an md5 state for each one.
+    pwd_pwd = pwd+pwd
+    pwd_salt = pwd+salt
+    perms = [pwd, pwd_pwd, pwd_salt, pwd_salt+pwd, salt+pwd, salt+pwd_pwd]
+    copies = [md5(perm).copy for perm in perms]
+    data = [(perms[even], copies[odd]) for even, odd in _c_digest_offsets]
+
+    # perform 23 blocks of 42 rounds each (for a total of 966 rounds)
+    # NOTE: flattening this into a single 500-entry loop was measured as
+    #       slower, since building the schedule costs more than it saves.
+    blocks = 23
+    while blocks:
+        for even, odd_copy in data:
+            ctx = odd_copy()
+            ctx.update(md5(dc + even).digest())
+            dc = ctx.digest()
+        blocks -= 1
+
+    # perform 17 more pairs of rounds (34 more rounds, for a total of 1000)
+    for even, odd_copy in data[:17]:
+        ctx = odd_copy()
+        ctx.update(md5(dc + even).digest())
+        dc = ctx.digest()
+
+    return h64.encode_transposed_bytes(dc, _transpose_map).decode("ascii")
+
+# map of engine name -> md5-crypt implementation, used by the builtin backends
+_md5_engines = {
+    "fast": _fast_md5_crypt,
+    "reference": _raw_md5_crypt,
+}
+
 #=============================================================================
 # handler
 #=============================================================================
@@ -203,6 +258,10 @@ class _MD5_Common(uh.HasSalt, uh.GenericHandler):
     max_salt_size = 8
     salt_chars = uh.HASH64_CHARS
 
+    #: which pure-python implementation to use (see :data:`_md5_engines`);
+    #: ``"reference"`` selects the original, easier to follow, implementation.
+    md5_engine = "fast"
+
     #===================================================================
     # methods
     #===================================================================
@@ -290,7 +349,7 @@ class md5_crypt(uh.HasManyBackends, _MD5_Common):
         return cls._calc_checksum_builtin
 
     def _calc_checksum_builtin(self, secret):
-        return _raw_md5_crypt(secret, self.salt)
+        return _md5_engines[self.md5_engine](secret, self.salt)
 
     #===================================================================
     # eoc
@@ -329,7 +388,7 @@ class apr_md5_crypt(_MD5_Common):
     # methods
     #===================================================================
     def _calc_checksum(self, secret):
-        return _raw_md5_crypt(secret, self.salt, use_apr=True)
+        return _md5_engines[self.md5_engine](secret, self.salt, use_apr=True)
 
     #===================================================================
     # eoc
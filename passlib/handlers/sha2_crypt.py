@@ -52,20 +52,14 @@ _512_transpose_map = (
     16, 58, 37, 38, 17, 59, 60, 39, 18, 19, 61, 40, 41, 20, 62, 63,
 )
 
-def _raw_sha2_crypt(pwd, salt, rounds, use_512=False):
-    """perform raw sha256-crypt / sha512-crypt
+def _sha2_crypt_digests(pwd, salt, rounds, use_512):
+    """validate inputs, and calculate sha2-crypt's A, P, and S digests.
 
-    this function provides a pure-python implementation of the internals
-    for the SHA256-Crypt and SHA512-Crypt algorithms; it doesn't
-    handle any of the parsing/validation of the hash strings themselves.
-
-    :arg pwd: password chars/bytes to encrypt
-    :arg salt: salt chars to use
-    :arg rounds: linear rounds cost
-    :arg use_512: use sha512-crypt instead of sha256-crypt mode
+    this is shared by :func:`_raw_sha2_crypt` and :func:`_fast_sha2_crypt`,
+    which differ only in how they perform the rounds of digest C.
 
     :returns:
-        encoded checksum chars
+        ``(hash_const, transpose_map, da, dp, ds)``
     """
     #===================================================================
     # init & validate inputs
@@ -167,6 +161,26 @@ def _raw_sha2_crypt(pwd, salt, rounds, use_512=False):
     ds = hash_const(salt * (16 + byte_elem_value(da[0]))).digest()[:salt_len]
     assert len(ds) == salt_len, "salt_len somehow > hash_len!"
 
+    return hash_const, transpose_map, da, dp, ds
+
+def _raw_sha2_crypt(pwd, salt, rounds, use_512=False):
+    """perform raw sha256-crypt / sha512-crypt
+
+    this function provides a pure-python implementation of the internals
+    for the SHA256-Crypt and SHA512-Crypt algorithms; it doesn't
+    handle any of the parsing/validation of the hash strings themselves.
+
+    :arg pwd: password chars/bytes to encrypt
+    :arg salt: salt chars to use
+    :arg rounds: linear rounds cost
+    :arg use_512: use sha512-crypt instead of sha256-crypt mode
+
+    :returns:
+        encoded checksum chars
+    """
+    hash_const, transpose_map, da, dp, ds = _sha2_crypt_digests(pwd, salt, rounds,
+                                                                use_512)
+
     #===================================================================
     # digest C - for a variable number of rounds, combine A, S, and P
     #            digests in various ways; in order to burn CPU time.
@@ -244,6 +258,57 @@ def _raw_sha2_crypt(pwd, salt, rounds, use_512=False):
     #===================================================================
     return h64.encode_transposed_bytes(dc, transpose_map).decode("ascii")
 
+def _fast_sha2_crypt(pwd, salt, rounds, use_512=False):
+    """faster version of :func:`_raw_sha2_crypt`, same arguments & result.
+
+    since the odd rounds all have the form ``hash(perm + digest)``, this
+    precomputes a hash state for each of the 6 combinations of digests P & S,
+    and copies it for each round, rather than concatenating a new string
+    each time (for long passwords, this also skips re-hashing the
+    combination's leading blocks).
+    """
+    hash_const, transpose_map, da, dp, ds = _sha2_crypt_digests(pwd, salt, rounds,
+                                                                use_512)
+
+    # prepare the 6 combinations of ds & dp, as in _raw_sha2_crypt(),
+    # along with copy() method of a hash state for each one.
+    dp_dp = dp+dp
+    dp_ds = dp+ds
+    perms = [dp, dp_dp, dp_ds, dp_ds+dp, ds+dp, ds+dp_dp]
+    copies = [hash_const(perm).copy for perm in perms]
+    data = [(perms[even], copies[odd]) for even, odd in _c_digest_offsets]
+
+    # perform as many full 42-round blocks as possible
+    dc = da
+    blocks, tail = divmod(rounds, 42)
+    while blocks:
+        for even, odd_copy in data:
+            ctx = odd_copy()
+            ctx.update(hash_const(dc + even).digest())
+            dc = ctx.digest()
+        blocks -= 1
+
+    # perform any leftover rounds
+    if tail:
+        # perform any pairs of rounds
+        pairs = tail>>1
+        for even, odd_copy in data[:pairs]:
+            ctx = odd_copy()
+            ctx.update(hash_const(dc + even).digest())
+            dc = ctx.digest()
+
+        # if rounds was odd, do one last round
+        if tail & 1:
+            dc = hash_const(dc + data[pairs][0]).digest()
+
+    return h64.encode_transposed_bytes(dc, transpose_map).decode("ascii")
+
+# map of engine name -> sha2-crypt implementation, used by the builtin backend
+_sha2_engines = {
+    "fast": _fast_sha2_crypt,
+    "reference": _raw_sha2_crypt,
+}
+
 #=============================================================================
 # handlers
 #=============================================================================
@@ -272,6 +337,10 @@ class _SHA2_Common(uh.HasManyBackends, uh.HasRounds, uh.HasSalt,
     rounds_cost = "linear"
 
     _cdb_use_512 = False # flag for _calc_digest_builtin()
+
+    #: which pure-python implementation to use (see :data:`_sha2_engines`);
+    #: ``"reference"`` selects the original, easier to follow, implementation.
+    sha2_engine = "fast"
     _rounds_prefix = None # ident + _UROUNDS
 
     #===================================================================
@@ -379,8 +448,8 @@ class _SHA2_Common(uh.HasManyBackends, uh.HasRounds, uh.HasSalt,
         return cls._calc_checksum_builtin
 
     def _calc_checksum_builtin(self, secret):
-        return _raw_sha2_crypt(secret, self.salt, self.rounds,
-                               self._cdb_use_512)
+        return _sha2_engines[self.sha2_engine](secret, self.salt, self.rounds,
+                                               self._cdb_use_512)
 
     #===================================================================
     # eoc
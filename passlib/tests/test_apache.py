@@ -6,12 +6,14 @@ from __future__ import with_statement
 # core
 from logging import getLogger
 import os
+import time
 # site
 # pkg
 from passlib import apache
 from passlib.utils.compat import irange
-from passlib.tests.utils import TestCase, get_file, set_file, ensure_mtime_changed
+from passlib.tests.utils import TestCase, get_file, set_file, ensure_mtime_changed, patchAttr
 from passlib.utils.compat import u
+from passlib.utils.filewatch import FileWatcher, has_inotify
 # module
 log = getLogger(__name__)
 
@@ -23,6 +25,13 @@ def backdate_file_mtime(path, offset=10):
     mtime = os.path.getmtime(path)-offset
     os.utime(path, (atime, mtime))
 
+def wait_for_change(watcher, timeout=5):
+    """wait for FileWatcher to notice change, returns ``watcher.changed``"""
+    end = time.time() + timeout
+    while not watcher.changed and time.time() < end:
+        time.sleep(.01)
+    return watcher.changed
+
 #=============================================================================
 # htpasswd
 #=============================================================================
@@ -295,6 +304,392 @@ class HtpasswdFileTest(TestCase):
         self.assertRaises(TypeError, apache.HtpasswdFile.from_string,
                           b'', path=None)
 
+    def test_13_lazy(self):
+        """test lazy=True"""
+        path = self.mktemp()
+        set_file(path, self.sample_01)
+        backdate_file_mtime(path, 5)
+        ht = apache.HtpasswdFile(path, lazy=True, default_scheme="plaintext")
+        records = ht._records
+        self.assertIsInstance(records, apache._IndexedRecords)
+        self.assertEqual(ht.to_string(), self.sample_01)
+        self.assertEqual(ht.users(), ["user2", "user3", "user4", "user1"])
+        self.assertEqual(ht.get_hash("user4"), b"pass4")
+        self.assertEqual(ht.get_hash("user5"), None)
+        self.assertTrue(ht.check_password("user1", "pass1"))
+        self.assertFalse(ht.check_password("user1", "pass2"))
+        self.assertIs(ht.check_password("user5", "pass5"), None)
+
+        # appending to file should only index new records
+        with open(path, "ab") as fh:
+            fh.write(b"user5:pass5\nuser1:pass1x\n")
+        backdate_file_mtime(path, 3)
+        self.assertTrue(ht.load_if_changed())
+        self.assertIs(ht._records, records)
+        self.assertEqual(ht.get_hash("user5"), b"pass5")
+        self.assertTrue(ht.check_password("user1", "pass1"))
+
+        # truncating / rewriting file in place shouldn't affect loaded records
+        # (this used to crash the process w/ SIGBUS when the file was mmap'd)
+        with open(path, "r+b") as fh:
+            fh.truncate(0)
+            fh.write(b"x:y\n")
+        self.assertEqual(ht.get_hash("user4"), b"pass4")
+        self.assertEqual(ht.get_hash("user5"), b"pass5")
+
+        # rewriting file should cause full reload
+        set_file(path, self.sample_02)
+        backdate_file_mtime(path, 1)
+        self.assertTrue(ht.load_if_changed())
+        self.assertIsNot(ht._records, records)
+        self.assertEqual(ht.to_string(), self.sample_02)
+
+        # changes should be kept until saved, and saved by replacing file
+        set_file(path, self.sample_01)
+        os.chmod(path, 0o640)
+        ht.load()
+        inode = os.stat(path).st_ino
+        ht.set_password("user2", "pass2x")
+        ht.delete("user1")
+        ht.set_password("user1", "$apr1$t4tc7jTh$GPIWVUo8sQKJlUdV8V5vu0")
+        ht.set_password("user5", "pass5")
+        self.assertEqual(get_file(path), self.sample_01)
+        ht.save()
+        self.assertEqual(get_file(path), b'user2:pass2x\n'
+                         b'user3:{SHA}3ipNV1GrBtxPmHFC21fCbVCSXIo=\n'
+                         b'user4:pass4\n'
+                         b'user1:$apr1$t4tc7jTh$GPIWVUo8sQKJlUdV8V5vu0\n'
+                         b'user5:pass5\n')
+        self.assertNotEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+        self.assertFalse(ht.load_if_changed())
+
+        # duplicate & empty files
+        set_file(path, self.sample_dup)
+        ht.load()
+        self.assertTrue(ht.check_password('user1','pass1'))
+        set_file(path, b"")
+        ht.load()
+        self.assertEqual(ht.users(), [])
+
+        # malformed files
+        set_file(path, b'user1:pass1\nrealm:user1:pass1\n')
+        self.assertRaises(ValueError, ht.load)
+
+    def test_13_lazy_index(self):
+        """test lazy=True index matches eager parsing"""
+        def check(data, mask=None):
+            if mask is not None:
+                patchAttr(self, apache, "_HASH_MASK", mask)
+            lazy = apache.HtpasswdFile.from_string(data)
+            lazy._records = apache._IndexedRecords(lazy._parse_record, data)
+            eager = apache.HtpasswdFile.from_string(data)
+            self.assertEqual(lazy.users(), eager.users())
+            self.assertEqual(len(lazy._records), len(eager.users()))
+            for user in eager.users() + ["missing"]:
+                self.assertEqual(lazy.get_hash(user), eager.get_hash(user))
+            return lazy._records
+
+        # plain records (fast path), w/ & w/o trailing newline
+        data = b"".join(b"user%d:hash%d\n" % (i, i) for i in range(50))
+        check(data)
+        check(data.rstrip())
+        check(b"")
+
+        # comments & duplicates (slow path)
+        records = check(b"#comment\nuser1:hash1\nuser2:hash2\n#x:y:z\nuser1:hash3")
+        self.assertEqual(records.dead, 3)
+        self.assertEqual(records.dups, set([b"user1"]))
+
+        # duplicates & hash collisions
+        records = check(data + b"user7:hashx\n", mask=0)
+        self.assertEqual(records.dups, set([b"user7"]))
+
+        # malformed lines should be reported
+        self.assertRaises(ValueError, check, data + b"user1:x:y\n" + data)
+        self.assertRaises(ValueError, check, data + b"\n" + data)
+
+    def test_14_incremental(self):
+        """test incremental=True"""
+        path = self.mktemp()
+        set_file(path, self.sample_01)
+        ht = apache.HtpasswdFile(path, incremental=True, autosave=True,
+                                 default_scheme="plaintext")
+        self.assertTrue(ht.lazy)
+        inode = os.stat(path).st_ino
+
+        # same-length change should be patched in place
+        ht.set_password("user4", "pass9")
+        self.assertEqual(get_file(path), self.sample_01.replace(b"pass4", b"pass9"))
+
+        # other changes should be appended, & old entries blanked out
+        ht.set_password("user2", "pass2x")
+        ht.set_password("user5", "pass5")
+        ht.delete("user3")
+        self.assertEqual(get_file(path),
+                         b'#' * 19 + b'\n' +
+                         b'#' * 39 + b'\n' +
+                         b'user4:pass9\n'
+                         b'user1:$apr1$t4tc7jTh$GPIWVUo8sQKJlUdV8V5vu0\n'
+                         b'user2:pass2x\n'
+                         b'user5:pass5\n')
+        self.assertEqual(os.stat(path).st_ino, inode)
+
+        # changes to appended entries should work too
+        ht.set_password("user5", "pass6")
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(get_file(path)[-12:], b'user5:pass6\n')
+
+        # once dead lines outnumber half the entries, file should be compacted
+        ht.set_password("user2", "pass2yy")
+        expected = (b'user4:pass9\n'
+                    b'user1:$apr1$t4tc7jTh$GPIWVUo8sQKJlUdV8V5vu0\n'
+                    b'user5:pass6\n'
+                    b'user2:pass2yy\n')
+        self.assertEqual(get_file(path), expected)
+        self.assertNotEqual(os.stat(path).st_ino, inode)
+        inode = os.stat(path).st_ino
+
+        # state should match a fresh load of the file
+        ht.delete("user1")
+        self.assertFalse(ht.load_if_changed())
+        expected = ht.to_string()
+        self.assertEqual(apache.HtpasswdFile(path).to_string(), expected)
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertTrue(ht.check_password("user2", "pass2yy"))
+
+        # if file replaced by someone else, should fall back to rewriting it
+        set_file(path + ".tmp", self.sample_01)
+        os.rename(path + ".tmp", path)
+        ht.set_password("user7", "pass7")
+        self.assertEqual(get_file(path), expected + b'user7:pass7\n')
+
+        # files with duplicate entries should be rewritten when those users change
+        set_file(path, self.sample_dup)
+        ht.load()
+        ht.set_password("user1", "pass3")
+        self.assertEqual(get_file(path), b"user1:pass3\n")
+
+        # files w/o trailing newline
+        set_file(path, b"user1:pass1")
+        ht.load()
+        ht.set_password("user2", "pass2")
+        self.assertEqual(get_file(path), b"user1:pass1\nuser2:pass2\n")
+
+        # comments should be ignored, and users can't start with '#'
+        self.assertEqual(apache.HtpasswdFile.from_string(
+                         b"#comment\nuser1:pass1\n").users(), ["user1"])
+        self.assertRaises(ValueError, ht.set_password, "#user", "pass")
+
+    def test_15_change_detection(self):
+        """test load_if_changed() detects replaced files"""
+        path = self.mktemp()
+        set_file(path, self.sample_01)
+        ht = apache.HtpasswdFile(path)
+        mtime = os.path.getmtime(path)
+        self.assertFalse(ht.load_if_changed())
+
+        # file renamed into place, w/ same size & mtime
+        set_file(path + ".tmp", self.sample_01.replace(b"pass4", b"pass9"))
+        os.utime(path + ".tmp", (mtime, mtime))
+        os.rename(path + ".tmp", path)
+        self.assertTrue(ht.load_if_changed())
+        self.assertTrue(ht.check_password("user4", "pass9"))
+        self.assertFalse(ht.load_if_changed())
+
+        # file modified in place, w/ same mtime
+        set_file(path, self.sample_02)
+        os.utime(path, (mtime, mtime))
+        self.assertTrue(ht.load_if_changed())
+        self.assertEqual(sorted(ht.users()), ["user3", "user4"])
+
+    def test_16_watch(self):
+        """test watch=True"""
+        path = self.mktemp()
+        set_file(path, self.sample_01)
+        ht = apache.HtpasswdFile(path, watch=True)
+        watcher = ht._watcher
+        self.assertIsInstance(watcher, FileWatcher)
+        self.assertFalse(ht.load_if_changed())
+
+        # our own changes shouldn't trigger a reload
+        ht.set_password("user5", "pass5")
+        ht.save()
+        wait_for_change(watcher)
+        self.assertFalse(ht.load_if_changed())
+
+        # but other changes should
+        set_file(path, self.sample_02)
+        wait_for_change(watcher)
+        self.assertTrue(ht.load_if_changed())
+        self.assertEqual(sorted(ht.users()), ["user3", "user4"])
+        self.assertIs(ht._watcher, watcher)
+
+        # changing path should stop watcher
+        ht.path = self.mktemp()
+        self.assertTrue(watcher.closed)
+        self.assertIs(ht._watcher, None)
+
+    def test_17_file_watcher(self):
+        """test FileWatcher in inotify & polling modes"""
+        path = self.mktemp()
+        set_file(path, b"user1:pass1\n")
+        modes = [False]
+        if has_inotify():
+            modes.append(True)
+        for use_inotify in modes:
+            watcher = FileWatcher(path, interval=.01, use_inotify=use_inotify)
+            self.assertEqual(watcher.mode, "inotify" if use_inotify else "poll")
+            self.assertFalse(watcher.changed)
+
+            # modified in place
+            set_file(path, b"user1:pass1\nuser2:pass2\n")
+            self.assertTrue(wait_for_change(watcher))
+
+            # replaced via rename
+            watcher.changed = False
+            set_file(path + ".tmp", b"user1:pass1\n")
+            os.rename(path + ".tmp", path)
+            self.assertTrue(wait_for_change(watcher))
+
+            # changes to other files should be ignored
+            watcher.changed = False
+            set_file(path + ".other", b"")
+            time.sleep(.05)
+            self.assertFalse(watcher.changed)
+
+            watcher.close()
+            self.assertTrue(watcher.closed)
+
+    def test_18_set_passwords(self):
+        """test set_passwords() & iter_records()"""
+        ht = apache.HtpasswdFile.from_string(self.sample_01, default_scheme="plaintext")
+        items = (("user%d" % (idx % 7), "pass%d" % idx) for idx in irange(10))
+        ht.set_passwords_batch_size = 3
+        self.assertEqual(ht.set_passwords(items), 3)
+        self.assertEqual(ht.to_string(), b'user2:pass2\n'
+                                         b'user3:pass3\n'
+                                         b'user4:pass4\n'
+                                         b'user1:pass1\n'
+                                         b'user0:pass0\n'
+                                         b'user5:pass5\n'
+                                         b'user6:pass6\n')
+        self.assertEqual(list(ht.iter_records()), list(zip(ht.users(),
+                         [ht.get_hash(user) for user in ht.users()])))
+
+        # should match results of set_password(), when run in parallel
+        ht2 = apache.HtpasswdFile(default_scheme="plaintext")
+        for user, password in [("user9", "pass9"), ("user8", "pass8")]:
+            ht2.set_password(user, password)
+        ht3 = apache.HtpasswdFile(default_scheme="plaintext")
+        self.assertEqual(ht3.set_passwords([("user9", "pass9"), ("user8", "pass8")],
+                                           workers=2), 2)
+        self.assertEqual(ht3.to_string(), ht2.to_string())
+
+        # batch consisting entirely of duplicates shouldn't stop processing
+        ht4 = apache.HtpasswdFile(default_scheme="plaintext")
+        ht4.set_passwords_batch_size = 2
+        self.assertEqual(ht4.set_passwords([("a", "1"), ("b", "2"), ("a", "3"),
+                                            ("b", "4"), ("c", "5")]), 3)
+        self.assertEqual(ht4.users(), ["a", "b", "c"])
+        self.assertEqual(ht4.get_hash("a"), b"1")
+
+        # invalid users should be rejected
+        self.assertRaises(ValueError, ht.set_passwords, [("user:1", "pass")])
+
+        # should autosave just once
+        path = self.mktemp()
+        set_file(path, self.sample_01)
+        ht = apache.HtpasswdFile(path, autosave=True)
+        saves = []
+        orig_save = ht.save
+        def save(path=None):
+            if path is None:
+                saves.append(1)
+            orig_save(path)
+        ht.save = save
+        self.assertEqual(ht.set_passwords([("user1", "pass1x"), ("user5", "pass5")]), 1)
+        self.assertEqual(len(saves), 1)
+        self.assertTrue(apache.HtpasswdFile(path).check_password("user5", "pass5"))
+        self.assertEqual(ht.set_passwords([]), 0)
+        self.assertEqual(len(saves), 1)
+
+        # iter_records() in lazy mode
+        ht = apache.HtpasswdFile(path, lazy=True)
+        self.assertEqual([user for user, _ in ht.iter_records()],
+                         ["user2", "user3", "user4", "user1", "user5"])
+
+    #===================================================================
+    # eoc
+    #===================================================================
+
+class HtpasswdSnapshotTest(TestCase):
+    """test HtpasswdSnapshot class"""
+    descriptionPrefix = "HtpasswdSnapshot"
+
+    sample_01 = HtpasswdFileTest.sample_01
+
+    def test_00_publish(self):
+        """test publish() & lookups"""
+        source = apache.HtpasswdFile.from_string(self.sample_01)
+        path = self.mktemp()
+        self.assertEqual(apache.HtpasswdSnapshot.publish(source, path), 1)
+
+        snap = apache.HtpasswdSnapshot(path)
+        self.assertEqual(snap.generation, 1)
+        self.assertEqual(len(snap), 4)
+        self.assertEqual(sorted(snap.users()), sorted(source.users()))
+        for user in source.users():
+            self.assertEqual(snap.get_hash(user), source.get_hash(user))
+        self.assertEqual(snap.get_hash("user0"), None)
+        self.assertEqual(snap.get_hash("user9"), None)
+
+        self.assertTrue(snap.check_password("user1", "pass1"))
+        self.assertTrue(snap.check_password(b"user4", "pass4"))
+        self.assertFalse(snap.check_password("user4", "pass5"))
+        self.assertIs(snap.check_password("user5", "pass5"), None)
+        self.assertRaises(TypeError, snap.check_password, 1, "pass1")
+
+        # empty source
+        apache.HtpasswdSnapshot.publish(apache.HtpasswdFile(), path)
+        self.assertEqual(snap.users(), [])
+        self.assertEqual(snap.get_hash("user1"), None)
+
+        # invalid files
+        set_file(path, b"user1:pass1\n")
+        self.assertRaises(ValueError, apache.HtpasswdSnapshot, path)
+        set_file(path, b"")
+        self.assertRaises(ValueError, apache.HtpasswdSnapshot, path)
+
+        # publishing over invalid file should start new generation
+        self.assertEqual(apache.HtpasswdSnapshot.publish(source, path), 1)
+
+    def test_01_refresh(self):
+        """test generation tracking & refresh()"""
+        source = apache.HtpasswdFile.from_string(self.sample_01)
+        path = self.mktemp()
+        apache.HtpasswdSnapshot.publish(source, path)
+        snap = apache.HtpasswdSnapshot(path)
+        other = apache.HtpasswdSnapshot(path)
+        self.assertFalse(snap.is_stale())
+        self.assertFalse(snap.refresh())
+
+        # publishing new snapshot should mark existing one stale
+        source.set_password("user5", "pass5")
+        self.assertEqual(apache.HtpasswdSnapshot.publish(source, path), 2)
+        self.assertTrue(snap.is_stale())
+        self.assertTrue(snap.refresh())
+        self.assertEqual(snap.generation, 2)
+        self.assertFalse(snap.is_stale())
+
+        # lookups should refresh automatically, even if multiple generations behind
+        source.delete("user1")
+        self.assertEqual(apache.HtpasswdSnapshot.publish(source, path), 3)
+        self.assertEqual(other.generation, 1)
+        self.assertTrue(other.check_password("user5", "pass5"))
+        self.assertIs(other.check_password("user1", "pass1"), None)
+        self.assertEqual(other.generation, 3)
+
     #===================================================================
     # eoc
     #===================================================================
@@ -553,6 +948,23 @@ class HtdigestFileTest(TestCase):
         self.assertRaises(ValueError, apache.HtdigestFile.from_string,
             b'user1:pass1\n')
 
+    def test_12_lazy(self):
+        """test lazy=True"""
+        path = self.mktemp()
+        set_file(path, self.sample_01)
+        ht = apache.HtdigestFile(path, lazy=True)
+        self.assertIsInstance(ht._records, apache._IndexedRecords)
+        self.assertEqual(ht.to_string(), self.sample_01)
+        self.assertEqual(ht.users("realm"), ["user2", "user3", "user4", "user1"])
+        self.assertTrue(ht.check_password("user1", "realm", "pass1"))
+        self.assertFalse(ht.check_password("user1", "realm", "pass2"))
+
+        # changes should be saved
+        ht.delete("user1", "realm")
+        ht.delete("user2", "realm")
+        ht.save()
+        self.assertEqual(get_file(path), self.sample_02)
+
     #===================================================================
     # eoc
     #===================================================================
@@ -11,6 +11,8 @@ else:
     from ConfigParser import NoSectionError
 import logging; log = logging.getLogger(__name__)
 import os
+import pickle
+import sys
 import warnings
 # site
 # pkg
@@ -20,7 +22,8 @@ from passlib.exc import PasslibConfigWarning
 from passlib.utils import tick, to_unicode
 from passlib.utils.compat import irange, u, unicode, str_to_uascii, PY2, PY26
 import passlib.utils.handlers as uh
-from passlib.tests.utils import TestCase, set_file, TICK_RESOLUTION, quicksleep
+from passlib.tests.utils import TestCase, set_file, TICK_RESOLUTION, quicksleep, \
+                                 patchAttr, temporary_backend
 from passlib.registry import (register_crypt_handler_path,
                         _has_crypt_handler as has_crypt_handler,
                         _unload_handler_name as unload_handler_name,
@@ -984,6 +987,13 @@ sha512_crypt__min_rounds = 45000
 
         # NOTE: max rounds, etc tested in genconfig()
 
+        # configured settings & rounds should be used when no kwds are passed
+        c2 = cc.copy(sha256_crypt__default_rounds=2500,
+                     sha256_crypt__salt_size=4)
+        h = c2.encrypt("password")
+        self.assertTrue(h.startswith("$5$rounds=2500$"))
+        self.assertEqual(len(hash.sha256_crypt.from_string(h).salt), 4)
+
         # make default > max throws error if attempted
         self.assertRaises(ValueError, cc.copy,
                           sha256_crypt__default_rounds=4000)
@@ -1034,6 +1044,56 @@ sha512_crypt__min_rounds = 45000
         # bad category values
         self.assertRaises(TypeError, cc.identify, None, category=1)
 
+    def test_44_identify_dispatch(self):
+        """test identify() prefix dispatch preserves scheme order"""
+        handlers = ["des_crypt", "md5_crypt", "ldap_md5_crypt", "hex_md5",
+                    "mysql41", "sha256_crypt", "plaintext"]
+        cc = CryptContext(handlers)
+        config = cc._config
+
+        # check handlers were filed under the expected buckets
+        self.assertEqual(config._identify_prefixes, {
+            u("$1$"): [1],
+            u("{CRYPT}$1$"): [2],
+            u("*"): [4],
+            u("$5$"): [5],
+            })
+        self.assertEqual(config._identify_sizes, {32: [3]})
+        self.assertEqual(config._identify_wildcards, [0, 6])
+        self.assertEqual(config._identify_exact, set([1, 5]))
+
+        # check hashes are identified same as a linear search would
+        samples = [
+            ("des_crypt", "abJnggxhB/yWI"),
+            ("md5_crypt", "$1$dOHYPKoP$tnxS1T8Q6VVn3kpV8cN6o."),
+            ("ldap_md5_crypt", "{CRYPT}$1$dOHYPKoP$tnxS1T8Q6VVn3kpV8cN6o."),
+            ("hex_md5", "5f4dcc3b5aa765d61d8327deb882cf99"),
+            ("hex_md5", "5F4DCC3B5AA765D61D8327DEB882CF99"),
+            ("mysql41", "*2470C0C06DEE42FD1618BB99005ADCA2EC9D1E19"),
+            ("sha256_crypt", "$5$rounds=5000$abc$"),
+            ("plaintext", "$9$abc"),
+            ("plaintext", "5f4dcc3b5aa765d61d8327deb882cf9"),
+            ("plaintext", "password"),
+            ]
+        for scheme, hash in samples:
+            self.assertEqual(cc.identify(hash), scheme, hash)
+            self.assertEqual(cc.identify(hash.encode("ascii")), scheme, hash)
+
+        # unprefixed scheme listed before prefixed ones should still win
+        cc = CryptContext(["plaintext", "md5_crypt"])
+        self.assertEqual(cc.identify("$1$dOHYPKoP$tnxS1T8Q6VVn3kpV8cN6o."),
+                         "plaintext")
+
+        # custom identify() methods shouldn't be trusted
+        class dummy(uh.StaticHandler):
+            name = "dummy"
+            _hash_prefix = u("@")
+            @classmethod
+            def identify(cls, hash):
+                return True
+        cc = CryptContext([dummy])
+        self.assertEqual(cc._config._identify_wildcards, [0])
+
     def test_45_verify(self):
         """test verify() scheme kwd"""
         handlers = ["md5_crypt", "des_crypt", "bsdi_crypt"]
@@ -1213,6 +1273,435 @@ sha512_crypt__min_rounds = 45000
         # bad category values
         self.assertRaises(TypeError, cc.verify_and_update, 'secret', refhash, category=1)
 
+    def test_48_verify_many(self):
+        """test verify_many(), verify_and_update_many(), encrypt_many()"""
+        cc = CryptContext(["sha256_crypt", "des_crypt", "postgres_md5"],
+                          deprecated=["des_crypt"], sha256_crypt__rounds=1000)
+        h1 = cc.encrypt("password", scheme="des_crypt")
+        h2 = cc.encrypt("password", scheme="sha256_crypt")
+        h3 = cc.encrypt("password", scheme="postgres_md5", user="admin")
+        items = [
+            ("password", h1),
+            ("wrongpass", h2),
+            ("password", h3, dict(user="admin")),
+            ("password", h2),
+            ("wrongpass", h1),
+            ("password", h3, dict(user="other")),
+            ]
+        expected = [True, False, True, True, False, False]
+
+        # serial, private pools, and external executor should all agree
+        from multiprocessing.pool import ThreadPool
+        executor = ThreadPool(2)
+        try:
+            for kwds in [dict(), dict(workers=2, chunksize=1),
+                         dict(executor=executor)]:
+                self.assertEqual(cc.verify_many(items, **kwds), expected)
+
+                result = cc.verify_and_update_many(items, **kwds)
+                self.assertEqual([ok for ok, _ in result], expected)
+                self.assertEqual([new_hash is not None for _, new_hash in result],
+                                 [True, False, False, False, False, False])
+                new_hash = result[0][1]
+                self.assertEqual(cc.identify(new_hash), "sha256_crypt")
+                self.assertTrue(cc.verify("password", new_hash))
+        finally:
+            executor.terminate()
+
+        # empty input
+        self.assertEqual(cc.verify_many([]), [])
+        self.assertEqual(cc.verify_many([], workers=2), [])
+
+        # hashes are identified up front
+        self.assertRaises(ValueError, cc.verify_many,
+                          [("password", h1), ("password", "$9$xxx")])
+
+        # encrypt_many() should honor scheme & settings, and preserve order
+        for kwds in [dict(), dict(workers=2, chunksize=1)]:
+            hashes = cc.encrypt_many(["a", "b", "c"], **kwds)
+            self.assertEqual([cc.identify(h) for h in hashes], ["sha256_crypt"] * 3)
+            self.assertEqual([cc.verify(s, h) for s, h in zip("abc", hashes)],
+                             [True] * 3)
+            self.assertTrue(all("rounds=1000$" in h for h in hashes))
+            hashes = cc.encrypt_many(["a", "b"], scheme="postgres_md5",
+                                     user="admin", **kwds)
+            self.assertEqual(hashes, [cc.encrypt("a", scheme="postgres_md5", user="admin"),
+                                      cc.encrypt("b", scheme="postgres_md5", user="admin")])
+        self.assertEqual(cc.encrypt_many([]), [])
+
+    def test_48_verify_many_routing(self):
+        """test batch methods send os_crypt work to threads when it releases the GIL"""
+        from passlib.context import _releases_gil
+        from passlib.utils import oscrypt
+        handler = hash.sha512_crypt
+        if not handler.has_backend("os_crypt"):
+            raise self.skipTest("os_crypt backend not available")
+        self.addCleanup(oscrypt.set_crypt_mode, oscrypt.get_crypt_mode())
+        with temporary_backend(handler, "os_crypt"):
+            oscrypt.set_crypt_mode("stdlib")
+            self.assertFalse(_releases_gil(handler))
+            if not oscrypt.has_crypt_r():
+                raise self.skipTest("crypt_r() not available")
+            oscrypt.set_crypt_mode("crypt_r")
+            self.assertTrue(_releases_gil(handler))
+
+            # should pass bound record methods (not pickled handler names) to thread executor
+            from multiprocessing.pool import ThreadPool
+            tasks = []
+            class Executor(ThreadPool):
+                def map(self, func, items):
+                    items = list(items)
+                    tasks.extend(items)
+                    return map(func, items)
+            executor = Executor(1)
+            self.addCleanup(executor.terminate)
+            cc = CryptContext(["sha512_crypt"], sha512_crypt__rounds=1000)
+            h1 = cc.encrypt("password")
+            self.assertEqual(cc.verify_many([("password", h1), ("wrong", h1)],
+                                            executor=executor),
+                             [True, False])
+            self.assertTrue(tasks)
+            for func, _ in tasks:
+                self.assertTrue(callable(func))
+
+            # stdlib mode holds the GIL, so should be sent to process pool
+            oscrypt.set_crypt_mode("stdlib")
+            del tasks[:]
+            cc.verify_many([("password", h1)], executor=executor)
+            self.assertEqual([func for func, _ in tasks], [("sha512_crypt", "verify")])
+
+    def test_48_verify_many_pools(self):
+        """test batch methods w/ process executors, and pool reuse"""
+        from passlib.context import _is_thread_executor
+        from multiprocessing.pool import ThreadPool
+        cc = CryptContext(["sha256_crypt", "des_crypt"], deprecated=["des_crypt"],
+                          sha256_crypt__rounds=1000)
+        cc.enable_stats()
+        h1 = cc.encrypt("test")
+        h2 = cc.encrypt("test", scheme="des_crypt")
+        items = [("test", h1), ("wrong", h1), ("test", h2)]
+
+        # process executors should be sent picklable tasks,
+        # even for records whose methods are closures (e.g. stats wrappers)
+        pool = ThreadPool(1)
+        self.addCleanup(pool.terminate)
+        self.assertTrue(_is_thread_executor(pool))
+        tasks = []
+        class Executor(object):
+            def map(self, func, items):
+                items = list(items)
+                tasks.extend(items)
+                return map(func, items)
+        self.assertFalse(_is_thread_executor(Executor()))
+        self.assertEqual(cc.verify_many(items, executor=Executor()), [True, False, True])
+        self.assertEqual(sorted(set(func for func, _ in tasks)),
+                         [("des_crypt", "verify"), ("sha256_crypt", "verify")])
+        for task in tasks:
+            pickle.dumps(task)
+        try:
+            from concurrent.futures import ProcessPoolExecutor
+        except ImportError:
+            pass
+        else:
+            with ProcessPoolExecutor(2) as executor:
+                self.assertEqual(cc.verify_many(items, executor=executor),
+                                 [True, False, True])
+                results = cc.verify_and_update_many(items, executor=executor)
+                self.assertEqual([ok for ok, _ in results], [True, False, True])
+                self.assertTrue(cc.verify("test", results[2][1]))
+
+        # verify_and_update_many() should only create each pool once
+        created = []
+        orig = CryptContext._get_batch_pool
+        def wrapper(pools, kind, workers):
+            if kind not in pools:
+                created.append(kind)
+            return orig(pools, kind, workers)
+        patchAttr(self, CryptContext, "_get_batch_pool", staticmethod(wrapper))
+        results = cc.verify_and_update_many(items, workers=2)
+        self.assertEqual([ok for ok, _ in results], [True, False, True])
+        self.assertEqual(len(created), len(set(created)))
+
+    def test_48_verify_many_records(self):
+        """test batch methods apply stats & min_verify_time for process pool tasks"""
+        with self.assertWarningList(["'min_verify_time' is deprecated"]):
+            cc = CryptContext(["hex_md5"], min_verify_time=.5)
+        h1 = cc.encrypt("test")
+        items = [("test", h1), ("wrong", h1), ("wrong", h1)]
+        delays = []
+        cc.set_verify_sleep(delays.append)
+        cc.enable_stats()
+
+        # executor which runs tasks in-process, but receives them as it would if pickled
+        tasks = []
+        class Executor(object):
+            def map(self, func, items):
+                items = list(items)
+                tasks.extend(items)
+                return map(func, items)
+
+        # serial path
+        self.assertEqual(cc.verify_many(items), [True, False, False])
+        self.assertEqual(len(delays), 2)
+        def counts():
+            return dict((key, value['count']) for key, value in cc.stats(reset=True).items())
+        serial = counts()
+        self.assertEqual(serial, {("verify", "hex_md5", None, None): 3})
+
+        # process pool path should produce the same results & stats,
+        # and pad the batch once
+        del delays[:]
+        self.assertEqual(cc.verify_many(items, executor=Executor(), chunksize=1),
+                         [True, False, False])
+        self.assertEqual([func for func, _ in tasks], [("hex_md5", "verify")] * 3)
+        self.assertEqual(len(delays), 1)
+        self.assertTrue(0 < delays[0] <= .5)
+        self.assertEqual(counts(), serial)
+
+        # successes shouldn't be padded
+        del delays[:]
+        self.assertEqual(cc.verify_many(items[:1], executor=Executor()), [True])
+        self.assertEqual(delays, [])
+        self.assertEqual(counts(), {("verify", "hex_md5", None, None): 1})
+
+    def test_49_async(self):
+        """test averify(), aencrypt(), averify_and_update()"""
+        if sys.version_info < (3,5):
+            raise self.skipTest("asyncio methods require Python 3.5+")
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        import threading
+
+        class TrackedHash(uh.StaticHandler):
+            """psuedo hash which records max number of concurrent calls"""
+            name = "tracked_hash"
+            active = peak = 0
+            lock = threading.Lock()
+
+            def _calc_checksum(self, secret):
+                cls = type(self)
+                with cls.lock:
+                    cls.active += 1
+                    cls.peak = max(cls.peak, cls.active)
+                quicksleep(.02)
+                with cls.lock:
+                    cls.active -= 1
+                return to_unicode(secret + 'x')
+
+        cc = CryptContext(["des_crypt", TrackedHash], default="tracked_hash",
+                          deprecated=["des_crypt"])
+        executor = ThreadPoolExecutor(4)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            run = loop.run_until_complete
+
+            # basic behavior should match sync methods
+            self.assertEqual(run(cc.aencrypt("stub")), "stubx")
+            self.assertTrue(run(cc.averify("stub", "stubx")))
+            self.assertFalse(run(cc.averify("blob", "stubx")))
+            h1 = cc.encrypt("stub", scheme="des_crypt")
+            self.assertEqual(run(cc.averify_and_update("stub", h1)),
+                             (True, "stubx"))
+            self.assertEqual(run(cc.averify_and_update("blob", h1)),
+                             (False, None))
+            self.assertEqual(run(cc.averify_and_update("stub", "stubx")),
+                             (True, None))
+            self.assertRaises(TypeError, run, cc.averify("stub", None))
+
+            # max_concurrency should bound number of calls in executor
+            cc.configure_async(executor=executor, max_concurrency=2)
+            def gather(count):
+                return asyncio.gather(*[cc.averify("stub", "stubx")
+                                        for _ in irange(count)])
+            TrackedHash.peak = 0
+            self.assertEqual(run(gather(8)), [True]*8)
+            self.assertEqual(TrackedHash.peak, 2)
+
+            # config errors
+            self.assertRaises(ValueError, cc.configure_async, max_concurrency=0)
+            self.assertRaises(TypeError, cc.configure_async, max_concurrency="2")
+
+            # min_verify_time padding shouldn't hold executor thread
+            with self.assertWarningList(["'min_verify_time' is deprecated"]):
+                cc = CryptContext([TrackedHash], min_verify_time=.2)
+            executor.shutdown()
+            executor = ThreadPoolExecutor(1)
+            cc.configure_async(executor=executor)
+            start = tick()
+            self.assertEqual(run(asyncio.gather(cc.averify("blob", "stubx"),
+                                                cc.averify("blob", "stubx"))),
+                             [False, False])
+            elapsed = tick() - start
+            self.assertGreaterEqual(elapsed, .2)
+            self.assertLess(elapsed, .35)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+            executor.shutdown()
+
+    def test_49_stats(self):
+        """test enable_stats() & stats()"""
+        cc = CryptContext(["md5_crypt", "ldap_salted_sha1"],
+                          admin__md5_crypt__salt_size=4)
+        self.assertRaises(RuntimeError, cc.stats)
+        calls = []
+        def callback(*args):
+            calls.append(args)
+        cc.enable_stats(callback)
+        h1 = cc.encrypt("test")
+        h2 = cc.encrypt("test", category="admin")
+        h3 = cc.encrypt("test", scheme="ldap_salted_sha1")
+        self.assertTrue(cc.verify("test", h1))
+        self.assertFalse(cc.verify("wrong", h1))
+        self.assertEqual(cc.verify_and_update("test", h3), (True, None))
+        self.assertEqual(cc.verify_deferred("test", h2, category="admin"),
+                         (True, 0))
+        self.assertFalse(cc.needs_update(h2, category="admin"))
+
+        backend = hash.md5_crypt.get_backend()
+        stats = cc.stats()
+        self.assertEqual(dict((key, value['count']) for key, value in stats.items()), {
+            ("encrypt", "ldap_salted_sha1", None, None): 1,
+            ("encrypt", "md5_crypt", None, backend): 1,
+            ("encrypt", "md5_crypt", "admin", backend): 1,
+            ("needs_update", "ldap_salted_sha1", None, None): 1,
+            ("needs_update", "md5_crypt", "admin", backend): 1,
+            ("verify", "ldap_salted_sha1", None, None): 1,
+            ("verify", "md5_crypt", None, backend): 2,
+            ("verify", "md5_crypt", "admin", backend): 1,
+            })
+        for value in stats.values():
+            self.assertEqual(len(value['histogram']), len(cc.stats_buckets) + 1)
+            self.assertEqual(sum(value['histogram']), value['count'])
+            self.assertGreaterEqual(value['total'], value['max'])
+        self.assertEqual(len(calls), 9)
+        self.assertEqual(calls[0][:4], ("encrypt", "md5_crypt", None, backend))
+
+        # reset, and stats should survive config changes
+        self.assertEqual(len(cc.stats(reset=True)), 8)
+        self.assertEqual(cc.stats(), {})
+        cc.update(md5_crypt__salt_size=6)
+        cc.encrypt("test")
+        self.assertEqual(list(cc.stats()), [("encrypt", "md5_crypt", None, backend)])
+
+        # disabling should restore original methods
+        cc.disable_stats()
+        self.assertRaises(RuntimeError, cc.stats)
+        record = cc._get_record("md5_crypt", None)
+        self.assertEqual(record.verify, hash.md5_crypt.verify)
+        self.assertRaises(TypeError, cc.enable_stats, 1)
+
+    def test_49_verify_cache(self):
+        """test verify_cache option"""
+        class CountingHash(uh.StaticHandler):
+            """psuedo hash which counts calls"""
+            name = "counting_hash"
+            calls = 0
+
+            def _calc_checksum(self, secret):
+                type(self).calls += 1
+                return to_unicode(secret + 'x')
+
+        # option parsing
+        self.assertIs(CryptContext([CountingHash])._verify_cache, None)
+        self.assertIs(CryptContext([CountingHash], verify_cache="false")._verify_cache, None)
+        self.assertEqual(CryptContext([CountingHash], verify_cache=True)._verify_cache.ttl, 60)
+        cc = CryptContext([CountingHash], verify_cache="30", verify_cache_size="10")
+        self.assertEqual(cc.to_dict(), dict(schemes=["counting_hash"],
+                                            verify_cache=30.0, verify_cache_size=10))
+        self.assertEqual(cc._verify_cache.ttl, 30)
+        self.assertEqual(cc._verify_cache.max_entries, 10)
+        self.assertRaises(ValueError, CryptContext, [CountingHash], verify_cache=-1)
+        self.assertRaises(ValueError, CryptContext, [CountingHash], verify_cache_size=0)
+        self.assertRaises(KeyError, CryptContext, [CountingHash], admin__context__verify_cache=10)
+
+        # successful verifies should be cached, failures shouldn't
+        cc = CryptContext(["des_crypt", "postgres_md5", CountingHash],
+                          default="counting_hash", deprecated=["des_crypt"],
+                          verify_cache=True)
+        cache = cc._verify_cache
+        CountingHash.calls = 0
+        self.assertTrue(cc.verify("test", "testx"))
+        self.assertTrue(cc.verify("test", "testx"))
+        self.assertEqual(cc.verify_deferred("test", "testx"), (True, 0))
+        self.assertEqual(cc.verify_and_update("test", "testx"), (True, None))
+        self.assertEqual(CountingHash.calls, 1)
+        self.assertFalse(cc.verify("wrong", "testx"))
+        self.assertFalse(cc.verify("wrong", "testx"))
+        self.assertEqual(CountingHash.calls, 3)
+        self.assertEqual(len(cache), 1)
+
+        # secret shouldn't be retained, and should still be validated
+        key, = list(cache._entries)
+        self.assertFalse(b"test" in key)
+        self.assertRaises(TypeError, cc.verify, None, "testx")
+        self.assertRaises(TypeError, cc.verify_deferred, None, "testx")
+
+        # verify_and_update() should bypass cache when rehash is pending
+        h1 = cc.encrypt("test", scheme="des_crypt")
+        self.assertTrue(cc.verify("test", h1))
+        self.assertEqual(len(cache), 2)
+        patchAttr(self, hash.des_crypt, "_calc_checksum", lambda self, secret: u("x")*11)
+        self.assertTrue(cc.verify("test", h1))
+        self.assertEqual(cc.verify_and_update("test", h1), (False, None))
+
+        # calls w/ context kwds should bypass cache
+        h2 = cc.encrypt("test", scheme="postgres_md5", user="user")
+        self.assertTrue(cc.verify("test", h2, scheme="postgres_md5", user="user"))
+        self.assertFalse(cc.verify("test", h2, scheme="postgres_md5", user="other"))
+        self.assertEqual(len(cache), 2)
+
+        # result for an explicit scheme shouldn't leak into unscoped calls
+        cc2 = CryptContext(["sha256_crypt", "plaintext"], verify_cache=60)
+        h3 = cc2.encrypt("test", rounds=1000)
+        self.assertTrue(cc2.verify(h3, h3, scheme="plaintext"))
+        self.assertFalse(cc2.verify(h3, h3))
+        self.assertEqual(cc2.verify_deferred(h3, h3), (False, 0))
+        self.assertEqual(cc2.verify_and_update(h3, h3), (False, None))
+
+        # clear_verify_cache() should discard entries
+        cc.clear_verify_cache()
+        self.assertEqual(len(cache), 0)
+
+        # ttl should use monotonic clock where available,
+        # so stepping the wall clock back doesn't keep entries alive
+        import time
+        from passlib.utils.verify_cache import VerifyCache
+        if hasattr(time, "monotonic"):
+            self.assertIs(VerifyCache._timer, time.monotonic)
+            cache.add(b"key")
+            patchAttr(self, time, "time", lambda: 0)
+            self.assertTrue(cache.check(b"key"))
+            cache.clear()
+
+        # asyncio methods should use cache too
+        if sys.version_info >= (3,5):
+            import asyncio
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                run = loop.run_until_complete
+                CountingHash.calls = 0
+                self.assertTrue(run(cc.averify("test", "testx")))
+                self.assertTrue(run(cc.averify("test", "testx")))
+                self.assertEqual(run(cc.averify_and_update("test", "testx")), (True, None))
+                self.assertFalse(run(cc.averify("wrong", "testx")))
+                self.assertEqual(CountingHash.calls, 2)
+            finally:
+                asyncio.set_event_loop(None)
+                loop.close()
+            cc.clear_verify_cache()
+
+        # reloading config should wipe cache
+        self.assertTrue(cc.verify("test", "testx"))
+        cc.update(verify_cache_size=5)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cc._verify_cache.max_entries, 5)
+        cc.update(verify_cache=False)
+        self.assertIs(cc._verify_cache, None)
+        cc.clear_verify_cache()
+
     #===================================================================
     # rounds options
     #===================================================================
@@ -1422,6 +1911,63 @@ sha512_crypt__min_rounds = 45000
         self.assertEqual(min(seen), lower, "vary_rounds had wrong lower limit:")
         self.assertEqual(max(seen), upper, "vary_rounds had wrong upper limit:")
 
+    def test_53_target_time(self):
+        """test target_time option"""
+        from passlib.utils import calibrate
+        path = self.mktemp()
+        os.remove(path)
+        patchAttr(self, calibrate, "get_default_cache_path", lambda: path)
+        calibrate.clear_cache()
+        self.addCleanup(calibrate.clear_cache)
+        calls = []
+        def estimate_speed(handler, target_time=.25, samples=3):
+            calls.append(handler.name)
+            return 100000
+        patchAttr(self, calibrate, "estimate_speed", estimate_speed)
+
+        def get_rounds(cc, category=None):
+            record = cc._get_record("sha256_crypt", category)
+            return (record._min_rounds, record._generate_rounds(),
+                    record._max_rounds)
+
+        # default_rounds should be derived from measured speed,
+        # but limits should only come from explicit options
+        cc = CryptContext(["sha256_crypt", "md5_crypt"],
+                          sha256_crypt__target_time=.25,
+                          md5_crypt__target_time=.25)
+        self.assertEqual(get_rounds(cc), (None, 25000, None))
+        self.assertEqual(calls, ["sha256_crypt"])
+        self.assertFalse(cc.needs_update(
+            hash.sha256_crypt.encrypt("test", rounds=5000)))
+        self.assertFalse(cc.needs_update(
+            hash.sha256_crypt.encrypt("test", rounds=100000)))
+
+        # explicit options should take precedence
+        self.assertEqual(get_rounds(cc.copy(sha256_crypt__min_rounds=30000)),
+                         (30000, 30000, None))
+        self.assertEqual(get_rounds(cc.copy(sha256_crypt__default_rounds=20000,
+                                            sha256_crypt__max_rounds=22000)),
+                         (None, 20000, 22000))
+        cc2 = cc.copy(sha256_crypt__min_rounds=10000,
+                      sha256_crypt__max_rounds=22000)
+        self.assertEqual(get_rounds(cc2), (10000, 22000, 22000))
+        self.assertTrue(cc2.needs_update(
+            hash.sha256_crypt.encrypt("test", rounds=5000)))
+
+        # measurement should be cached on disk
+        calibrate.clear_cache()
+        cc = CryptContext.from_string(
+            "[passlib]\nschemes = sha256_crypt\n"
+            "sha256_crypt__target_time = 0.5\n"
+            "admin__sha256_crypt__target_time = 1.0\n")
+        self.assertEqual(get_rounds(cc), (None, 50000, None))
+        self.assertEqual(get_rounds(cc, "admin"), (None, 100000, None))
+        self.assertEqual(calls, ["sha256_crypt"])
+
+        # reject values <= 0
+        self.assertRaises(ValueError, CryptContext, ["sha256_crypt"],
+                          sha256_crypt__target_time=0)
+
     #===================================================================
     # feature tests
     #===================================================================
@@ -1488,6 +2034,53 @@ sha512_crypt__min_rounds = 45000
         self.assertFalse(result)
         self.assertAlmostEqual(elapsed, max_delay, delta=delta)
 
+        # further overruns should be counted, rather than warned about
+        with self.assertWarningList([]):
+            self.assertFalse(cc.verify("blob", "stubx"))
+        self.assertEqual(cc.min_verify_time_overruns(), {"timed_hash": 2})
+
+        # overruns should be counted correctly by concurrent threads
+        import threading
+        record = cc._get_record("timed_hash", None)
+        def target():
+            for _ in irange(1000):
+                record._get_verify_delay(max_delay)
+        threads = [threading.Thread(target=target) for _ in irange(4)]
+        with self.assertWarningList([]):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(cc.min_verify_time_overruns(), {"timed_hash": 4002})
+
+        # verify_deferred() should return delay instead of sleeping
+        TimedHash.delay = min_delay
+        elapsed, result = timecall(cc.verify_deferred, "stub", "stubx")
+        self.assertEqual(result, (True, 0))
+        elapsed, result = timecall(cc.verify_deferred, "blob", "stubx")
+        self.assertAlmostEqual(elapsed, min_delay, delta=delta)
+        self.assertFalse(result[0])
+        self.assertAlmostEqual(result[1], min_verify_time - min_delay,
+                               delta=delta)
+
+        # custom sleep function should be used, and survive reloading config
+        calls = []
+        cc.set_verify_sleep(calls.append)
+        cc.update(admin__context__min_verify_time=min_verify_time*3)
+        elapsed, result = timecall(cc.verify, "blob", "stubx")
+        self.assertFalse(result)
+        self.assertAlmostEqual(elapsed, min_delay, delta=delta)
+        self.assertEqual(len(calls), 1)
+        self.assertAlmostEqual(calls[0], min_verify_time - min_delay,
+                               delta=delta)
+        self.assertEqual(cc.min_verify_time_overruns(), {})
+        cc.set_verify_sleep(None)
+        self.assertRaises(TypeError, cc.set_verify_sleep, 1)
+
+        # verify_deferred() shouldn't report delay if mvt isn't set
+        self.assertEqual(CryptContext([TimedHash]).verify_deferred("blob", "stubx"),
+                         (False, 0))
+
         # reject values < 0
         self.assertRaises(ValueError, CryptContext, min_verify_time=-1)
 
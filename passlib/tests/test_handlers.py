@@ -14,7 +14,7 @@ from passlib import hash
 from passlib.utils import repeat_string
 from passlib.utils.compat import irange, PY3, u, get_method_function
 from passlib.tests.utils import TestCase, HandlerCase, skipUnless, \
-        TEST_MODE, UserHandlerMixin, randintgauss, EncodingHandlerMixin
+        TEST_MODE, UserHandlerMixin, randintgauss, EncodingHandlerMixin, patchAttr
 # module
 
 #=============================================================================
@@ -76,6 +76,13 @@ class apr_md5_crypt_test(HandlerCase):
             '$apr1$r31.....$HqJZimcKQFAMYayBlzkrA!'
         ]
 
+    def test_90_md5_engine(self):
+        """test each md5-crypt engine"""
+        for engine in ["reference", "fast"]:
+            patchAttr(self, self.handler, "md5_engine", engine)
+            for secret, hash in self.known_correct_hashes:
+                self.assertTrue(self.do_verify(secret, hash), "engine=%r:" % (engine,))
+
 #=============================================================================
 # bigcrypt
 #=============================================================================
@@ -168,6 +175,15 @@ class _bsdi_crypt_test(HandlerCase):
         super(_bsdi_crypt_test, self).setUp()
         warnings.filterwarnings("ignore", "bsdi_crypt rounds should be odd.*")
 
+    def test_90_des_engine(self):
+        """test builtin backend w/ each DES engine"""
+        if self.backend != "builtin":
+            raise self.skipTest("only relevant for builtin backend")
+        for engine in ["reference", "table"]:
+            patchAttr(self, self.handler, "des_engine", engine)
+            for secret, hash in self.known_correct_hashes:
+                self.assertTrue(self.do_verify(secret, hash), "engine=%r:" % (engine,))
+
 bsdi_crypt_os_crypt_test, bsdi_crypt_builtin_test = \
                    _bsdi_crypt_test.create_backend_cases(["os_crypt","builtin"])
 
@@ -388,6 +404,37 @@ class _des_crypt_test(HandlerCase):
         ("freebsd|openbsd|netbsd|linux|solaris|darwin", True),
     ]
 
+    def test_90_des_engine(self):
+        """test builtin backend w/ each DES engine"""
+        if self.backend != "builtin":
+            raise self.skipTest("only relevant for builtin backend")
+        for engine in ["reference", "table"]:
+            patchAttr(self, self.handler, "des_engine", engine)
+            for secret, hash in self.known_correct_hashes:
+                self.assertTrue(self.do_verify(secret, hash), "engine=%r:" % (engine,))
+
+    def test_91_many(self):
+        """test encrypt_many() & verify_many()"""
+        handler = self.handler
+        # NOTE: repeating known hashes, so builtin backend uses bitsliced engine
+        items = self.known_correct_hashes * 9
+        wrong = [("x" + secret, hash) for secret, hash in items]
+        self.assertEqual(handler.verify_many(items + wrong),
+                         [True] * len(items) + [False] * len(wrong))
+        self.assertEqual(handler.verify_many([]), [])
+
+        secrets = [secret for secret, _ in items]
+        hashes = handler.encrypt_many(secrets)
+        self.assertEqual(len(hashes), len(secrets))
+        for secret, hash in zip(secrets, hashes):
+            self.assertTrue(handler.verify(secret, hash))
+        hashes = handler.encrypt_many(["test", "test2"], salt="N1")
+        self.assertEqual(hashes[0], "N1tQbOFcM5fpg")
+        self.assertTrue(handler.verify("test2", hashes[1]))
+
+        self.assertRaises(ValueError, handler.verify_many, [("test", "N1")])
+        self.assertRaises(TypeError, handler.encrypt_many, [None])
+
 des_crypt_os_crypt_test, des_crypt_builtin_test = \
                     _des_crypt_test.create_backend_cases(["os_crypt","builtin"])
 
@@ -827,6 +874,30 @@ class _md5_crypt_test(HandlerCase):
         ("darwin", False),
     ]
 
+    def test_90_md5_engine(self):
+        """test builtin backend w/ each md5-crypt engine"""
+        if self.backend != "builtin":
+            raise self.skipTest("only relevant for builtin backend")
+        for engine in ["reference", "fast"]:
+            patchAttr(self, self.handler, "md5_engine", engine)
+            for secret, hash in self.known_correct_hashes:
+                self.assertTrue(self.do_verify(secret, hash), "engine=%r:" % (engine,))
+
+    def test_91_md5_engine_fuzz(self):
+        """test fast md5-crypt engine against reference"""
+        from passlib.handlers.md5_crypt import _raw_md5_crypt, _fast_md5_crypt
+        from passlib.utils import rng, getrandbytes, getrandstr
+        if self.backend != "builtin":
+            raise self.skipTest("only relevant for builtin backend")
+        # NOTE: includes passwords long enough that permutations span multiple md5 blocks
+        for size in [0, 1, 7, 16, 31, 32, 33, 64, 100]:
+            secret = getrandbytes(rng, size).replace(b"\x00", b"x")
+            salt = getrandstr(rng, self.handler.salt_chars, rng.randint(0, 8))
+            for use_apr in [False, True]:
+                self.assertEqual(_fast_md5_crypt(secret, salt, use_apr),
+                                 _raw_md5_crypt(secret, salt, use_apr),
+                                 "secret=%r salt=%r apr=%r:" % (secret, salt, use_apr))
+
 md5_crypt_os_crypt_test, md5_crypt_builtin_test = \
                    _md5_crypt_test.create_backend_cases(["os_crypt","builtin"])
 
@@ -1928,6 +1999,36 @@ class _sha256_crypt_test(HandlerCase):
         # solaris - depends on policy
     ]
 
+    def test_90_sha2_engine(self):
+        """test builtin backend w/ each sha2-crypt engine"""
+        if self.backend != "builtin":
+            raise self.skipTest("only relevant for builtin backend")
+        for engine in ["reference", "fast"]:
+            patchAttr(self, self.handler, "sha2_engine", engine)
+            for secret, hash in self.known_correct_hashes:
+                # NOTE: skipping high rounds, to keep the reference engine from being slow
+                if self.handler.from_string(hash).rounds > 10000:
+                    continue
+                self.assertTrue(self.do_verify(secret, hash), "engine=%r:" % (engine,))
+
+    def test_91_sha2_engine_fuzz(self):
+        """test fast sha2-crypt engine against reference"""
+        from passlib.handlers.sha2_crypt import _raw_sha2_crypt, _fast_sha2_crypt
+        from passlib.utils import rng, getrandbytes, getrandstr
+        if self.backend != "builtin":
+            raise self.skipTest("only relevant for builtin backend")
+        # NOTE: includes passwords long enough to use the large-password digest P code,
+        #       and rounds which exercise the leftover pair & odd round code.
+        for size, rounds in [(0, 1000), (1, 1001), (15, 1041), (64, 1042),
+                             (100, 1043), (200, 1000)]:
+            secret = getrandbytes(rng, size).replace(b"\x00", b"x")
+            salt = getrandstr(rng, self.handler.salt_chars, rng.randint(0, 16))
+            for use_512 in [False, True]:
+                self.assertEqual(_fast_sha2_crypt(secret, salt, rounds, use_512),
+                                 _raw_sha2_crypt(secret, salt, rounds, use_512),
+                                 "secret=%r salt=%r rounds=%r use_512=%r:" %
+                                 (secret, salt, rounds, use_512))
+
 sha256_crypt_os_crypt_test, sha256_crypt_builtin_test = \
                    _sha256_crypt_test.create_backend_cases(["os_crypt","builtin"])
 
@@ -2009,6 +2110,18 @@ class _sha512_crypt_test(HandlerCase):
 
     platform_crypt_support = _sha256_crypt_test.platform_crypt_support
 
+    def test_90_sha2_engine(self):
+        """test builtin backend w/ each sha2-crypt engine"""
+        if self.backend != "builtin":
+            raise self.skipTest("only relevant for builtin backend")
+        for engine in ["reference", "fast"]:
+            patchAttr(self, self.handler, "sha2_engine", engine)
+            for secret, hash in self.known_correct_hashes:
+                # NOTE: skipping high rounds, to keep the reference engine from being slow
+                if self.handler.from_string(hash).rounds > 10000:
+                    continue
+                self.assertTrue(self.do_verify(secret, hash), "engine=%r:" % (engine,))
+
 sha512_crypt_os_crypt_test, sha512_crypt_builtin_test = \
                    _sha512_crypt_test.create_backend_cases(["os_crypt","builtin"])
 
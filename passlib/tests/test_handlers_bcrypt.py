@@ -358,6 +358,95 @@ class _bcrypt_test(HandlerCase):
         # make sure normhash() leaves non-bcrypt hashes alone
         self.assertEqual(bcrypt.normhash("$md5$abc"), "$md5$abc")
 
+    def test_91_verify_cache(self):
+        """test enable_verify_cache()"""
+        handler = self.handler
+        self.addCleanup(handler.disable_verify_cache)
+        handler.enable_verify_cache(max_entries=2, ttl=60)
+        cache = handler._verify_cache
+        now = [1000.0]
+        cache._timer = lambda: now[0]
+
+        hash = handler.encrypt("test", rounds=handler.min_rounds)
+        hash2 = handler.encrypt("test2", rounds=handler.min_rounds)
+
+        # failures shouldn't be cached
+        self.assertFalse(handler.verify("wrong", hash))
+        self.assertEqual(len(cache), 0)
+
+        # successes should be, and hit the cache on next call
+        self.assertTrue(handler.verify("test", hash))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.hits, 0)
+        self.assertTrue(handler.verify(u("test"), hash.encode("ascii")))
+        self.assertEqual(cache.hits, 1)
+        self.assertFalse(handler.verify("wrong", hash))
+
+        # key shouldn't contain the secret
+        key, = list(cache._entries)
+        self.assertEqual(key[0], hash)
+        self.assertEqual(len(key[1]), 32)
+        self.assertFalse(b"test" in key[1])
+
+        # should still validate secrets
+        self.assertRaises(TypeError, handler.verify, None, hash)
+
+        # invalidate hook should remove only that hash's entries
+        self.assertTrue(handler.verify("test2", hash2))
+        self.assertEqual(len(cache), 2)
+        handler.invalidate_verify_cache(hash)
+        self.assertEqual([k[0] for k in cache._entries], [hash2])
+        handler.invalidate_verify_cache()
+        self.assertEqual(len(cache), 0)
+
+        # lru eviction
+        self.assertTrue(handler.verify("test", hash))
+        self.assertTrue(handler.verify("test2", hash2))
+        self.assertTrue(handler.verify("test", hash))
+        hash3 = handler.encrypt("test3", rounds=handler.min_rounds)
+        self.assertTrue(handler.verify("test3", hash3))
+        self.assertEqual(sorted(k[0] for k in cache._entries), sorted([hash, hash3]))
+
+        # entries should expire (and be removed)
+        now[0] += 61
+        hits = cache.hits
+        self.assertTrue(handler.verify("test", hash))
+        self.assertEqual(cache.hits, hits)
+        self.assertEqual(len(cache), 1)
+
+        # disabling should wipe the cache
+        handler.disable_verify_cache()
+        self.assertEqual(len(cache), 0)
+        self.assertIs(handler._verify_cache, None)
+        self.assertTrue(handler.verify("test", hash))
+
+    def test_91_verify_cache_subclass(self):
+        """test enable_verify_cache() is per-class"""
+        from passlib.hash import bcrypt, bcrypt_sha256
+        self.addCleanup(bcrypt.disable_verify_cache)
+        self.addCleanup(bcrypt_sha256.disable_verify_cache)
+
+        # subclass shouldn't inherit parent's cache
+        bcrypt.enable_verify_cache()
+        self.assertIsNot(bcrypt._get_verify_cache(), None)
+        self.assertIs(bcrypt_sha256._get_verify_cache(), None)
+        hash = bcrypt_sha256.encrypt("test", rounds=bcrypt_sha256.min_rounds)
+        self.assertTrue(bcrypt_sha256.verify("test", hash))
+        self.assertEqual(len(bcrypt._get_verify_cache()), 0)
+
+        # subclass should get separate cache
+        bcrypt_sha256.enable_verify_cache()
+        cache = bcrypt_sha256._get_verify_cache()
+        self.assertIsNot(cache, bcrypt._get_verify_cache())
+        self.assertTrue(bcrypt_sha256.verify("test", hash))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(len(bcrypt._get_verify_cache()), 0)
+
+        # disabling parent shouldn't affect subclass
+        bcrypt.disable_verify_cache()
+        self.assertIs(bcrypt._get_verify_cache(), None)
+        self.assertIs(bcrypt_sha256._get_verify_cache(), cache)
+
 # create test cases for specific backends
 bcrypt_bcrypt_test, bcrypt_pybcrypt_test, bcrypt_bcryptor_test, bcrypt_os_crypt_test, bcrypt_builtin_test = \
                _bcrypt_test.create_backend_cases(["bcrypt", "pybcrypt", "bcryptor", "os_crypt", "builtin"])
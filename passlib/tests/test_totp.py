@@ -15,7 +15,7 @@ import time as _time
 # pkg
 from passlib import exc
 from passlib.utils import to_bytes, to_unicode
-from passlib.utils.compat import unicode, u
+from passlib.utils.compat import unicode, u, irange
 from passlib.tests.utils import TestCase
 # local
 __all__ = [
@@ -446,6 +446,45 @@ class _BaseOTPTest(TestCase):
         _ = otp.base32_key
         _ = otp.pretty_key()
 
+    #=============================================================================
+    # internal helpers
+    #=============================================================================
+
+    def test_find_match_order(self):
+        """_find_match() -- search order"""
+        otp = self.randotp(digits=6)
+        calls = []
+        def generate(counter):
+            calls.append(counter)
+            return "123456" if counter == match else "000000"
+        otp._generate = generate
+
+        # should work outward from expected value, checking earlier counters first
+        match = None
+        self.assertEqual(otp._find_match("123456", 0, 10, 5), (False, 0))
+        self.assertEqual(calls, [5, 4, 6, 3, 7, 2, 8, 1, 9, 0])
+
+        # should stop once match is found
+        del calls[:]
+        match = 7
+        self.assertEqual(otp._find_match("123456", 0, 10, 5), (True, 7))
+        self.assertEqual(calls, [5, 4, 6, 3, 7])
+
+        # expected value should be clamped to range, and default to start
+        for expected, order in [(None, [2, 3, 4]), (0, [2, 3, 4]), (9, [4, 3, 2])]:
+            del calls[:]
+            match = None
+            otp._find_match("123456", 2, 5, expected)
+            self.assertEqual(calls, order)
+
+    def test_keyed_prf_cache(self):
+        """_keyed_prf -- should be calculated once per instance"""
+        otp = self.randotp()
+        prf = otp._keyed_prf
+        otp._generate(0)
+        self.assertIs(otp._keyed_prf, prf)
+        self.assertIsNot(self.randotp()._keyed_prf, prf)
+
     #=============================================================================
     # eoc
     #=============================================================================
@@ -768,6 +807,33 @@ class TotpTest(_BaseOTPTest):
             if expires:
                 self.assertEqual(result.expire_time, expires)
 
+    def test_generate_range(self):
+        """generate_range()"""
+        from passlib.totp import TotpToken
+        otp = self.randotp()
+        time = randtime()
+
+        # should match generate() for each step which overlaps range
+        result = otp.generate_range(time - 95, time)
+        self.assertEqual([step.counter for step in result],
+                         list(irange(otp.generate(time - 95).counter,
+                                     otp.generate(time).counter + 1)))
+        self.assertEqual(result, [otp.generate(step.counter * otp.period)
+                                  for step in result])
+        self.assertIsInstance(result[0], TotpToken)
+
+        # single step, empty range
+        self.assertEqual(otp.generate_range(time, time), [otp.generate(time)])
+        self.assertEqual(otp.generate_range(time, time - 2 * otp.period), [])
+
+        # reject invalid time
+        self.assertRaises(ValueError, otp.generate_range, -1, time)
+
+        # reference vectors
+        for otp, time, token, expires, prefix in self.iter_test_vectors():
+            result = otp.generate_range(time, time)
+            self.assertEqual([step.token for step in result], [token], msg=prefix)
+
     #=============================================================================
     # generate_next()
     #=============================================================================
@@ -1603,6 +1669,23 @@ class HotpTest(_BaseOTPTest):
             result = otp.generate(counter)
             self.assertEqual(result, token, msg=msg)
 
+    def test_generate_range(self):
+        """generate_range()"""
+        counter = randcounter()
+        otp = self.randotp()
+        self.assertEqual(otp.generate_range(counter, counter + 20),
+                         [otp.generate(value) for value in irange(counter, counter + 20)])
+        self.assertEqual(otp.generate_range(counter, counter), [])
+        self.assertEqual(otp.generate_range(counter, counter - 1), [])
+
+        # reject invalid counters
+        self.assertRaises(ValueError, otp.generate_range, -1, 10)
+        self.assertRaises(TypeError, otp.generate_range, 0, None)
+
+        # reference vectors
+        for otp, counter, token, msg in self.iter_test_vectors():
+            self.assertEqual(otp.generate_range(counter, counter + 1), [token], msg=msg)
+
     #=============================================================================
     # generate_next()
     #=============================================================================
@@ -2095,6 +2178,209 @@ class HotpTest(_BaseOTPTest):
     # eoc
     #=============================================================================
 
+#=============================================================================
+# TotpStore
+#=============================================================================
+from passlib.totp import TotpStore, MemoryTotpBackend, SqliteTotpBackend
+
+class _TotpStoreTest(TestCase):
+    """common tests for TotpStore + backends"""
+    descriptionPrefix = "TotpStore"
+
+    #: time used by store's clock
+    time = 1419622739
+
+    def create_backend(self):
+        raise NotImplementedError("implement in subclass")
+
+    def create_store(self, backend=None, **kwds):
+        if backend is None:
+            backend = self.create_backend()
+        return TotpStore(backend, now=lambda: self.time, **kwds)
+
+    def wrong_token(self, otp):
+        """return token which won't match otp near current time"""
+        token = otp.generate(self.time).token
+        return "%06d" % ((int(token) + 1) % 1000000)
+
+    def test_00_enroll(self):
+        """enroll() / get() / delete()"""
+        store = self.create_store()
+        self.assertIs(store.get("alice"), None)
+        store.enroll("alice", TOTP(KEY1, last_counter=5))
+        otp = store.get("alice")
+        self.assertIsInstance(otp, TOTP)
+        self.assertEqual(otp.base32_key, KEY1)
+        self.assertEqual(otp.last_counter, 5)
+        self.assertRaises(TypeError, store.enroll, "bob", HOTP(KEY1))
+        self.assertTrue(store.delete("alice"))
+        self.assertFalse(store.delete("alice"))
+        self.assertIs(store.get("alice"), None)
+
+    def test_01_enroll_w_password(self):
+        """enroll() w/ password encrypts key"""
+        store = self.create_store(password="secret")
+        store.enroll("alice", TOTP(KEY1))
+        data = store.backend.load("alice")[0]
+        self.assertNotIn(KEY1, data)
+        self.assertEqual(store.get("alice").base32_key, KEY1)
+
+    def test_10_verify_next(self):
+        """verify_next()"""
+        store = self.create_store()
+        otp = TOTP(KEY1)
+        store.enroll("alice", otp)
+        self.assertIs(store.verify_next("bob", "123456"), None)
+
+        # wrong token
+        token = otp.generate(self.time).token
+        self.assertFalse(store.verify_next("alice", self.wrong_token(otp)))
+
+        # previous period's token accepted, then current period's
+        prev = otp.generate(self.time - 30).token
+        self.assertTrue(store.verify_next("alice", prev))
+        self.assertTrue(store.verify_next("alice", token))
+        self.assertEqual(store.get("alice").last_counter, otp.generate(self.time).counter)
+
+        # older token now rejected, current token rejected as reuse
+        self.assertFalse(store.verify_next("alice", prev))
+        self.assertRaises(exc.TokenReuseError, store.verify_next, "alice", token)
+        self.assertTrue(store.verify_next("alice", token, reuse=True))
+
+        # history should be recorded
+        history = store.get("alice")._history
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[-1][0], self.time)
+
+        # malformed token
+        self.assertRaises(ValueError, store.verify_next, "alice", "abc")
+
+    def test_11_reuse_across_stores(self):
+        """verify_next() rejects reuse across stores sharing a backend"""
+        backend = self.create_backend()
+        store1 = self.create_store(backend)
+        store2 = self.create_store(self.create_backend_peer(backend))
+        otp = TOTP(KEY1)
+        store1.enroll("alice", otp)
+        token = otp.generate(self.time).token
+
+        # warm store2's cache, then use token via store1
+        self.assertFalse(store2.verify_next("alice", self.wrong_token(otp)))
+        self.assertTrue(store1.verify_next("alice", token))
+        self.assertRaises(exc.TokenReuseError, store2.verify_next, "alice", token)
+
+    def test_12_lost_race(self):
+        """verify_next() detects counter advanced by another request"""
+        store = self.create_store()
+        otp = TOTP(KEY1)
+        store.enroll("alice", otp)
+        token = otp.generate(self.time).token
+        counter = otp.generate(self.time).counter
+        backend = store.backend
+
+        # simulate another request advancing counter between load & advance
+        orig_load = backend.load
+        def load(user):
+            record = orig_load(user)
+            backend.advance(user, counter, None)
+            return record
+        backend.load = load
+        try:
+            self.assertRaises(exc.TokenReuseError, store.verify_next, "alice", token)
+        finally:
+            del backend.load
+
+    def test_20_cache(self):
+        """parsed TOTP objects are cached"""
+        store = self.create_store(cache_size=2)
+        for user in ["alice", "bob", "carol"]:
+            store.enroll(user, TOTP(KEY1))
+            store.verify_next(user, "000000")
+        self.assertEqual(list(store._cache), ["bob", "carol"])
+        otp = store._cache["carol"][1]
+        store.verify_next("carol", "000000")
+        self.assertIs(store._cache["carol"][1], otp)
+
+        # re-enrolling invalidates entry
+        store.enroll("carol", TOTP(KEY3))
+        self.assertNotIn("carol", store._cache)
+        self.assertTrue(store.verify_next("carol", TOTP(KEY3).generate(self.time).token))
+
+        # disabled cache
+        store = self.create_store(cache_size=0)
+        store.enroll("alice", TOTP(KEY1))
+        store.verify_next("alice", "000000")
+        self.assertEqual(len(store._cache), 0)
+
+    def test_30_verify_many(self):
+        """verify_many()"""
+        store = self.create_store()
+        otp1 = TOTP(KEY1)
+        otp2 = TOTP(KEY3)
+        store.enroll("alice", otp1)
+        store.enroll("bob", otp2)
+        token1 = otp1.generate(self.time).token
+        token2 = otp2.generate(self.time).token
+        result = store.verify_many([
+            ("alice", token1),
+            ("bob", "abc"),
+            ("carol", token1),
+            ("alice", token1),
+            ("bob", token2),
+        ])
+        self.assertEqual(result, [True, False, None, False, True])
+        self.assertEqual(store.verify_many([("alice", token1)], reuse=True), [True])
+
+    #=============================================================================
+    # eoc
+    #=============================================================================
+
+class MemoryTotpStoreTest(_TotpStoreTest):
+    """TotpStore w/ MemoryTotpBackend"""
+    descriptionPrefix = "TotpStore (memory)"
+
+    def create_backend(self):
+        return MemoryTotpBackend()
+
+    def create_backend_peer(self, backend):
+        return backend
+
+class SqliteTotpStoreTest(_TotpStoreTest):
+    """TotpStore w/ SqliteTotpBackend"""
+    descriptionPrefix = "TotpStore (sqlite)"
+
+    def setUp(self):
+        super(SqliteTotpStoreTest, self).setUp()
+        try:
+            import sqlite3
+        except ImportError:
+            raise self.skipTest("sqlite3 not available")
+
+    def create_backend(self):
+        return SqliteTotpBackend(self.mktemp(suffix=".db"))
+
+    def create_backend_peer(self, backend):
+        # separate connection to same file, like another process would have
+        return SqliteTotpBackend(backend.path)
+
+    def test_40_table_name(self):
+        """table name is validated"""
+        path = self.mktemp(suffix=".db")
+        self.assertRaises(ValueError, SqliteTotpBackend, path, table="x; DROP TABLE y")
+        backend = SqliteTotpBackend(path, table="otp_users")
+        backend.save("alice", "data", 3)
+        self.assertEqual(tuple(backend.load("alice")), ("data", 3, None))
+
+    def test_41_load_many_chunks(self):
+        """load_many() splits large queries"""
+        backend = self.create_backend()
+        backend.query_chunk_size = 3
+        for idx in irange(10):
+            backend.save("user%d" % idx, "data%d" % idx)
+        result = backend.load_many(["user%d" % idx for idx in irange(12)])
+        self.assertEqual(sorted(result), ["user%d" % idx for idx in irange(10)])
+        self.assertEqual(result["user7"], ("data7", 0, None))
+
 #=============================================================================
 # eof
 #=============================================================================
@@ -4,12 +4,13 @@
 #=============================================================================
 from __future__ import with_statement
 # core
+import os
 import random
 # site
 # pkg
 # module
 from passlib.utils.compat import irange, PY3, u, unicode, join_bytes
-from passlib.tests.utils import TestCase
+from passlib.tests.utils import TestCase, patchAttr
 
 #=============================================================================
 # byte funcs
@@ -383,6 +384,201 @@ class MiscTest(TestCase):
         self.assertEqual(splitcomma(" a , b"), ['a', 'b'])
         self.assertEqual(splitcomma(" a, b, "), ['a', 'b'])
 
+    def test_calibrate_rounds(self):
+        """test calibrate_rounds()"""
+        from passlib.utils import calibrate
+        from passlib.hash import bcrypt, sha256_crypt
+        calibrate_rounds = calibrate.calibrate_rounds
+
+        # linear handlers should round to nearest value
+        self.assertEqual(calibrate_rounds(sha256_crypt, .25, 100003), 25001)
+        self.assertEqual(calibrate_rounds(sha256_crypt, .25, 99997), 24999)
+
+        # log2 handlers should round down
+        self.assertEqual(calibrate_rounds(bcrypt, .25, 2**12 * 4 * 1.9), 12)
+        self.assertEqual(calibrate_rounds(bcrypt, .25, 2**12 * 4), 12)
+
+        # should be clamped to handler limits
+        self.assertEqual(calibrate_rounds(sha256_crypt, .25, 1), 1000)
+        self.assertEqual(calibrate_rounds(bcrypt, .001, 1), 4)
+        self.assertEqual(calibrate_rounds(bcrypt, 1e6, 2**40), 31)
+        self.assertRaises(ValueError, calibrate_rounds, sha256_crypt, 0, 1)
+
+        # measured speed should be cached in-process when disk cache disabled
+        self.addCleanup(calibrate.clear_cache)
+        speed = calibrate.get_speed(sha256_crypt, .01, cache_path=False)
+        self.assertGreater(speed, 0)
+        self.assertEqual(calibrate.get_speed(sha256_crypt, .01, cache_path=False),
+                         speed)
+        rounds = calibrate_rounds(sha256_crypt, .01, speed)
+        self.assertTrue(sha256_crypt.min_rounds <= rounds <= sha256_crypt.max_rounds)
+
+#=============================================================================
+# host crypt() helpers
+#=============================================================================
+class OsCryptTest(TestCase):
+    """tests passlib.utils.oscrypt"""
+
+    # configs to check each mode against stdlib crypt() with
+    # (those the host doesn't support are skipped)
+    crypt_configs = [
+        "aa",
+        "$1$abcdefgh$",
+        "$5$rounds=1000$abcdefgh$",
+        "$6$rounds=1000$abcdefgh$",
+        "$2b$04$abcdefghijklmnopqrstuu",
+    ]
+
+    def setUp(self):
+        super(OsCryptTest, self).setUp()
+        from passlib.utils import oscrypt
+        if not oscrypt.has_host_crypt():
+            raise self.skipTest("crypt() not available")
+        self.addCleanup(oscrypt.set_crypt_mode, oscrypt.get_crypt_mode())
+
+    def check_mode(self, mode):
+        """check safe_crypt() returns same results as stdlib crypt()"""
+        from passlib.utils import oscrypt, safe_crypt
+        if oscrypt._stdlib_crypt is None:
+            raise self.skipTest("stdlib crypt() not available")
+        self.assertEqual(oscrypt.set_crypt_mode(mode), mode)
+        self.assertEqual(oscrypt.get_crypt_mode(), mode)
+        for config in self.crypt_configs:
+            for secret in [u("test"), u("test\u1234")]:
+                native = secret if PY3 else secret.encode("utf-8")
+                correct = oscrypt._stdlib_crypt(native, config)
+                if not correct or correct[0] in "*:!":
+                    continue
+                self.assertEqual(safe_crypt(secret, config), correct,
+                                 "mode=%r config=%r:" % (mode, config))
+
+    def test_set_crypt_mode(self):
+        """test set_crypt_mode()"""
+        from passlib.utils import oscrypt
+        self.assertRaises(ValueError, oscrypt.set_crypt_mode, "xxx")
+        self.assertRaises(ValueError, oscrypt.set_crypt_mode, "process", 0)
+        expected = "crypt_r" if oscrypt.has_crypt_r() else "stdlib"
+        self.assertEqual(oscrypt.set_crypt_mode(), expected)
+        if not oscrypt.has_crypt_r():
+            self.assertRaises(RuntimeError, oscrypt.set_crypt_mode, "crypt_r")
+
+    def test_stdlib_mode(self):
+        """test 'stdlib' mode"""
+        self.check_mode("stdlib")
+
+    def test_crypt_r_mode(self):
+        """test 'crypt_r' mode"""
+        from passlib.utils import oscrypt
+        if not oscrypt.has_crypt_r():
+            raise self.skipTest("crypt_r() not available")
+        self.check_mode("crypt_r")
+
+    def test_crypt_r_releases_gil(self):
+        """test 'crypt_r' mode lets other threads run"""
+        import threading
+        from passlib.utils import oscrypt, safe_crypt
+        if not oscrypt.has_crypt_r():
+            raise self.skipTest("crypt_r() not available")
+        oscrypt.set_crypt_mode("crypt_r")
+        config = "$6$rounds=200000$abcdefgh$"
+        if not safe_crypt("test", config):
+            raise self.skipTest("sha512_crypt not supported by crypt()")
+
+        # if the GIL is held during crypt_r(), this thread won't
+        # get to run (much) until the other thread has finished.
+        started = threading.Event()
+        def target():
+            started.set()
+            safe_crypt("test", config)
+        thread = threading.Thread(target=target)
+        thread.start()
+        started.wait()
+        count = 0
+        while thread.is_alive():
+            count += 1
+        thread.join()
+        self.assertGreater(count, 10000)
+
+    def test_lazy_import(self):
+        """test importing passlib doesn't load crypt_r() or run subprocesses"""
+        import subprocess
+        import sys
+        if not hasattr(sys, "addaudithook"):
+            raise self.skipTest("requires python 3.8+")
+        source = (
+            "import sys\n"
+            "events = []\n"
+            "sys.addaudithook(lambda event, args: events.append(event) if event in\n"
+            "                 ('subprocess.Popen', 'ctypes.dlopen') else None)\n"
+            "import passlib.utils, passlib.hash, passlib.context\n"
+            "from passlib.utils import oscrypt\n"
+            "assert oscrypt._crypt_r is None\n"
+            "print(','.join(events))\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        output = subprocess.check_output([sys.executable, "-W", "ignore", "-c", source],
+                                         env=env)
+        self.assertEqual(output.strip(), b"")
+
+    def test_load_crypt_r(self):
+        """test crypt_r() is loaded w/o calling find_library() when possible"""
+        import ctypes.util
+        from passlib.utils import oscrypt
+        if not oscrypt.has_crypt_r():
+            raise self.skipTest("crypt_r() not available")
+        self.addCleanup(setattr, oscrypt, "_crypt_r", oscrypt._crypt_r)
+        calls = []
+        def find_library(name):
+            calls.append(name)
+            return None
+        patchAttr(self, ctypes.util, "find_library", find_library)
+        oscrypt._crypt_r = None
+        if not oscrypt.has_crypt_r():
+            raise self.skipTest("crypt_r() not in any of the well-known libraries")
+        self.assertEqual(calls, [])
+
+    def test_load_threaded(self):
+        """test crypt_r() loading & mode resolution are thread-safe"""
+        import threading
+        import time
+        from passlib.utils import oscrypt
+        self.addCleanup(setattr, oscrypt, "_crypt_r", oscrypt._crypt_r)
+        self.addCleanup(oscrypt.set_crypt_mode, oscrypt.get_crypt_mode() or "auto")
+
+        # other threads shouldn't see crypt_r() as missing while it's being loaded
+        calls = []
+        def find_crypt_r():
+            calls.append(None)
+            time.sleep(.05)
+            return find_crypt_r
+        patchAttr(self, oscrypt, "_find_crypt_r", find_crypt_r)
+        orig = oscrypt._set_crypt_mode
+        def set_crypt_mode(mode, processes):
+            calls.append(mode)
+            return orig(mode, processes)
+        patchAttr(self, oscrypt, "_set_crypt_mode", set_crypt_mode)
+        oscrypt._crypt_r = None
+        oscrypt._impl = oscrypt._unresolved
+        results = []
+        def target():
+            results.append(oscrypt.get_crypt_mode())
+        threads = [threading.Thread(target=target) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["crypt_r"] * 4)
+        self.assertEqual(calls, ["auto", None])
+
+    def test_process_mode(self):
+        """test 'process' mode"""
+        from passlib.utils import oscrypt
+        self.check_mode("process")
+        self.assertIsNot(oscrypt._pool, None)
+        oscrypt.set_crypt_mode("stdlib")
+        self.assertIs(oscrypt._pool, None)
+
 #=============================================================================
 # byte/unicode helpers
 #=============================================================================
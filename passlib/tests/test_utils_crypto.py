@@ -8,14 +8,10 @@ from binascii import hexlify, unhexlify
 import hashlib
 import warnings
 # site
-try:
-    import M2Crypto
-except ImportError:
-    M2Crypto = None
 # pkg
 # module
 from passlib.utils.compat import bascii_to_str, PY3, u, JYTHON
-from passlib.tests.utils import TestCase, TEST_MODE, skipUnless
+from passlib.tests.utils import TestCase, TEST_MODE, skipUnless, patchAttr
 
 #=============================================================================
 # support
@@ -309,6 +305,149 @@ class DesTest(TestCase):
         # check invalid rounds
         self.assertRaises(ValueError, des_encrypt_int_block, 0, 0, 0, rounds=0)
 
+    def test_05_engines(self):
+        """test get_des_engine()"""
+        from passlib.utils.des import des_encrypt_int_block, get_des_engine
+        from passlib.utils import rng
+
+        self.assertIs(get_des_engine("reference"), des_encrypt_int_block)
+        self.assertRaises(ValueError, get_des_engine, "xxx")
+        engine = get_des_engine()
+
+        # run through test vectors
+        for key, plaintext, correct in self.des_test_vectors:
+            self.assertEqual(engine(key, plaintext, 0, 1), correct)
+
+        # compare against reference w/ random salts & rounds
+        for _ in range(20):
+            key = rng.getrandbits(64)
+            input = rng.choice([0, rng.getrandbits(64)])
+            salt = rng.getrandbits(24)
+            rounds = rng.randint(1, 30)
+            self.assertEqual(engine(key, input, salt, rounds),
+                             des_encrypt_int_block(key, input, salt, rounds))
+
+    def test_06_encrypt_many(self):
+        """test des_encrypt_int_blocks()"""
+        from passlib.utils.des import des_encrypt_int_block, des_encrypt_int_blocks
+        from passlib.utils import rng
+
+        # run through test vectors (each has different input, so done one at a time)
+        for key, plaintext, correct in self.des_test_vectors:
+            self.assertEqual(des_encrypt_int_blocks([key], plaintext), [correct])
+
+        # compare against reference, using batches large enough to be bitsliced
+        for count, rounds in [(0, 1), (5, 25), (150, 25), (200, 3)]:
+            keys = [self._random_parity(rng.getrandbits(64)) for _ in range(count)]
+            salts = [rng.getrandbits(24) for _ in range(count)]
+            input = rng.choice([0, rng.getrandbits(64)])
+            self.assertEqual(des_encrypt_int_blocks(keys, input, salts, rounds),
+                             [des_encrypt_int_block(key, input, salt, rounds)
+                              for key, salt in zip(keys, salts)])
+        keys = [rng.getrandbits(64) for _ in range(100)]
+        self.assertEqual(des_encrypt_int_blocks(keys),
+                         [des_encrypt_int_block(key, 0) for key in keys])
+
+        # check invalid args
+        self.assertRaises(TypeError, des_encrypt_int_blocks, [b'\x00'])
+        self.assertRaises(ValueError, des_encrypt_int_blocks, [-1])
+        self.assertRaises(TypeError, des_encrypt_int_blocks, [0], b'\x00')
+        self.assertRaises(ValueError, des_encrypt_int_blocks, [0], -1)
+        self.assertRaises(ValueError, des_encrypt_int_blocks, [0], 0, [1<<24])
+        self.assertRaises(ValueError, des_encrypt_int_blocks, [0], 0, [0, 0])
+        self.assertRaises(ValueError, des_encrypt_int_blocks, [0], 0, None, 0)
+
+    def test_07_bitslice_generated(self):
+        """test _des_bitslice.py matches output of _des_gen.py"""
+        from passlib.utils import _des_gen, _des_bitslice
+        bit_index, _ = _des_gen.get_output_bits()
+        self.assertEqual(_des_bitslice.BIT_INDEX, tuple(bit_index))
+        self.assertEqual(_des_bitslice.KEY_MAP,
+                         tuple(tuple(entry) for entry in _des_gen.get_key_map()))
+
+    def test_08_cache(self):
+        """test DesCache"""
+        from passlib.utils import des
+        from passlib.utils.des import DesCache, des_encrypt_int_block, get_des_engine, \
+                                      _expand_salt as cache_salt
+        from passlib.utils import rng
+
+        self.assertIsInstance(des.get_des_cache(), DesCache)
+        self.assertRaises(ValueError, DesCache, max_salts=-1)
+        self.assertRaises(ValueError, DesCache, max_keys=-1)
+
+        # defaults should keep memory use small (~1MB per salt)
+        default = DesCache()
+        self.assertEqual((default.max_salts, default.max_keys), (8, 0))
+
+        cache = DesCache(max_salts=2, max_keys=2)
+        patchAttr(self, des, "_des_cache", cache)
+        engine = get_des_engine()
+        key = rng.getrandbits(64)
+        def check(salt, key=key):
+            self.assertEqual(engine(key, 0, salt, 25),
+                             des_encrypt_int_block(key, 0, salt, 25))
+
+        # salt tables are only built once salt is seen a second time
+        check(1)
+        self.assertEqual(cache.stats()["salts"], 0)
+        check(1)
+        check(1)
+        stats = cache.stats()
+        self.assertEqual(stats["salts"], 1)
+        self.assertEqual(stats["salt_builds"], 1)
+        self.assertEqual((stats["salt_hits"], stats["salt_misses"]), (1, 2))
+        self.assertAlmostEqual(stats["salt_hit_rate"], 1/3.0)
+
+        # key schedules
+        self.assertEqual((stats["key_hits"], stats["key_misses"]), (2, 1))
+        self.assertEqual(stats["keys"], 1)
+        for _ in range(3):
+            check(1, rng.getrandbits(64))
+        self.assertEqual(cache.stats()["keys"], 2)
+
+        # lru eviction of salt tables
+        for salt in [2, 2, 3, 3]:
+            check(salt)
+        self.assertEqual(list(cache._salts), [cache_salt(2), cache_salt(3)])
+        check(2)
+        self.assertEqual(list(cache._salts), [cache_salt(3), cache_salt(2)])
+
+        # builds are throttled if they haven't been paying off
+        cache._credit = 0
+        check(4)
+        check(4)
+        self.assertEqual(cache.stats()["salt_builds"], 3)
+        self.assertNotIn(cache_salt(4), cache._salts)
+
+        # set_limits() should trim, clear() should reset everything
+        cache.set_limits(max_salts=1, max_keys=0)
+        self.assertEqual(len(cache._salts), 1)
+        self.assertEqual(len(cache._keys), 0)
+        check(2)
+        cache.clear()
+        self.assertEqual(cache.stats(), dict(salt_hits=0, salt_misses=0, salt_hit_rate=0.0,
+                                             salt_builds=0, salts=0, key_hits=0,
+                                             key_misses=0, key_hit_rate=0.0, keys=0))
+
+        # salt tables can be disabled entirely
+        cache.set_limits(max_salts=0)
+        for _ in range(3):
+            check(5)
+        self.assertEqual(cache.stats()["salt_misses"], 0)
+
+        # small batches should be processed in salt order, so tables get reused
+        cache.set_limits(max_salts=1)
+        cache.clear()
+        keys = [rng.getrandbits(64) for _ in range(8)]
+        salts = [6, 7] * 4
+        self.assertEqual(des.des_encrypt_int_blocks(keys, 0, salts, 25),
+                         [des_encrypt_int_block(key, 0, salt, 25)
+                          for key, salt in zip(keys, salts)])
+        stats = cache.stats()
+        self.assertEqual(stats["salt_builds"], 2)
+        self.assertEqual(stats["salt_hits"], 4)
+
 #=============================================================================
 # test pure-python MD4 implementation
 #=============================================================================
@@ -628,24 +767,99 @@ class _Pbkdf2_Test(TestCase):
         result = pbkdf2(b'secret', b'salt', 1000, 20, prf)
         self.assertEqual(result, hb('5fe7ce9f7e379d3f65cbc66ba8aa6440474a6849'))
 
+    def test_many(self):
+        """test pbkdf2_many()"""
+        from passlib.utils.pbkdf2 import pbkdf2_many
+        for row in self.pbkdf2_test_vectors:
+            correct, secret, salt, rounds, keylen = row[:5]
+            prf = row[5] if len(row) == 6 else "hmac-sha1"
+            for workers in [None, 2]:
+                result = pbkdf2_many([secret, b'x', secret], [salt, salt, salt],
+                                     rounds, keylen, prf, workers=workers)
+                self.assertEqual(result[0], correct)
+                self.assertEqual(result[2], correct)
+                self.assertNotEqual(result[1], correct)
+
+        # empty input
+        self.assertEqual(pbkdf2_many([], [], 1), [])
+
+        # border cases
+        self.assertRaises(ValueError, pbkdf2_many, [b'a'], [], 1)
+        self.assertRaises(TypeError, pbkdf2_many, [u('a')], [b'x'], 1)
+        self.assertRaises(TypeError, pbkdf2_many, [b'a'], [5], 1)
+        self.assertRaises(ValueError, pbkdf2_many, [b'a'], [b'x'], 0)
+        self.assertRaises(ValueError, pbkdf2_many, [b'a'], [b'x'], 1,
+                          prf="hmac-foo")
+
 #------------------------------------------------------------------------
-# create subclasses to test with- and without- m2crypto
+# create subclasses to test each pbkdf2 backend
 #------------------------------------------------------------------------
-@skipUnless(M2Crypto, "M2Crypto not found")
-class Pbkdf2_M2Crypto_Test(_Pbkdf2_Test):
-    descriptionPrefix = "pbkdf2 (m2crypto backend)"
+def _create_pbkdf2_backend_test(backend):
+    """create pbkdf2 test case which forces use of specified backend"""
+    from passlib.utils.pbkdf2 import has_pbkdf2_backend
 
-@skipUnless(TEST_MODE("full") or not M2Crypto, "skipped under current test mode")
-class Pbkdf2_Builtin_Test(_Pbkdf2_Test):
-    descriptionPrefix = "pbkdf2 (builtin backend)"
+    def setUp(self):
+        _Pbkdf2_Test.setUp(self)
+        from passlib.utils.pbkdf2 import set_pbkdf2_backend
+        set_pbkdf2_backend(backend)
+        self.addCleanup(set_pbkdf2_backend, "default")
+
+    name = "Pbkdf2_%s_Test" % backend.title()
+    cls = type(name, (_Pbkdf2_Test,), dict(
+        descriptionPrefix = "pbkdf2 (%s backend)" % backend,
+        setUp = setUp,
+        __module__ = __name__,
+        ))
+    return skipUnless(has_pbkdf2_backend(backend), "%s backend not available" %
+                      backend)(cls)
+
+Pbkdf2_Hashlib_Test = _create_pbkdf2_backend_test("hashlib")
+Pbkdf2_Cryptography_Test = _create_pbkdf2_backend_test("cryptography")
+Pbkdf2_M2Crypto_Test = _create_pbkdf2_backend_test("m2crypto")
+
+# NOTE: builtin backend is always tested, since it's the fallback
+#       on hosts which lack (or have disabled) native pbkdf2 support.
+Pbkdf2_Builtin_Test = _create_pbkdf2_backend_test("builtin")
+
+class Pbkdf2_Backend_Test(TestCase):
+    """test pbkdf2 backend selection api"""
+    descriptionPrefix = "pbkdf2 backends"
 
     def setUp(self):
-        super(Pbkdf2_Builtin_Test, self).setUp()
-        # disable m2crypto support, and force pure-python backend
-        if M2Crypto:
-            import passlib.utils.pbkdf2 as mod
-            self.addCleanup(setattr, mod, "_EVP", mod._EVP)
-            mod._EVP = None
+        super(Pbkdf2_Backend_Test, self).setUp()
+        from passlib.utils.pbkdf2 import _clear_caches
+        _clear_caches()
+        self.addCleanup(_clear_caches)
+
+    def test_backend_api(self):
+        """test get/has/set_pbkdf2_backend()"""
+        from passlib.exc import MissingBackendError
+        from passlib.utils.pbkdf2 import pbkdf2_backends, get_pbkdf2_backend, \
+            has_pbkdf2_backend, set_pbkdf2_backend
+        self.addCleanup(set_pbkdf2_backend, "default", "sha256")
+
+        # builtin should always be available
+        self.assertTrue(has_pbkdf2_backend("builtin", "sha256"))
+        self.assertTrue(has_pbkdf2_backend("builtin", "md5"))
+
+        # m2crypto only supports sha1
+        self.assertFalse(has_pbkdf2_backend("m2crypto", "sha256"))
+
+        # bad backend / digest names
+        self.assertRaises(ValueError, has_pbkdf2_backend, "xxx")
+        self.assertRaises(ValueError, has_pbkdf2_backend, "builtin", "xxx")
+        self.assertRaises(ValueError, set_pbkdf2_backend, "xxx")
+
+        # forcing a backend for a single digest
+        set_pbkdf2_backend("builtin", "sha256")
+        self.assertEqual(get_pbkdf2_backend("sha256"), "builtin")
+        self.assertRaises(MissingBackendError, set_pbkdf2_backend,
+                          "m2crypto", "sha256")
+        self.assertEqual(get_pbkdf2_backend("sha256"), "builtin")
+
+        # restoring default
+        set_pbkdf2_backend("default", "sha256")
+        self.assertIn(get_pbkdf2_backend("sha256"), pbkdf2_backends)
 
 #=============================================================================
 # eof
@@ -10,6 +10,7 @@ import calendar
 import json
 import logging; log = logging.getLogger(__name__)
 import struct
+import threading
 import time as _time
 import re
 if PY3:
@@ -23,8 +24,9 @@ from passlib import exc
 from passlib.utils import (to_unicode, to_bytes, consteq, memoized_property,
                            getrandbytes, rng, xor_bytes)
 from passlib.utils.compat import (u, unicode, bascii_to_str, int_types, num_types,
-                                  irange, byte_elem_value, UnicodeIO)
-from passlib.utils.pbkdf2 import get_prf, norm_hash_name, pbkdf2
+                                  irange, byte_elem_value, UnicodeIO,
+                                  OrderedDict)
+from passlib.utils.pbkdf2 import get_prf, get_keyed_prf, norm_hash_name, pbkdf2
 # local
 __all__ = [
     # frontend classes
@@ -35,6 +37,11 @@ __all__ = [
     "from_uri",
     "from_string",
 
+    # server-side storage
+    "TotpStore",
+    "MemoryTotpBackend",
+    "SqliteTotpBackend",
+
     # internal helpers
     "BaseOTP",
 ]
@@ -42,6 +49,10 @@ __all__ = [
 #=============================================================================
 # internal helpers
 #=============================================================================
+
+# struct helpers used by token generation
+_pack_counter = struct.Struct(">Q").pack
+_unpack_uint32 = struct.Struct(">I").unpack_from
 class _SequenceMixin(object):
     """
     helper which lets result object act like a fixed-length sequence.
@@ -689,8 +700,13 @@ class BaseOTP(object):
     #=============================================================================
 
     @memoized_property
-    def _prf_info(self):
-        return get_prf("hmac-" + self.alg)
+    def _keyed_prf(self):
+        """
+        HMAC function bound to :attr:`key`, as returned by :func:`get_keyed_prf`.
+        this is cached per instance, so the HMAC key schedule
+        is only calculated once, rather than for every token.
+        """
+        return get_keyed_prf("hmac-" + self.alg, self.key)
 
     def _generate(self, counter):
         """
@@ -700,16 +716,16 @@ class BaseOTP(object):
         :arg counter: HOTP counter, as non-negative integer
         :returns: token as unicode string
         """
-        # generate digest
-        prf, digest_size = self._prf_info
+        # NOTE: _generate_range() does the same thing, this version just
+        #       skips the loop overhead, since it's the common case.
+        prf, digest_size = self._keyed_prf
         assert isinstance(counter, int_types), "counter must be integer"
-        digest = prf(self.key, struct.pack(">Q", counter))
-        assert len(digest) == digest_size, "digest_size: sanity check failed"
+        digest = prf(_pack_counter(counter))
+        assert digest_size >= 20, "digest_size: sanity check failed" # otherwise 0xF+4 will run off end of hash.
 
         # derive 31-bit token value
-        assert digest_size >= 20, "digest_size: sanity check 2 failed" # otherwise 0xF+4 will run off end of hash.
         offset = byte_elem_value(digest[-1]) & 0xF
-        value = struct.unpack(">I", digest[offset:offset+4])[0] & 0x7fffffff
+        value = _unpack_uint32(digest, offset)[0] & 0x7fffffff
 
         # render to decimal string, return last <digits> chars
         # NOTE: the 10'th digit is not as secure, as it can only take on values 0-2, not 0-9,
@@ -719,6 +735,30 @@ class BaseOTP(object):
         assert 0 < digits < 11, "digits: sanity check failed"
         return (u("%0*d") % (digits, value))[-digits:]
 
+    def _generate_range(self, start, end):
+        """
+        generate tokens for a range of HOTP counters.
+
+        :arg start: first counter value, as non-negative integer
+        :arg end: generate up to (but not including) this counter value
+        :returns: list of tokens as unicode strings
+        """
+        prf, digest_size = self._keyed_prf
+        assert digest_size >= 20, "digest_size: sanity check failed" # otherwise 0xF+4 will run off end of hash.
+        digits = self.digits
+        assert 0 < digits < 11, "digits: sanity check failed"
+        modulus = 10 ** digits
+        fmt = u("%0*d")
+        tokens = []
+        append = tokens.append
+        for counter in irange(start, end):
+            # same as _generate(), but w/ lookups hoisted out of the loop
+            digest = prf(_pack_counter(counter))
+            offset = byte_elem_value(digest[-1]) & 0xF
+            value = _unpack_uint32(digest, offset)[0] & 0x7fffffff
+            append(fmt % (digits, value % modulus))
+        return tokens
+
     def normalize_token(self, token):
         """
         normalize OTP token representation:
@@ -762,8 +802,11 @@ class BaseOTP(object):
             check up to (but not including) this counter value
 
         :arg expected:
-            optional expected value where search should start,
-            to help speed up searches.
+            optional expected value where search should start
+            (defaults to *start*). the search works outward from there,
+            alternately checking the counter before & after it,
+            so the most likely counters are checked first;
+            which helps when (end - start) is very large (e.g. for resync purposes).
 
         :returns:
             ``(valid, match)`` where ``match`` is non-negative counter value that matched
@@ -774,15 +817,26 @@ class BaseOTP(object):
             start = 0
         if end <= start:
             return False, 0
+        if expected is None or expected < start:
+            expected = start
+        elif expected >= end:
+            expected = end - 1
         generate = self._generate
-        if not (expected is None or expected < start) and consteq(token, generate(expected)):
+        if consteq(token, generate(expected)):
             return True, expected
-        # XXX: if (end - start) is very large (e.g. for resync purposes),
-        #      could start with expected value, and work outward from there,
-        #      alternately checking before & after it until match is found.
-        for counter in irange(start, end):
-            if consteq(token, generate(counter)):
-                return True, counter
+        # NOTE: checking earlier counter first, since the token most likely
+        #       came from a client whose clock is behind (or was delayed in transit).
+        before = expected - 1
+        after = expected + 1
+        while before >= start or after < end:
+            if before >= start:
+                if consteq(token, generate(before)):
+                    return True, before
+                before -= 1
+            if after < end:
+                if consteq(token, generate(after)):
+                    return True, after
+                after += 1
         return False, 0
 
     #=============================================================================
@@ -1180,6 +1234,7 @@ class HOTP(BaseOTP):
     Client-Side Token Generation
     ============================
     .. automethod:: generate
+    .. automethod:: generate_range
     .. automethod:: generate_next
 
     Server-Side Token Verification
@@ -1296,6 +1351,34 @@ class HOTP(BaseOTP):
         counter = self._normalize_counter(counter)
         return self._generate(counter)
 
+    def generate_range(self, start, end):
+        """
+        Low-level method to generate HOTP tokens for a range of counter values.
+        This is equivalent to calling :meth:`generate` for each value,
+        but is faster when many tokens are needed (e.g. for resynchronization).
+
+        :arg int start:
+           first counter value to generate token for.
+
+        :arg int end:
+           generate tokens up to (but not including) this counter value.
+
+        :returns:
+           list of (unicode) strings containing decimal-formatted tokens.
+
+        Usage example::
+
+            >>> h = HOTP('s3jdvb7qd2r7jpxx')
+            >>> h.generate_range(1000, 1002)
+            ['763224', '771031']
+
+        .. versionadded:: 1.7
+        """
+        start = self._normalize_counter(start)
+        if not isinstance(end, int_types):
+            raise exc.ExpectedTypeError(end, "int", "end")
+        return self._generate_range(start, max(start, end))
+
     def generate_next(self):
         """
         High-level method to generate a new HOTP token using next counter value.
@@ -1626,6 +1709,7 @@ class TOTP(BaseOTP):
     Client-Side Token Generation
     ============================
     .. automethod:: generate
+    .. automethod:: generate_range
     .. automethod:: generate_next
 
     Server-Side Token Verification
@@ -1835,6 +1919,37 @@ class TOTP(BaseOTP):
         token = self._generate(counter)
         return TotpToken(self, token, counter)
 
+    def generate_range(self, start, end):
+        """
+        Low-level method to generate all tokens which are valid
+        at some point between two times.
+        This is equivalent to calling :meth:`generate` for each time step,
+        but is faster when many tokens are needed.
+
+        :arg start:
+            start time, as per :meth:`generate`.
+
+        :arg end:
+            end time (inclusive), as per :meth:`generate`.
+
+        :returns:
+            list of :class:`TotpToken` instances, in order of time.
+
+        Usage example::
+
+            >>> otp = TOTP('s3jdvb7qd2r7jpxx')
+            >>> [token.token for token in otp.generate_range(1419622680, 1419622739)]
+            ['000492', '897212']
+
+        .. versionadded:: 1.7
+        """
+        first = self._time_to_counter(start)
+        last = self._time_to_counter(end)
+        counters = irange(first, max(first, last + 1))
+        tokens = self._generate_range(first, max(first, last + 1))
+        return [TotpToken(self, token, counter)
+                for token, counter in zip(tokens, counters)]
+
     def generate_next(self, reuse=False):
         """
         High-level method to generate TOTP token for current time.
@@ -1967,7 +2082,9 @@ class TOTP(BaseOTP):
         start = max(min_start, self._time_to_counter(client_time - window))
         end = self._time_to_counter(client_time + window) + 1
 
-        valid, counter = self._find_match(token, start, end)
+        # NOTE: searching outward from client's expected counter value
+        expected = max(client_time, 0) // self.period
+        valid, counter = self._find_match(token, start, end, expected)
         return TotpMatch(valid, counter, time, offset, self.period)
 
     def verify_next(self, token, reuse=False, window=30, offset=None):
@@ -2164,6 +2281,430 @@ def from_string(json, password=None):
     """
     return BaseOTP.from_string(json, password=password)
 
+#=============================================================================
+# server-side storage
+#=============================================================================
+
+#: regex used to validate table names passed to SqliteTotpBackend
+_table_name_re = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+class MemoryTotpBackend(object):
+    """
+    In-memory backend for :class:`TotpStore`, mainly useful for testing,
+    and for single-process servers which persist records some other way.
+
+    Each record consists of the serialized TOTP data (as returned by
+    :meth:`TOTP.to_string`), the last counter value which was accepted,
+    and the json-encoded verification history.
+
+    All methods are thread-safe; :meth:`advance` is atomic within the process.
+    """
+    #=============================================================================
+    # init
+    #=============================================================================
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    #=============================================================================
+    # backend api
+    #=============================================================================
+    def load(self, user):
+        """
+        return ``(data, last_counter, history)`` tuple for user,
+        or ``None`` if the user has no record.
+        """
+        return self._records.get(user)
+
+    def load_many(self, users):
+        """
+        return dict mapping ``user -> (data, last_counter, history)``
+        for all of the specified users which have a record.
+        """
+        records = self._records
+        result = {}
+        for user in users:
+            record = records.get(user)
+            if record is not None:
+                result[user] = record
+        return result
+
+    def save(self, user, data, last_counter=0, history=None):
+        """create or replace the record for a user"""
+        with self._lock:
+            self._records[user] = (data, last_counter, history)
+
+    def delete(self, user):
+        """remove user's record, returns ``True`` if it existed"""
+        with self._lock:
+            return self._records.pop(user, None) is not None
+
+    def advance(self, user, counter, history=None):
+        """
+        atomically set user's ``last_counter`` to *counter* & update their history,
+        but only if the stored counter is less than *counter*.
+
+        :returns:
+            ``True`` if the record was updated, ``False`` if the user doesn't exist,
+            or the counter has already reached this value.
+        """
+        with self._lock:
+            record = self._records.get(user)
+            if record is None or record[1] >= counter:
+                return False
+            self._records[user] = (record[0], counter, history)
+            return True
+
+    #=============================================================================
+    # eoc
+    #=============================================================================
+
+class SqliteTotpBackend(object):
+    """
+    SQLite backend for :class:`TotpStore`.
+
+    Records are stored in a single table, and :meth:`advance` is implemented
+    as a conditional ``UPDATE``, so token reuse is detected even when
+    multiple processes share the same database file.
+
+    :arg path:
+        path to the database file (created if needed).
+
+    :param table:
+        name of the table to use (created if needed).
+        defaults to ``"passlib_totp"``.
+
+    Each thread gets its own connection, so instances may be shared between threads.
+    """
+    #=============================================================================
+    # class attrs
+    #=============================================================================
+
+    #: max number of users to query at once in :meth:`load_many`
+    #: (sqlite limits the number of query parameters)
+    query_chunk_size = 500
+
+    #=============================================================================
+    # init
+    #=============================================================================
+    def __init__(self, path, table="passlib_totp"):
+        if not _table_name_re.match(table):
+            raise ValueError("invalid table name: %r" % (table,))
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS %s ("
+            "user TEXT PRIMARY KEY, "
+            "data TEXT NOT NULL, "
+            "last_counter INTEGER NOT NULL DEFAULT 0, "
+            "history TEXT)" % table)
+
+    def _connect(self):
+        """return sqlite connection for current thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3
+            # NOTE: using autocommit mode, so each statement is it's own transaction.
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30,
+                                                      isolation_level=None)
+        return conn
+
+    #=============================================================================
+    # backend api
+    #=============================================================================
+    def load(self, user):
+        """
+        return ``(data, last_counter, history)`` tuple for user,
+        or ``None`` if the user has no record.
+        """
+        return self._connect().execute(
+            "SELECT data, last_counter, history FROM %s WHERE user=?" % self.table,
+            (user,)).fetchone()
+
+    def load_many(self, users):
+        """
+        return dict mapping ``user -> (data, last_counter, history)``
+        for all of the specified users which have a record.
+        """
+        conn = self._connect()
+        users = list(set(users))
+        size = self.query_chunk_size
+        result = {}
+        for idx in irange(0, len(users), size):
+            chunk = users[idx:idx+size]
+            cursor = conn.execute(
+                "SELECT user, data, last_counter, history FROM %s WHERE user IN (%s)" %
+                (self.table, ",".join("?" * len(chunk))), chunk)
+            for user, data, last_counter, history in cursor:
+                result[user] = (data, last_counter, history)
+        return result
+
+    def save(self, user, data, last_counter=0, history=None):
+        """create or replace the record for a user"""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO %s (user, data, last_counter, history) "
+            "VALUES (?, ?, ?, ?)" % self.table, (user, data, last_counter, history))
+
+    def delete(self, user):
+        """remove user's record, returns ``True`` if it existed"""
+        cursor = self._connect().execute("DELETE FROM %s WHERE user=?" % self.table,
+                                         (user,))
+        return cursor.rowcount == 1
+
+    def advance(self, user, counter, history=None):
+        """
+        atomically set user's ``last_counter`` to *counter* & update their history,
+        but only if the stored counter is less than *counter*.
+
+        :returns:
+            ``True`` if the record was updated, ``False`` if the user doesn't exist,
+            or the counter has already reached this value.
+        """
+        cursor = self._connect().execute(
+            "UPDATE %s SET last_counter=?, history=? WHERE user=? AND last_counter<?" %
+            self.table, (counter, history, user, counter))
+        return cursor.rowcount == 1
+
+    #=============================================================================
+    # eoc
+    #=============================================================================
+
+class TotpStore(object):
+    """
+    Server-side store of per-user :class:`TOTP` records,
+    which handles persisting the :attr:`~TOTP.last_counter` & verification history
+    on behalf of the application.
+
+    Unlike calling :meth:`TOTP.verify_next` and re-saving the result,
+    :meth:`verify_next` updates the stored counter via an atomic
+    compare-and-set, so a token can't be accepted twice even if
+    two requests (or processes sharing a backend) race to verify it.
+
+    :param backend:
+        backend used to store records, such as :class:`SqliteTotpBackend`.
+        defaults to a new :class:`MemoryTotpBackend`.
+
+    :param password:
+        optional password used to encrypt the secret keys within the store
+        (see :meth:`TOTP.to_string`).
+
+    :param cache_size:
+        max number of parsed TOTP objects to keep in memory,
+        saving the cost of parsing (and decrypting) the record on each request.
+        defaults to ``1024``; set to ``0`` to disable.
+
+    :param now:
+        optional callable returning current time (defaults to :func:`time.time`).
+        should only be changed for testing.
+
+    Usage example::
+
+        >>> from passlib.totp import TOTP, TotpStore, SqliteTotpBackend
+        >>> store = TotpStore(SqliteTotpBackend("/path/to/totp.db"))
+        >>> store.enroll("alice", TOTP("s3jdvb7qd2r7jpxx"))
+        >>> store.verify_next("alice", "123456")
+        False
+
+    .. versionadded:: 1.7
+    """
+    #=============================================================================
+    # class attrs
+    #=============================================================================
+
+    #: default value for cache_size
+    default_cache_size = 1024
+
+    #=============================================================================
+    # init
+    #=============================================================================
+    def __init__(self, backend=None, password=None, cache_size=None, now=None):
+        if backend is None:
+            backend = MemoryTotpBackend()
+        if cache_size is None:
+            cache_size = self.default_cache_size
+        elif cache_size < 0:
+            raise ValueError("cache_size must be >= 0")
+        self.backend = backend
+        self.password = password
+        self.cache_size = cache_size
+        if now is not None:
+            self.now = now
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    #: callable returning current time
+    now = staticmethod(_time.time)
+
+    #=============================================================================
+    # record management
+    #=============================================================================
+    def enroll(self, user, otp):
+        """
+        store *otp* as the TOTP record for *user*, replacing any existing record.
+        the object's current :attr:`~TOTP.last_counter` and history are stored as well.
+        """
+        if not isinstance(otp, TOTP):
+            raise TypeError("TotpStore only supports TOTP objects")
+        data = otp.to_string(password=self.password)
+        self.backend.save(user, data, otp.last_counter, self._encode_history(otp._history))
+        with self._cache_lock:
+            self._cache.pop(user, None)
+
+    def get(self, user):
+        """
+        return new :class:`TOTP` instance reflecting the user's stored state,
+        or ``None`` if the user has no record.
+        """
+        record = self.backend.load(user)
+        if record is None:
+            return None
+        data, last_counter, history = record
+        otp = from_string(data, password=self.password)
+        otp.last_counter = last_counter
+        otp._history = self._decode_history(history)
+        return otp
+
+    def delete(self, user):
+        """remove user's record, returns ``True`` if it existed"""
+        with self._cache_lock:
+            self._cache.pop(user, None)
+        return self.backend.delete(user)
+
+    #=============================================================================
+    # verification
+    #=============================================================================
+    def verify_next(self, user, token, reuse=False, window=30, offset=None):
+        """
+        verify token against user's stored record (see :meth:`TOTP.verify_next`),
+        atomically updating the stored :attr:`~TOTP.last_counter` if it matches.
+
+        :returns:
+            ``True`` if the token validated, ``False`` if not,
+            or ``None`` if the user has no record.
+
+        :raises ValueError:
+            if the provided token is not correctly formed.
+
+        :raises ~passlib.exc.TokenReuseError:
+            if the token was already used (suppressed by ``reuse=True``).
+        """
+        record = self.backend.load(user)
+        if record is None:
+            return None
+        return self._verify_record(user, record, token, self.now(), reuse, window, offset)[0]
+
+    def verify_many(self, items, reuse=False, window=30):
+        """
+        verify a batch of ``(user, token)`` pairs, loading all the records
+        in a single backend call, and using the same timestamp for each.
+
+        :returns:
+            list containing ``True``, ``False``, or ``None`` (unknown user)
+            for each item. Malformed or reused tokens are reported as ``False``.
+        """
+        items = list(items)
+        records = self.backend.load_many(user for user, _ in items)
+        time = self.now()
+        results = []
+        for user, token in items:
+            record = records.get(user)
+            if record is None:
+                results.append(None)
+                continue
+            try:
+                result, record = self._verify_record(user, record, token, time,
+                                                     reuse, window, None)
+            except ValueError: # includes TokenReuseError
+                result = False
+            else:
+                # keep local copy in sync, in case user appears again in batch
+                records[user] = record
+            results.append(result)
+        return results
+
+    def _verify_record(self, user, record, token, time, reuse, window, offset):
+        """
+        verify token against loaded record,
+        returns ``(result, updated_record)`` tuple.
+        """
+        data, last_counter, history = record
+        otp = self._get_otp(user, data)
+        period = otp.period
+        history = self._decode_history(history)
+        if offset is None:
+            offset = suggest_offset(history, period, time)
+        result = otp.verify(token, time, window=window, offset=offset, min_start=last_counter)
+        if not result.valid:
+            return False, record
+
+        counter = result.counter
+        if counter > last_counter:
+            limit = TOTP.MAX_HISTORY_SIZE
+            if limit > 0:
+                history.append((result.time, result.counter_offset))
+                del history[:-limit]
+            encoded = self._encode_history(history)
+            if self.backend.advance(user, counter, encoded):
+                return True, (data, counter, encoded)
+            # lost race w/ another request -- see what counter it stored
+            record = self.backend.load(user)
+            if record is None or record[1] != counter:
+                return False, record
+            last_counter = counter
+
+        assert counter == last_counter, "sanity check failed: 'min_start' not honored"
+        if reuse:
+            return True, record
+        raise exc.TokenReuseError("Token has already been used, please wait for another.",
+                                  expire_time=(last_counter + 1) * period)
+
+    #=============================================================================
+    # helpers
+    #=============================================================================
+    def _get_otp(self, user, data):
+        """
+        return TOTP instance for serialized data, re-using cached instance if possible.
+
+        .. note::
+            the cached instances are only used for :meth:`TOTP.verify`,
+            which doesn't depend on (or modify) their counter / history.
+        """
+        cache = self._cache
+        with self._cache_lock:
+            entry = cache.get(user)
+            if entry is not None and entry[0] == data:
+                # move to end, marking it as most recently used
+                del cache[user]
+                cache[user] = entry
+                return entry[1]
+        otp = from_string(data, password=self.password)
+        if self.cache_size:
+            with self._cache_lock:
+                cache.pop(user, None)
+                cache[user] = (data, otp)
+                while len(cache) > self.cache_size:
+                    cache.popitem(last=False)
+        return otp
+
+    @staticmethod
+    def _encode_history(history):
+        """encode history list to json string"""
+        if not history:
+            return None
+        return json.dumps(history, separators=(",", ":"))
+
+    @staticmethod
+    def _decode_history(value):
+        """decode history from json string"""
+        if not value:
+            return []
+        return [tuple(entry) for entry in json.loads(value)]
+
+    #=============================================================================
+    # eoc
+    #=============================================================================
+
 #=============================================================================
 # eof
 #=============================================================================
@@ -1323,9 +1323,11 @@ def ab64_decode(data):
 # host OS helpers
 #=============================================================================
 
-try:
-    from crypt import crypt as _crypt
-except ImportError: # pragma: no cover
+# NOTE: oscrypt.host_crypt() has the same interface as stdlib's crypt.crypt(),
+#       but lets the app choose how it's invoked (e.g. via crypt_r() to release the GIL).
+from passlib.utils.oscrypt import has_host_crypt as _has_host_crypt, \
+                                 host_crypt as _crypt
+if not _has_host_crypt(): # pragma: no cover
     _crypt = None
     has_crypt = False
     def safe_crypt(secret, hash):
@@ -1382,6 +1384,9 @@ add_doc(safe_crypt, """Wrapper around stdlib's crypt.
 
     This is a wrapper around stdlib's :func:`!crypt.crypt`, which attempts
     to provide uniform behavior across Python 2 and 3.
+    By default, it calls the host's ``crypt_r()`` directly when available,
+    so that calls from multiple threads can run in parallel
+    (see :mod:`passlib.utils.oscrypt` for details).
 
     :arg secret:
         password, as bytes or unicode (unicode will be encoded as ``utf-8``).
@@ -0,0 +1,118 @@
+"""passlib.utils._async -- asyncio support for CryptContext
+
+this module implements the coroutines behind :meth:`CryptContext.averify`
+and friends. it uses python 3.5+ syntax, so it's kept separate from
+:mod:`passlib.context` (which must remain importable under python 2),
+and is only imported the first time one of those methods is called.
+
+this should be accessed via the CryptContext methods, not imported directly.
+"""
+#=============================================================================
+# imports
+#=============================================================================
+# core
+import asyncio
+import functools
+import weakref
+# site
+# pkg
+# local
+__all__ = [
+    "averify",
+    "aencrypt",
+    "averify_and_update",
+]
+
+#=============================================================================
+# helpers
+#=============================================================================
+def _get_semaphore(context, loop):
+    """return semaphore bounding *context*'s offloaded calls on *loop*,
+    or ``None`` if concurrency isn't limited.
+
+    semaphores are bound to a particular event loop,
+    so a separate one is created (on demand) for each loop.
+    """
+    limit = context._async_max_concurrency
+    if not limit:
+        return None
+    semaphores = context._async_semaphores
+    if semaphores is None:
+        semaphores = context._async_semaphores = weakref.WeakKeyDictionary()
+    try:
+        return semaphores[loop]
+    except KeyError:
+        value = semaphores[loop] = asyncio.Semaphore(limit)
+        return value
+
+async def _offload(context, func, *args, **kwds):
+    """run ``func(*args, **kwds)`` in context's executor, and return result"""
+    loop = asyncio.get_event_loop()
+    if kwds:
+        func = functools.partial(func, **kwds)
+    executor = context._async_executor
+    semaphore = _get_semaphore(context, loop)
+    if semaphore is None:
+        return await loop.run_in_executor(executor, func, *args)
+    # NOTE: task isn't submitted to executor until semaphore is acquired,
+    #       so a flood of requests queues up here as cheap coroutines,
+    #       rather than as pending jobs holding on to secrets.
+    async with semaphore:
+        return await loop.run_in_executor(executor, func, *args)
+
+async def _averify_record(context, record, secret, hash, kwds):
+    """verify secret using record, padding failures using asyncio.sleep()"""
+    # NOTE: using verify_deferred(), since record.verify() would pad
+    #       failures by calling time.sleep() in the worker thread.
+    result, delay = await _offload(context, record.verify_deferred,
+                                   secret, hash, **kwds)
+    if delay:
+        await asyncio.sleep(delay)
+    return result
+
+async def _averify_cached(context, cache, record, secret, hash):
+    """verify secret using record, consulting context's verify cache first"""
+    # NOTE: cache lookup is cheap, so it's done in the loop thread,
+    #       and cache hits never wait for the executor.
+    key = context._get_verify_cache_key(cache, record, secret, hash)
+    if cache.check(key):
+        return True
+    if await _averify_record(context, record, secret, hash, {}):
+        cache.add(key)
+        return True
+    return False
+
+#=============================================================================
+# CryptContext methods
+#=============================================================================
+async def averify(context, secret, hash, scheme, category, kwds):
+    """implementation of :meth:`CryptContext.averify`"""
+    record = context._get_or_identify_record(hash, scheme, category)
+    cache = context._verify_cache
+    if cache is None or kwds:
+        return await _averify_record(context, record, secret, hash, kwds)
+    return await _averify_cached(context, cache, record, secret, hash)
+
+async def aencrypt(context, secret, scheme, category, kwds):
+    """implementation of :meth:`CryptContext.aencrypt`"""
+    record = context._get_record(scheme, category)
+    return await _offload(context, record.encrypt, secret, **kwds)
+
+async def averify_and_update(context, secret, hash, scheme, category, kwds):
+    """implementation of :meth:`CryptContext.averify_and_update`"""
+    record = context._get_or_identify_record(hash, scheme, category)
+    cache = context._verify_cache
+    if cache is not None and not kwds and not record.needs_update(hash, secret):
+        return await _averify_cached(context, cache, record, secret, hash), None
+    # NOTE: when a rehash is pending, this bypasses the cache (as verify_and_update does)
+    if not await _averify_record(context, record, secret, hash, kwds):
+        return False, None
+    elif record.needs_update(hash, secret):
+        # NOTE: we re-encrypt with default scheme, not current one.
+        return True, await aencrypt(context, secret, None, category, kwds)
+    else:
+        return True, None
+
+#=============================================================================
+# eof
+#=============================================================================
@@ -148,53 +148,53 @@ def write_expand_function(write, indent=0):
 
 def main():
     target = os.path.join(os.path.dirname(__file__), "unrolled.py")
-    fh = file(target, "w")
-
-    def write(indent, msg, **kwds):
-        literal = kwds.pop("literal", False)
-        if kwds:
-            msg %= kwds
-        if not literal:
-            msg = textwrap.dedent(msg.rstrip(" "))
-        if indent:
-            msg = indent_block(msg, " " * (indent*4))
-        fh.write(msg)
-
-    write(0, """\
-        \"""passlib.utils._blowfish.unrolled - unrolled loop implementation of bcrypt,
-        autogenerated by _gen_files.py
-
-        currently this override the encipher() and expand() methods
-        with optimized versions, and leaves the other base.py methods alone.
-        \"""
-        #=================================================================
-        # imports
-        #=================================================================
-        # pkg
-        from passlib.utils._blowfish.base import BlowfishEngine as _BlowfishEngine
-        # local
-        __all__ = [
-            "BlowfishEngine",
-        ]
-        #=================================================================
-        #
-        #=================================================================
-        class BlowfishEngine(_BlowfishEngine):
+    with open(target, "w") as fh:
+
+        def write(indent, msg, **kwds):
+            literal = kwds.pop("literal", False)
+            if kwds:
+                msg %= kwds
+            if not literal:
+                msg = textwrap.dedent(msg.rstrip(" "))
+            if indent:
+                msg = indent_block(msg, " " * (indent*4))
+            fh.write(msg)
+
+        write(0, """\
+            \"""passlib.utils._blowfish.unrolled - unrolled loop implementation of bcrypt,
+            autogenerated by _gen_files.py
+
+            currently this override the encipher() and expand() methods
+            with optimized versions, and leaves the other base.py methods alone.
+            \"""
+            #=============================================================================
+            # imports
+            #=============================================================================
+            # pkg
+            from passlib.utils._blowfish.base import BlowfishEngine as _BlowfishEngine
+            # local
+            __all__ = [
+                "BlowfishEngine",
+            ]
+            #=============================================================================
+            #
+            #=============================================================================
+            class BlowfishEngine(_BlowfishEngine):
 
-        """)
+            """)
 
-    write_encipher_function(write, indent=1)
-    write_expand_function(write, indent=1)
+        write_encipher_function(write, indent=1)
+        write_expand_function(write, indent=1)
 
-    write(0, """\
-            #=================================================================
-            # eoc
-            #=================================================================
+        write(0, """\
+                #===================================================================
+                # eoc
+                #===================================================================
 
-        #=================================================================
-        # eof
-        #=================================================================
-        """)
+            #=============================================================================
+            # eof
+            #=============================================================================
+            """)
 
 if __name__ == "__main__":
     main()
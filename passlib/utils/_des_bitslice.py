@@ -0,0 +1,914 @@
+"""passlib.utils._des_bitslice - bitsliced DES engine,
+autogenerated by _des_gen.py
+
+each data bit is stored as an integer with one bit per lane,
+so every boolean operation below processes all lanes at once.
+see :func:`passlib.utils.des.des_encrypt_int_blocks` for the frontend.
+"""
+#=============================================================================
+# wiring
+#=============================================================================
+
+#: maps each position of the expanded L/R layout to a data bit (or ``None``)
+BIT_INDEX = (
+    None, None, 0, 1, 2, 3, 4, 5, None, None, 6, 7, 8, 9, 0, 1,
+    None, None, 10, 11, 12, 13, 6, 7, None, None, 14, 15, 16, 17, 10, 11,
+    None, None, 18, 19, 20, 21, 14, 15, None, None, 22, 23, 24, 25, 18, 19,
+    None, None, 26, 27, 28, 29, 22, 23, None, None, 4, 5, 30, 31, 26, 27,
+)
+
+#: for each of the 16 key schedule entries, maps each position to a key bit
+KEY_MAP = (
+    (
+        None, None, 19, 50, 51, 2, 9, 33, None, None, 3, 43, 26, 1, 49, 44,
+        None, None, 17, 34, 59, 11, 41, 35, None, None, 42, 36, 25, 10, 27, 60,
+        None, None, 5, 63, 28, 37, 46, 23, None, None, 61, 29, 38, 39, 20, 6,
+        None, None, 31, 7, 62, 55, 45, 22, None, None, 54, 13, 30, 4, 15, 47,
+    ),
+    (
+        None, None, 27, 58, 59, 10, 17, 41, None, None, 11, 51, 34, 9, 57, 52,
+        None, None, 25, 42, 36, 19, 49, 43, None, None, 50, 44, 33, 18, 35, 1,
+        None, None, 13, 6, 7, 45, 54, 31, None, None, 4, 37, 46, 47, 28, 14,
+        None, None, 39, 15, 5, 63, 53, 30, None, None, 62, 21, 38, 12, 23, 55,
+    ),
+    (
+        None, None, 43, 11, 44, 26, 33, 57, None, None, 27, 36, 50, 25, 10, 1,
+        None, None, 41, 58, 52, 35, 2, 59, None, None, 3, 60, 49, 34, 51, 17,
+        None, None, 29, 22, 23, 61, 5, 47, None, None, 20, 53, 62, 63, 15, 30,
+        None, None, 55, 31, 21, 14, 4, 46, None, None, 13, 37, 54, 28, 39, 6,
+    ),
+    (
+        None, None, 59, 27, 60, 42, 49, 10, None, None, 43, 52, 3, 41, 26, 17,
+        None, None, 57, 11, 1, 51, 18, 44, None, None, 19, 9, 2, 50, 36, 33,
+        None, None, 45, 38, 39, 12, 21, 63, None, None, 7, 4, 13, 14, 31, 46,
+        None, None, 6, 47, 37, 30, 20, 62, None, None, 29, 53, 5, 15, 55, 22,
+    ),
+    (
+        None, None, 44, 43, 9, 58, 2, 26, None, None, 59, 1, 19, 57, 42, 33,
+        None, None, 10, 27, 17, 36, 34, 60, None, None, 35, 25, 18, 3, 52, 49,
+        None, None, 61, 54, 55, 28, 37, 14, None, None, 23, 20, 29, 30, 47, 62,
+        None, None, 22, 63, 53, 46, 7, 13, None, None, 45, 4, 21, 31, 6, 38,
+    ),
+    (
+        None, None, 60, 59, 25, 11, 18, 42, None, None, 44, 17, 35, 10, 58, 49,
+        None, None, 26, 43, 33, 52, 50, 9, None, None, 51, 41, 34, 19, 1, 2,
+        None, None, 12, 5, 6, 15, 53, 30, None, None, 39, 7, 45, 46, 63, 13,
+        None, None, 38, 14, 4, 62, 23, 29, None, None, 61, 20, 37, 47, 22, 54,
+    ),
+    (
+        None, None, 9, 44, 41, 27, 34, 58, None, None, 60, 33, 51, 26, 11, 2,
+        None, None, 42, 59, 49, 1, 3, 25, None, None, 36, 57, 50, 35, 17, 18,
+        None, None, 28, 21, 22, 31, 4, 46, None, None, 55, 23, 61, 62, 14, 29,
+        None, None, 54, 30, 20, 13, 39, 45, None, None, 12, 7, 53, 63, 38, 5,
+    ),
+    (
+        None, None, 25, 60, 57, 43, 50, 11, None, None, 9, 49, 36, 42, 27, 18,
+        None, None, 58, 44, 2, 17, 19, 41, None, None, 52, 10, 3, 51, 33, 34,
+        None, None, 15, 37, 38, 47, 20, 62, None, None, 6, 39, 12, 13, 30, 45,
+        None, None, 5, 46, 7, 29, 55, 61, None, None, 28, 23, 4, 14, 54, 21,
+    ),
+    (
+        None, None, 33, 1, 2, 51, 58, 19, None, None, 17, 57, 44, 50, 35, 26,
+        None, None, 3, 52, 10, 25, 27, 49, None, None, 60, 18, 11, 59, 41, 42,
+        None, None, 23, 45, 46, 55, 28, 5, None, None, 14, 47, 20, 21, 38, 53,
+        None, None, 13, 54, 15, 37, 63, 4, None, None, 7, 31, 12, 22, 62, 29,
+    ),
+    (
+        None, None, 49, 17, 18, 36, 11, 35, None, None, 33, 10, 60, 3, 51, 42,
+        None, None, 19, 1, 26, 41, 43, 2, None, None, 9, 34, 27, 44, 57, 58,
+        None, None, 39, 61, 62, 6, 15, 21, None, None, 30, 63, 7, 37, 54, 4,
+        None, None, 29, 5, 31, 53, 14, 20, None, None, 23, 47, 28, 38, 13, 45,
+    ),
+    (
+        None, None, 2, 33, 34, 52, 27, 51, None, None, 49, 26, 9, 19, 36, 58,
+        None, None, 35, 17, 42, 57, 59, 18, None, None, 25, 50, 43, 60, 10, 11,
+        None, None, 55, 12, 13, 22, 31, 37, None, None, 46, 14, 23, 53, 5, 20,
+        None, None, 45, 21, 47, 4, 30, 7, None, None, 39, 63, 15, 54, 29, 61,
+    ),
+    (
+        None, None, 18, 49, 50, 1, 43, 36, None, None, 2, 42, 25, 35, 52, 11,
+        None, None, 51, 33, 58, 10, 44, 34, None, None, 41, 3, 59, 9, 26, 27,
+        None, None, 6, 28, 29, 38, 47, 53, None, None, 62, 30, 39, 4, 21, 7,
+        None, None, 61, 37, 63, 20, 46, 23, None, None, 55, 14, 31, 5, 45, 12,
+    ),
+    (
+        None, None, 34, 2, 3, 17, 59, 52, None, None, 18, 58, 41, 51, 1, 27,
+        None, None, 36, 49, 11, 26, 60, 50, None, None, 57, 19, 44, 25, 42, 43,
+        None, None, 22, 15, 45, 54, 63, 4, None, None, 13, 46, 55, 20, 37, 23,
+        None, None, 12, 53, 14, 7, 62, 39, None, None, 6, 30, 47, 21, 61, 28,
+    ),
+    (
+        None, None, 50, 18, 19, 33, 44, 1, None, None, 34, 11, 57, 36, 17, 43,
+        None, None, 52, 2, 27, 42, 9, 3, None, None, 10, 35, 60, 41, 58, 59,
+        None, None, 38, 31, 61, 5, 14, 20, None, None, 29, 62, 6, 7, 53, 39,
+        None, None, 28, 4, 30, 23, 13, 55, None, None, 22, 46, 63, 37, 12, 15,
+    ),
+    (
+        None, None, 3, 34, 35, 49, 60, 17, None, None, 50, 27, 10, 52, 33, 59,
+        None, None, 1, 18, 43, 58, 25, 19, None, None, 26, 51, 9, 57, 11, 44,
+        None, None, 54, 47, 12, 21, 30, 7, None, None, 45, 13, 22, 23, 4, 55,
+        None, None, 15, 20, 46, 39, 29, 6, None, None, 38, 62, 14, 53, 28, 31,
+    ),
+    (
+        None, None, 11, 42, 43, 57, 1, 25, None, None, 58, 35, 18, 60, 41, 36,
+        None, None, 9, 26, 51, 3, 33, 27, None, None, 34, 59, 17, 2, 19, 52,
+        None, None, 62, 55, 20, 29, 38, 15, None, None, 53, 21, 30, 31, 12, 63,
+        None, None, 23, 28, 54, 47, 37, 14, None, None, 46, 5, 22, 61, 7, 39,
+    ),
+)
+
+#=============================================================================
+# engine
+#=============================================================================
+def half_round(R, L, K, S, ALL):
+    """
+    run one half-round of DES for all lanes at once.
+
+    :arg R: list of 32 bitsliced data bits (the input half).
+    :arg L: list of 32 bitsliced data bits (the half to update).
+    :arg K: list of 64 bitsliced key schedule bits for this round.
+    :arg S: list of 32 bitsliced salt bits.
+    :arg ALL: integer w/ a bit set for every lane.
+
+    :returns: updated copy of *L*.
+    """
+    (r0, r1, r2, r3, r4, r5, r6, r7, r8, r9, r10, r11, r12, r13, r14, r15, r16, r17, r18, r19, r20, r21, r22, r23, r24, r25, r26, r27, r28, r29, r30, r31,) = R
+    L = list(L)
+
+    # salt: swap E-box output bits i & i+32 in lanes w/ salt bit i set
+    d2 = (r0 ^ r18) & S[2]
+    d3 = (r1 ^ r19) & S[3]
+    d4 = (r2 ^ r20) & S[4]
+    d5 = (r3 ^ r21) & S[5]
+    d6 = (r4 ^ r14) & S[6]
+    d7 = (r5 ^ r15) & S[7]
+    d10 = (r6 ^ r22) & S[10]
+    d11 = (r7 ^ r23) & S[11]
+    d12 = (r8 ^ r24) & S[12]
+    d13 = (r9 ^ r25) & S[13]
+    d14 = (r0 ^ r18) & S[14]
+    d15 = (r1 ^ r19) & S[15]
+    d18 = (r10 ^ r26) & S[18]
+    d19 = (r11 ^ r27) & S[19]
+    d20 = (r12 ^ r28) & S[20]
+    d21 = (r13 ^ r29) & S[21]
+    d22 = (r6 ^ r22) & S[22]
+    d23 = (r7 ^ r23) & S[23]
+    d26 = (r14 ^ r4) & S[26]
+    d27 = (r15 ^ r5) & S[27]
+    d28 = (r16 ^ r30) & S[28]
+    d29 = (r17 ^ r31) & S[29]
+    d30 = (r10 ^ r26) & S[30]
+    d31 = (r11 ^ r27) & S[31]
+
+    # S-box 0
+    b0 = r4 ^ d26 ^ K[58]
+    b1 = r5 ^ d27 ^ K[59]
+    b2 = r30 ^ d28 ^ K[60]
+    b3 = r31 ^ d29 ^ K[61]
+    b4 = r26 ^ d30 ^ K[62]
+    b5 = r27 ^ d31 ^ K[63]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[3] ^= ((m0 & (b0 & b5)) ^
+              (m1 & (b0 | n5)) ^
+              (m2 & (b0 & n5)) ^
+              (m3 & ((b0 & b5) ^ ALL)) ^
+              (m4 & n0) ^
+              (m5 & b0) ^
+              (m6 & (n0 | b5)) ^
+              (m7 & (b0 ^ b5)) ^
+              (m8 & (b0 ^ b5)) ^
+              (m9 & (b0 & b5)) ^
+              (m10 & (b0 ^ b5 ^ ALL)) ^
+              (m11 & n0) ^
+              (m12 & (n0 & n5)) ^
+              (m13 & (b0 ^ b5)) ^
+              (m14 & (b0 | b5)) ^
+              (m15 & (b0 ^ b5 ^ ALL)))
+    L[13] ^= ((m0 & (b0 ^ b5 ^ ALL)) ^
+              (m1 & ((b0 & b5) ^ ALL)) ^
+              (m2 & n0) ^
+              (m3 & b0) ^
+              (m4 & (b0 ^ b5)) ^
+              (m5 & (b0 ^ b5 ^ ALL)) ^
+              (m6 & n5) ^
+              (m7 & b5) ^
+              (m8 & (n0 & b5)) ^
+              (m9 & (n0 | b5)) ^
+              (m10 & ((b0 & b5) ^ ALL)) ^
+              (m11 & (b0 & n5)) ^
+              (m12 & (b0 & b5)) ^
+              (m13 & (b0 | b5)) ^
+              (m14 & b0) ^
+              (m15 & (n0 & n5)))
+    L[15] ^= ((m0 & (b0 | n5)) ^
+              (m1 & b0) ^
+              (m2 & (b0 | b5)) ^
+              (m3 & (n0 & n5)) ^
+              (m4 & ((b0 & b5) ^ ALL)) ^
+              (m5 & n0) ^
+              (m6 & (n0 & b5)) ^
+              (m7 & b0) ^
+              (m8 & (n0 | b5)) ^
+              (m9 & (b0 ^ b5)) ^
+              (m10 & n5) ^
+              (m11 & (n0 & b5)) ^
+              (m12 & (n0 & b5)) ^
+              (m13 & (b0 | n5)) ^
+              (m14 & (b0 & b5)) ^
+              (m15 & (b0 ^ b5 ^ ALL)))
+    L[23] ^= ((m0 & (b0 ^ b5 ^ ALL)) ^
+              (m1 & (b0 ^ b5)) ^
+              (m2 & (b0 ^ b5)) ^
+              (m3 & b5) ^
+              (m4 & (b0 | n5)) ^
+              (m5 & (b0 ^ b5)) ^
+              (m6 & n0) ^
+              (m8 & b5) ^
+              (m9 & (b0 | n5)) ^
+              (m10 & (b0 ^ b5 ^ ALL)) ^
+              (m11 & n5) ^
+              (m12 & (b0 & n5)) ^
+              (m13 & (n0 | b5)) ^
+              (m14 & n5) ^
+              (m15 & b5))
+
+    # S-box 1
+    b0 = r26 ^ d18 ^ K[50]
+    b1 = r27 ^ d19 ^ K[51]
+    b2 = r28 ^ d20 ^ K[52]
+    b3 = r29 ^ d21 ^ K[53]
+    b4 = r22 ^ d22 ^ K[54]
+    b5 = r23 ^ d23 ^ K[55]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[0] ^= ((m0 & (b0 ^ b5 ^ ALL)) ^
+              (m1 & (b0 ^ b5)) ^
+              (m2 & n0) ^
+              (m3 & n0) ^
+              (m4 & (b0 ^ b5)) ^
+              (m5 & b0) ^
+              (m6 & b0) ^
+              (m7 & (b0 ^ b5 ^ ALL)) ^
+              (m8 & (b0 ^ b5)) ^
+              (m9 & (b0 ^ b5 ^ ALL)) ^
+              (m10 & b0) ^
+              (m11 & (b0 & b5)) ^
+              (m12 & n0) ^
+              (m13 & (b0 | n5)) ^
+              (m14 & n0) ^
+              (m15 & (b0 ^ b5)))
+    L[16] ^= ((m0 & (n0 | b5)) ^
+              (m1 & (b0 | n5)) ^
+              (m2 & b5) ^
+              (m3 & (b0 & n5)) ^
+              (m4 & (b0 & n5)) ^
+              (m5 & b5) ^
+              (m6 & n5) ^
+              (m7 & n0) ^
+              (m8 & n0) ^
+              (m9 & (n0 & n5)) ^
+              (m10 & (b0 ^ b5 ^ ALL)) ^
+              (m11 & (b0 | b5)) ^
+              (m12 & (b0 | b5)) ^
+              (m13 & (n0 & n5)) ^
+              (m14 & (b0 & n5)) ^
+              (m15 & (b0 | b5)))
+    L[19] ^= ((m0 & (b0 ^ b5 ^ ALL)) ^
+              (m1 & (n0 | b5)) ^
+              (m2 & (b0 ^ b5)) ^
+              (m3 & n5) ^
+              (m4 & (b0 ^ b5 ^ ALL)) ^
+              (m5 & (b0 & n5)) ^
+              (m6 & (b0 ^ b5)) ^
+              (m7 & b5) ^
+              (m8 & (b0 | b5)) ^
+              (m9 & (b0 & n5)) ^
+              (m10 & (b0 ^ b5 ^ ALL)) ^
+              (m11 & (n0 & b5)) ^
+              (m12 & n5) ^
+              (m13 & (n0 | b5)) ^
+              (m14 & (n0 & b5)) ^
+              (m15 & (b0 | n5)))
+    L[30] ^= ((m0 & n0) ^
+              (m1 & (b0 & b5)) ^
+              m2 ^
+              (m3 & (n0 & b5)) ^
+              (m4 & b0) ^
+              (m5 & (b0 ^ b5 ^ ALL)) ^
+              (m6 & (n0 & n5)) ^
+              (m7 & (b0 | b5)) ^
+              (m8 & (b0 & n5)) ^
+              (m9 & (b0 ^ b5 ^ ALL)) ^
+              (m10 & (n0 | b5)) ^
+              (m11 & (b0 & n5)) ^
+              (m12 & ((b0 & b5) ^ ALL)) ^
+              (m13 & (b0 ^ b5)) ^
+              (m14 & b5) ^
+              (m15 & n5))
+
+    # S-box 2
+    b0 = r22 ^ d10 ^ K[42]
+    b1 = r23 ^ d11 ^ K[43]
+    b2 = r24 ^ d12 ^ K[44]
+    b3 = r25 ^ d13 ^ K[45]
+    b4 = r18 ^ d14 ^ K[46]
+    b5 = r19 ^ d15 ^ K[47]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[2] ^= ((m0 & (n0 & n5)) ^
+              (m1 & (b0 ^ b5)) ^
+              (m2 & (n0 | b5)) ^
+              (m3 & (b0 ^ b5 ^ ALL)) ^
+              (m5 & b0) ^
+              (m6 & ((b0 & b5) ^ ALL)) ^
+              m7 ^
+              (m8 & (b0 | b5)) ^
+              (m9 & (b0 & b5)) ^
+              (m10 & n5) ^
+              (m11 & (b0 ^ b5)) ^
+              (m12 & (n0 & n5)) ^
+              (m13 & (n0 | b5)) ^
+              (m14 & b5) ^
+              (m15 & (b0 & n5)))
+    L[6] ^= ((m0 & ((b0 & b5) ^ ALL)) ^
+              (m1 & (b0 & n5)) ^
+              (m2 & (b0 & n5)) ^
+              (m3 & (n0 | b5)) ^
+              (m4 & (b0 ^ b5 ^ ALL)) ^
+              (m5 & (b0 ^ b5 ^ ALL)) ^
+              (m6 & (b0 ^ b5 ^ ALL)) ^
+              (m7 & (b0 ^ b5)) ^
+              (m8 & (b0 & b5)) ^
+              (m9 & (n0 | b5)) ^
+              (m10 & b0) ^
+              (m11 & (b0 ^ b5)) ^
+              (m12 & ((b0 & b5) ^ ALL)) ^
+              (m13 & (b0 ^ b5)) ^
+              (m14 & (n0 & b5)) ^
+              (m15 & (b0 ^ b5 ^ ALL)))
+    L[14] ^= ((m0 & (b0 ^ b5)) ^
+              (m1 & (b0 & b5)) ^
+              (m2 & (b0 ^ b5 ^ ALL)) ^
+              (m3 & (b0 ^ b5)) ^
+              (m4 & b0) ^
+              (m5 & (n0 | b5)) ^
+              (m6 & n0) ^
+              (m7 & (b0 ^ b5)) ^
+              (m8 & (b0 ^ b5)) ^
+              (m9 & (b0 ^ b5 ^ ALL)) ^
+              (m10 & (b0 ^ b5)) ^
+              (m11 & (b0 ^ b5 ^ ALL)) ^
+              (m12 & (n0 & n5)) ^
+              (m13 & ((b0 & b5) ^ ALL)) ^
+              (m14 & (b0 ^ b5 ^ ALL)) ^
+              (m15 & b0))
+    L[28] ^= ((m0 & (b0 | b5)) ^
+              (m1 & n5) ^
+              (m2 & (n0 & b5)) ^
+              (m3 & (b0 | n5)) ^
+              (m4 & (b0 ^ b5 ^ ALL)) ^
+              (m5 & (n0 & b5)) ^
+              (m6 & n5) ^
+              (m7 & (n0 & b5)) ^
+              (m8 & (n0 & b5)) ^
+              (m9 & (b0 | n5)) ^
+              (m10 & (b0 | n5)) ^
+              (m11 & b5) ^
+              (m12 & (b0 ^ b5)) ^
+              (m13 & (b0 ^ b5 ^ ALL)) ^
+              (m14 & (b0 ^ b5 ^ ALL)) ^
+              (m15 & (b0 ^ b5)))
+
+    # S-box 3
+    b0 = r18 ^ d2 ^ K[34]
+    b1 = r19 ^ d3 ^ K[35]
+    b2 = r20 ^ d4 ^ K[36]
+    b3 = r21 ^ d5 ^ K[37]
+    b4 = r14 ^ d6 ^ K[38]
+    b5 = r15 ^ d7 ^ K[39]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[5] ^= ((m0 & (n0 | b5)) ^
+              (m1 & (b0 | n5)) ^
+              (m3 & ((b0 & b5) ^ ALL)) ^
+              (m4 & (b0 ^ b5)) ^
+              (m5 & b0) ^
+              (m6 & (b0 | n5)) ^
+              (m8 & (b0 ^ b5 ^ ALL)) ^
+              (m9 & (b0 ^ b5)) ^
+              (m10 & (b0 | b5)) ^
+              (m11 & (b0 & b5)) ^
+              (m12 & n0) ^
+              (m13 & (b0 ^ b5 ^ ALL)) ^
+              (m14 & (b0 ^ b5)) ^
+              (m15 & n0))
+    L[8] ^= ((m0 & (b0 ^ b5)) ^
+              (m1 & b0) ^
+              (m2 & b0) ^
+              (m3 & (b0 ^ b5 ^ ALL)) ^
+              (m4 & ((b0 & b5) ^ ALL)) ^
+              (m5 & (n0 & n5)) ^
+              (m6 & (b0 ^ b5 ^ ALL)) ^
+              (m7 & (b0 ^ b5)) ^
+              (m8 & (n0 | b5)) ^
+              (m10 & (b0 ^ b5)) ^
+              (m11 & n0) ^
+              (m13 & (b0 | b5)) ^
+              (m14 & (b0 | n5)) ^
+              (m15 & (n0 | b5)))
+    L[10] ^= ((m0 & n0) ^
+              (m1 & (b0 ^ b5)) ^
+              (m2 & (b0 ^ b5)) ^
+              (m3 & b0) ^
+              (m4 & (n0 & n5)) ^
+              (m5 & (b0 & b5)) ^
+              (m6 & b0) ^
+              (m7 & n0) ^
+              (m8 & (b0 | n5)) ^
+              (m9 & b5) ^
+              (m10 & n0) ^
+              (m11 & (b0 ^ b5 ^ ALL)) ^
+              (m12 & b5) ^
+              (m13 & ((b0 & b5) ^ ALL)) ^
+              (m14 & (b0 & n5)) ^
+              (m15 & (b0 | n5)))
+    L[24] ^= ((m0 & (b0 | n5)) ^
+              (m1 & (b0 & n5)) ^
+              (m2 & b5) ^
+              (m3 & (n0 & n5)) ^
+              (m4 & n0) ^
+              (m5 & (b0 ^ b5)) ^
+              (m6 & (b0 & n5)) ^
+              (m7 & b5) ^
+              (m8 & b0) ^
+              (m9 & n0) ^
+              (m10 & ((b0 & b5) ^ ALL)) ^
+              (m11 & (b0 | b5)) ^
+              (m12 & (b0 ^ b5 ^ ALL)) ^
+              (m13 & b0) ^
+              (m14 & n0) ^
+              (m15 & (b0 ^ b5 ^ ALL)))
+
+    # S-box 4
+    b0 = r14 ^ d26 ^ K[26]
+    b1 = r15 ^ d27 ^ K[27]
+    b2 = r16 ^ d28 ^ K[28]
+    b3 = r17 ^ d29 ^ K[29]
+    b4 = r10 ^ d30 ^ K[30]
+    b5 = r11 ^ d31 ^ K[31]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[7] ^= ((m0 & (n0 | b5)) ^
+              (m1 & b0) ^
+              (m2 & n5) ^
+              (m3 & (b0 | b5)) ^
+              (m4 & (n0 & b5)) ^
+              (m5 & n0) ^
+              (m6 & (b0 | n5)) ^
+              (m7 & (n0 & n5)) ^
+              (m8 & (b0 ^ b5)) ^
+              (m9 & (b0 & b5)) ^
+              (m10 & (n0 | b5)) ^
+              (m11 & (b0 & n5)) ^
+              (m12 & b0) ^
+              (m13 & n0) ^
+              (m14 & (n0 & n5)) ^
+              (m15 & (b0 | b5)))
+    L[20] ^= ((m0 & (b0 ^ b5)) ^
+              (m1 & (b0 | b5)) ^
+              (m2 & n0) ^
+              (m3 & n5) ^
+              (m4 & (b0 ^ b5 ^ ALL)) ^
+              (m5 & (b0 ^ b5)) ^
+              (m6 & (b0 ^ b5)) ^
+              (m7 & (b0 ^ b5 ^ ALL)) ^
+              (m8 & (n0 & n5)) ^
+              (m9 & (b0 ^ b5 ^ ALL)) ^
+              (m10 & (b0 | b5)) ^
+              (m11 & (b0 & b5)) ^
+              (m12 & b5) ^
+              (m13 & n5) ^
+              (m14 & (b0 ^ b5 ^ ALL)) ^
+              (m15 & (b0 ^ b5)))
+    L[22] ^= ((m0 & b5) ^
+              (m1 & n5) ^
+              (m2 & (b0 & n5)) ^
+              (m3 & (b0 ^ b5 ^ ALL)) ^
+              (m4 & (b0 & b5)) ^
+              (m5 & (b0 ^ b5)) ^
+              (m6 & n0) ^
+              (m7 & n0) ^
+              (m8 & (n0 | b5)) ^
+              (m9 & b0) ^
+              (m10 & (b0 | n5)) ^
+              (m11 & (n0 & b5)) ^
+              (m12 & (b0 ^ b5)) ^
+              (m13 & (n0 | b5)) ^
+              (m14 & b0) ^
+              (m15 & n5))
+    L[31] ^= ((m0 & (b0 & b5)) ^
+              (m1 & (b0 ^ b5)) ^
+              (m2 & (b0 ^ b5 ^ ALL)) ^
+              (m3 & n0) ^
+              (m4 & (b0 & n5)) ^
+              (m5 & n0) ^
+              (m6 & ((b0 & b5) ^ ALL)) ^
+              (m7 & (b0 & b5)) ^
+              (m8 & (n0 & b5)) ^
+              (m9 & (b0 | n5)) ^
+              (m10 & (b0 ^ b5)) ^
+              (m11 & (b0 ^ b5)) ^
+              (m12 & (b0 | n5)) ^
+              (m13 & (b0 | n5)) ^
+              (m14 & b5) ^
+              (m15 & (b0 ^ b5 ^ ALL)))
+
+    # S-box 5
+    b0 = r10 ^ d18 ^ K[18]
+    b1 = r11 ^ d19 ^ K[19]
+    b2 = r12 ^ d20 ^ K[20]
+    b3 = r13 ^ d21 ^ K[21]
+    b4 = r6 ^ d22 ^ K[22]
+    b5 = r7 ^ d23 ^ K[23]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[1] ^= ((m0 & (b0 ^ b5 ^ ALL)) ^
+              (m1 & (b0 ^ b5)) ^
+              (m2 & (n0 & b5)) ^
+              (m3 & (b0 ^ b5 ^ ALL)) ^
+              (m4 & (b0 ^ b5)) ^
+              (m5 & (b0 ^ b5)) ^
+              (m6 & (b0 | n5)) ^
+              (m7 & (n0 & n5)) ^
+              (m8 & (b0 ^ b5)) ^
+              (m9 & (b0 ^ b5 ^ ALL)) ^
+              (m10 & b5) ^
+              (m11 & n5) ^
+              (m12 & (b0 | n5)) ^
+              (m13 & (n0 | b5)) ^
+              (m14 & (n0 & b5)) ^
+              (m15 & b0))
+    L[17] ^= ((m0 & (b0 & n5)) ^
+              (m1 & b0) ^
+              (m2 & (n0 | b5)) ^
+              (m3 & (b0 & n5)) ^
+              (m4 & (b0 & n5)) ^
+              (m5 & (n0 | b5)) ^
+              (m6 & b5) ^
+              (m7 & ((b0 & b5) ^ ALL)) ^
+              (m8 & (n0 | b5)) ^
+              (m9 & n0) ^
+              (m10 & (b0 & b5)) ^
+              (m11 & ((b0 & b5) ^ ALL)) ^
+              (m12 & n5) ^
+              (m13 & (b0 & b5)) ^
+              (m14 & (b0 ^ b5)) ^
+              (m15 & (b0 ^ b5 ^ ALL)))
+    L[25] ^= ((m0 & (n0 & b5)) ^
+              (m1 & (b0 | b5)) ^
+              (m2 & (b0 ^ b5)) ^
+              (m3 & (b0 ^ b5 ^ ALL)) ^
+              (m4 & (b0 | n5)) ^
+              (m5 & (n0 & n5)) ^
+              (m6 & (b0 ^ b5 ^ ALL)) ^
+              (m7 & (b0 ^ b5)) ^
+              (m8 & (b0 | b5)) ^
+              (m9 & (b0 & b5)) ^
+              (m10 & (n0 & n5)) ^
+              (m11 & n0) ^
+              (m12 & n0) ^
+              (m13 & (b0 | b5)) ^
+              (m14 & b0) ^
+              (m15 & n5))
+    L[26] ^= ((m0 & ((b0 & b5) ^ ALL)) ^
+              (m1 & (b0 & b5)) ^
+              (m2 & (b0 ^ b5 ^ ALL)) ^
+              (m3 & (n0 & n5)) ^
+              (m4 & n5) ^
+              (m5 & (n0 & b5)) ^
+              (m6 & (b0 | b5)) ^
+              (m7 & b0) ^
+              (m8 & (b0 ^ b5)) ^
+              (m9 & (b0 ^ b5 ^ ALL)) ^
+              (m10 & (b0 ^ b5)) ^
+              (m11 & (b0 ^ b5)) ^
+              (m12 & (b0 ^ b5 ^ ALL)) ^
+              (m13 & (b0 ^ b5)) ^
+              (m14 & (b0 ^ b5 ^ ALL)) ^
+              (m15 & (n0 | b5)))
+
+    # S-box 6
+    b0 = r6 ^ d10 ^ K[10]
+    b1 = r7 ^ d11 ^ K[11]
+    b2 = r8 ^ d12 ^ K[12]
+    b3 = r9 ^ d13 ^ K[13]
+    b4 = r0 ^ d14 ^ K[14]
+    b5 = r1 ^ d15 ^ K[15]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[4] ^= ((m0 & (n0 & b5)) ^
+              (m1 & (b0 | b5)) ^
+              (m2 & n5) ^
+              (m3 & (b0 & b5)) ^
+              (m4 & (b0 | b5)) ^
+              (m5 & (n0 & n5)) ^
+              (m6 & (b0 ^ b5 ^ ALL)) ^
+              (m7 & (b0 ^ b5)) ^
+              (m8 & (b0 ^ b5 ^ ALL)) ^
+              (m9 & n5) ^
+              (m10 & (n0 & b5)) ^
+              (m11 & n0) ^
+              (m12 & (b0 | n5)) ^
+              (m13 & (b0 | b5)) ^
+              (m14 & ((b0 & b5) ^ ALL)) ^
+              (m15 & (b0 & b5)))
+    L[12] ^= ((m0 & (b0 & b5)) ^
+              (m1 & ((b0 & b5) ^ ALL)) ^
+              (m2 & (n0 & n5)) ^
+              (m3 & b5) ^
+              (m4 & ((b0 & b5) ^ ALL)) ^
+              (m5 & (b0 & n5)) ^
+              (m6 & b0) ^
+              (m7 & (b0 ^ b5 ^ ALL)) ^
+              (m8 & (b0 ^ b5 ^ ALL)) ^
+              (m9 & (b0 ^ b5)) ^
+              (m10 & (b0 & n5)) ^
+              (m11 & (n0 | b5)) ^
+              (m12 & n0) ^
+              (m13 & (b0 ^ b5 ^ ALL)) ^
+              (m14 & (b0 | b5)) ^
+              (m15 & (b0 ^ b5)))
+    L[18] ^= ((m0 & (n0 | b5)) ^
+              (m1 & (n0 & b5)) ^
+              (m2 & ((b0 & b5) ^ ALL)) ^
+              (m3 & (b0 ^ b5 ^ ALL)) ^
+              (m4 & (b0 & b5)) ^
+              (m5 & (b0 ^ b5)) ^
+              (m6 & (b0 & n5)) ^
+              (m7 & (n0 & n5)) ^
+              (m8 & (b0 & n5)) ^
+              (m9 & (b0 | n5)) ^
+              (m10 & (b0 & b5)) ^
+              (m11 & (b0 ^ b5)) ^
+              (m12 & ((b0 & b5) ^ ALL)) ^
+              (m13 & (n0 | b5)) ^
+              (m14 & (b0 | n5)) ^
+              (m15 & b5))
+    L[29] ^= ((m0 & (b0 ^ b5)) ^
+              (m1 & (b0 ^ b5 ^ ALL)) ^
+              (m2 & (b0 ^ b5 ^ ALL)) ^
+              (m3 & (n0 & n5)) ^
+              (m4 & (b0 | b5)) ^
+              (m5 & n0) ^
+              (m6 & (b0 ^ b5)) ^
+              (m7 & b0) ^
+              (m8 & (b0 ^ b5 ^ ALL)) ^
+              (m9 & (b0 | b5)) ^
+              (m10 & (b0 ^ b5)) ^
+              (m11 & (b0 ^ b5)) ^
+              (m12 & (b0 ^ b5)) ^
+              (m13 & (b0 ^ b5 ^ ALL)) ^
+              (m14 & (b0 ^ b5 ^ ALL)) ^
+              (m15 & (n0 & n5)))
+
+    # S-box 7
+    b0 = r0 ^ d2 ^ K[2]
+    b1 = r1 ^ d3 ^ K[3]
+    b2 = r2 ^ d4 ^ K[4]
+    b3 = r3 ^ d5 ^ K[5]
+    b4 = r4 ^ d6 ^ K[6]
+    b5 = r5 ^ d7 ^ K[7]
+    n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+    n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+    p0 = n1 & n2; q0 = n3 & n4
+    p1 = b1 & n2; q1 = b3 & n4
+    p2 = n1 & b2; q2 = n3 & b4
+    p3 = b1 & b2; q3 = b3 & b4
+    m0 = p0 & q0
+    m1 = p1 & q0
+    m2 = p2 & q0
+    m3 = p3 & q0
+    m4 = p0 & q1
+    m5 = p1 & q1
+    m6 = p2 & q1
+    m7 = p3 & q1
+    m8 = p0 & q2
+    m9 = p1 & q2
+    m10 = p2 & q2
+    m11 = p3 & q2
+    m12 = p0 & q3
+    m13 = p1 & q3
+    m14 = p2 & q3
+    m15 = p3 & q3
+    L[9] ^= ((m0 & n5) ^
+              (m1 & b5) ^
+              (m2 & (b0 ^ b5 ^ ALL)) ^
+              (m3 & n5) ^
+              (m4 & (b0 | b5)) ^
+              (m5 & (n0 & b5)) ^
+              (m6 & (b0 ^ b5)) ^
+              (m7 & (b0 | n5)) ^
+              (m8 & (n0 & b5)) ^
+              (m9 & (b0 | b5)) ^
+              (m10 & n5) ^
+              (m11 & b5) ^
+              (m12 & (b0 ^ b5 ^ ALL)) ^
+              (m13 & n5) ^
+              (m14 & b5) ^
+              (m15 & (n0 & n5)))
+    L[11] ^= ((m0 & ((b0 & b5) ^ ALL)) ^
+              (m1 & (b0 & b5)) ^
+              (m2 & (b0 & n5)) ^
+              (m3 & (b0 | n5)) ^
+              (m4 & (n0 & b5)) ^
+              (m5 & (b0 ^ b5 ^ ALL)) ^
+              (m6 & n0) ^
+              (m7 & (b0 ^ b5)) ^
+              (m8 & (b0 | b5)) ^
+              (m9 & n0) ^
+              (m10 & n0) ^
+              (m11 & b0) ^
+              (m12 & b0) ^
+              (m13 & (b0 ^ b5)) ^
+              (m14 & (b0 ^ b5 ^ ALL)) ^
+              (m15 & (b0 ^ b5 ^ ALL)))
+    L[21] ^= ((m0 & b0) ^
+              (m1 & (b0 ^ b5 ^ ALL)) ^
+              (m2 & n0) ^
+              (m3 & b0) ^
+              (m4 & (b0 & b5)) ^
+              (m5 & ((b0 & b5) ^ ALL)) ^
+              (m6 & ((b0 & b5) ^ ALL)) ^
+              (m7 & (b0 & b5)) ^
+              (m8 & ((b0 & b5) ^ ALL)) ^
+              (m9 & (b0 & n5)) ^
+              (m10 & (n0 | b5)) ^
+              (m11 & (b0 ^ b5)) ^
+              (m12 & (b0 & b5)) ^
+              (m13 & n0) ^
+              (m14 & (b0 & n5)) ^
+              (m15 & (n0 | b5)))
+    L[27] ^= ((m0 & (n0 & n5)) ^
+              (m1 & (n0 | b5)) ^
+              (m2 & (b0 ^ b5)) ^
+              (m3 & (b0 & n5)) ^
+              (m4 & (n0 | b5)) ^
+              (m5 & b0) ^
+              (m6 & (b0 | n5)) ^
+              (m7 & n0) ^
+              (m8 & (b0 ^ b5)) ^
+              (m9 & (b0 ^ b5 ^ ALL)) ^
+              (m10 & (b0 | n5)) ^
+              (m11 & (n0 & b5)) ^
+              (m12 & (n0 & b5)) ^
+              (m13 & ((b0 & b5) ^ ALL)) ^
+              (m14 & (b0 & b5)) ^
+              (m15 & b0))
+
+    return L
+
+#=============================================================================
+# eof
+#=============================================================================
@@ -0,0 +1,212 @@
+"""passlib.utils._des_gen - meta script that generates _des_bitslice.py
+
+the bitsliced engine operates on the same bit layout as
+:func:`passlib.utils.des.des_encrypt_int_block`, so all of the wiring
+(which bits feed each S-box, where each S-box output ends up,
+and which key bit ends up in each key schedule position) is derived
+from the tables in :mod:`passlib.utils.des`, rather than from the DES spec.
+"""
+#=============================================================================
+# imports
+#=============================================================================
+# core
+import os
+import textwrap
+# pkg
+from passlib.utils.compat import irange
+from passlib.utils import des
+# local
+
+#=============================================================================
+# table analysis
+#=============================================================================
+def get_output_bits():
+    """
+    return ``(bit_index, functions)``, where *bit_index* maps each of the 64
+    positions in the expanded L/R layout to the index of the underlying data bit
+    (or ``None`` for unused positions), and *functions* is a list of
+    ``(sbox, bit, truth_table)`` entries for each of the 32 data bits.
+    """
+    des._load_tables()
+    groups = {}
+    for sbox, table in enumerate(des.SPE):
+        for pos in irange(64):
+            truth = tuple((table[x] >> pos) & 1 for x in irange(64))
+            if any(truth):
+                groups.setdefault((sbox, truth), []).append(pos)
+    assert len(groups) == 32
+    bit_index = [None] * 64
+    functions = []
+    for bit, ((sbox, truth), positions) in enumerate(sorted(groups.items(),
+                                                            key=lambda item: min(item[1]))):
+        for pos in positions:
+            bit_index[pos] = bit
+        functions.append((sbox, bit, truth))
+    return bit_index, functions
+
+def get_key_map():
+    """
+    return list of 16 lists, one per key schedule entry, each mapping
+    the 64 positions of that entry to the key bit it's taken from
+    (or ``None`` for unused positions).
+    """
+    des._load_tables()
+    assert not any(even or odd for even, odd in des._key_schedule(0))
+    key_map = [[None] * 64 for _ in irange(16)]
+    for key_bit in irange(64):
+        for idx, pair in enumerate(des._key_schedule(1 << key_bit)):
+            for half, value in enumerate(pair):
+                entry = key_map[2*idx + half]
+                for pos in irange(64):
+                    if (value >> pos) & 1:
+                        assert entry[pos] is None
+                        entry[pos] = key_bit
+    return key_map
+
+#=============================================================================
+# code generation
+#=============================================================================
+
+# expressions for each 2-input function of the S-box's outer bits,
+# indexed by truth table (bit ``b0 | (b5<<1)`` set if function is true for that input).
+OUTER_FUNCTIONS = {
+    0x1: "(n0 & n5)",
+    0x2: "(b0 & n5)",
+    0x3: "n5",
+    0x4: "(n0 & b5)",
+    0x5: "n0",
+    0x6: "(b0 ^ b5)",
+    0x7: "((b0 & b5) ^ ALL)",
+    0x8: "(b0 & b5)",
+    0x9: "(b0 ^ b5 ^ ALL)",
+    0xa: "b0",
+    0xb: "(b0 | n5)",
+    0xc: "b5",
+    0xd: "(n0 | b5)",
+    0xe: "(b0 | b5)",
+}
+
+def render_half_round(write, bit_index, functions):
+    """render half_round() function"""
+    write(0, '''\
+        def half_round(R, L, K, S, ALL):
+            """
+            run one half-round of DES for all lanes at once.
+
+            :arg R: list of 32 bitsliced data bits (the input half).
+            :arg L: list of 32 bitsliced data bits (the half to update).
+            :arg K: list of 64 bitsliced key schedule bits for this round.
+            :arg S: list of 32 bitsliced salt bits.
+            :arg ALL: integer w/ a bit set for every lane.
+
+            :returns: updated copy of *L*.
+            """
+        ''')
+    write(1, "(%s,) = R\n" % ", ".join("r%d" % bit for bit in irange(32)))
+    write(1, "L = list(L)\n")
+    write(1, "\n# salt: swap E-box output bits i & i+32 in lanes w/ salt bit i set\n")
+    for pos in irange(32):
+        if bit_index[pos] is not None:
+            write(1, "d%d = (r%d ^ r%d) & S[%d]\n" % (pos, bit_index[pos],
+                                                    bit_index[pos+32], pos))
+    for sbox in irange(8):
+        write(1, "\n# S-box %d\n" % sbox)
+        for k in irange(6):
+            pos = 58 - 8*sbox + k
+            write(1, "b%d = r%d ^ d%d ^ K[%d]\n" % (k, bit_index[pos], pos & 31, pos))
+        write(1, """\
+            n0 = b0 ^ ALL; n1 = b1 ^ ALL; n2 = b2 ^ ALL
+            n3 = b3 ^ ALL; n4 = b4 ^ ALL; n5 = b5 ^ ALL
+            """)
+        for value in irange(4):
+            write(1, "p%d = %s%d & %s%d; q%d = %s%d & %s%d\n" % (
+                value, "nb"[value & 1], 1, "nb"[value >> 1], 2,
+                value, "nb"[value & 1], 3, "nb"[value >> 1], 4))
+        for value in irange(16):
+            write(1, "m%d = p%d & q%d\n" % (value, value & 3, value >> 2))
+        for fsbox, bit, truth in functions:
+            if fsbox != sbox:
+                continue
+            terms = []
+            for value in irange(16):
+                outer = 0
+                for b0 in (0, 1):
+                    for b5 in (0, 1):
+                        if truth[b0 | (value << 1) | (b5 << 5)]:
+                            outer |= 1 << (b0 | (b5 << 1))
+                if outer == 0xf:
+                    terms.append("m%d" % value)
+                elif outer:
+                    terms.append("(m%d & %s)" % (value, OUTER_FUNCTIONS[outer]))
+            write(1, "L[%d] ^= (%s)\n" % (bit, " ^\n          ".join(terms)))
+    write(1, "\nreturn L\n")
+
+def render_tuple(write, name, values, per_line=16):
+    """render tuple of ints / None"""
+    write(0, "%s = (\n" % name)
+    for start in irange(0, len(values), per_line):
+        write(1, " ".join("%r," % value for value in values[start:start+per_line]) + "\n")
+    write(0, ")\n")
+
+#=============================================================================
+# main
+#=============================================================================
+def main():
+    target = os.path.join(os.path.dirname(__file__), "_des_bitslice.py")
+    bit_index, functions = get_output_bits()
+    key_map = get_key_map()
+    with open(target, "w") as fh:
+
+        def write(indent, msg, **kwds):
+            if kwds:
+                msg %= kwds
+            msg = textwrap.dedent(msg)
+            if indent:
+                msg = "".join(" " * (indent*4) + line if line.strip() else line
+                              for line in msg.splitlines(True))
+            fh.write(msg)
+
+        write(0, '''\
+            """passlib.utils._des_bitslice - bitsliced DES engine,
+            autogenerated by _des_gen.py
+
+            each data bit is stored as an integer with one bit per lane,
+            so every boolean operation below processes all lanes at once.
+            see :func:`passlib.utils.des.des_encrypt_int_blocks` for the frontend.
+            """
+            #=============================================================================
+            # wiring
+            #=============================================================================
+
+            #: maps each position of the expanded L/R layout to a data bit (or ``None``)
+            ''')
+        render_tuple(write, "BIT_INDEX", bit_index)
+        write(0, """
+            #: for each of the 16 key schedule entries, maps each position to a key bit
+            KEY_MAP = (
+            """)
+        for entry in key_map:
+            write(1, "(\n")
+            for start in irange(0, 64, 16):
+                write(2, " ".join("%r," % value for value in entry[start:start+16]) + "\n")
+            write(1, "),\n")
+        write(0, """\
+            )
+
+            #=============================================================================
+            # engine
+            #=============================================================================
+            """)
+        render_half_round(write, bit_index, functions)
+        write(0, """
+            #=============================================================================
+            # eof
+            #=============================================================================
+            """)
+
+if __name__ == "__main__":
+    main()
+
+#=============================================================================
+# eof
+#=============================================================================
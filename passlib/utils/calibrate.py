@@ -0,0 +1,275 @@
+"""passlib.utils.calibrate - measure hash speed & pick rounds for a target time
+
+this is the library version of the ``choose_rounds.py`` script,
+and is used by CryptContext to implement the ``<scheme>__target_time`` option.
+since benchmarking can take a noticeable amount of time, measured speeds
+are cached on disk, keyed by the host's cpu, python implementation,
+passlib version, and the handler's active backend.
+"""
+#=============================================================================
+# imports
+#=============================================================================
+from __future__ import division
+# core
+import json
+import logging; log = logging.getLogger(__name__)
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+# site
+# pkg
+from passlib import __version__
+from passlib.utils import tick
+# local
+__all__ = [
+    "estimate_speed",
+    "get_speed",
+    "calibrate_rounds",
+    "get_default_cache_path",
+    "clear_cache",
+]
+
+#=============================================================================
+# rounds <-> cost conversion
+#=============================================================================
+def _rounds_to_cost(handler, rounds):
+    """convert rounds value to linear measure of cost"""
+    if getattr(handler, "rounds_cost", "linear") == "log2":
+        return 2 ** rounds
+    return rounds
+
+def _cost_to_rounds(handler, cost):
+    """convert linear cost back to (float) rounds value"""
+    if cost <= 0:
+        return 0
+    if getattr(handler, "rounds_cost", "linear") == "log2":
+        return math.log(cost, 2)
+    return cost
+
+def _clamp_rounds(handler, rounds):
+    """convert float rounds to int value, clamped to handler's limits"""
+    rounds = int(rounds)
+    mx = getattr(handler, "max_rounds", None)
+    if mx and rounds > mx:
+        rounds = mx
+    mn = getattr(handler, "min_rounds", None) or 0
+    if rounds < mn:
+        rounds = mn
+    if getattr(handler, "_avoid_even_rounds", False):
+        rounds |= 1
+    return rounds
+
+#=============================================================================
+# benchmarking
+#=============================================================================
+_SECRET = "S0m3-S3Kr1T"
+
+def _time_verify(handler, rounds, samples):
+    """return best time of verify() call w/ specified rounds"""
+    hash = handler.encrypt(_SECRET, rounds=rounds)
+    best = None
+    for _ in range(samples):
+        start = tick()
+        handler.verify(_SECRET, hash)
+        elapsed = tick() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def estimate_speed(handler, target_time=.25, samples=3):
+    """estimate how fast *handler* is on this host.
+
+    :arg handler: handler which supports the ``rounds`` setting.
+    :param target_time:
+        speed is sampled using a rounds value estimated to take
+        about 1/4 of this many seconds (so larger targets yield
+        more accurate estimates).
+    :param samples: number of calls to take best time from.
+
+    :returns:
+        speed, as the number of "linear cost units" per second
+        (i.e. ``rounds`` for linear handlers, ``2**rounds`` for log2 handlers).
+    """
+    # get rough estimate using small fraction of default rounds,
+    # so this doesn't take forever on slow systems.
+    rounds = _clamp_rounds(handler, _cost_to_rounds(handler,
+                    _rounds_to_cost(handler, handler.default_rounds) / 16))
+    elapsed = _time_verify(handler, rounds, 1)
+    speed = _rounds_to_cost(handler, rounds) / max(elapsed, 1e-6)
+
+    # re-do estimate using larger number of rounds, for more accurate sample.
+    rounds = _clamp_rounds(handler, _cost_to_rounds(handler, speed * target_time / 4))
+    elapsed = _time_verify(handler, rounds, samples)
+    return _rounds_to_cost(handler, rounds) / max(elapsed, 1e-6)
+
+#=============================================================================
+# on-disk cache
+#=============================================================================
+_cache_lock = threading.Lock()
+
+# in-memory copy of cache files, maps path -> dict
+_memory_cache = {}
+
+def get_default_cache_path():
+    """return path of calibration cache file, or ``None`` if disabled.
+
+    this defaults to ``~/.cache/passlib/calibration.json``, but can be
+    overridden via the :envvar:`PASSLIB_CALIBRATION_CACHE` environment variable
+    (an empty value or ``"disabled"`` turns the disk cache off).
+    """
+    path = os.environ.get("PASSLIB_CALIBRATION_CACHE")
+    if path is not None:
+        if not path or path == "disabled":
+            return None
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or \
+           os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "passlib", "calibration.json")
+
+def _get_cpu_name():
+    """return string identifying this host's cpu model"""
+    try:
+        with open("/proc/cpuinfo") as fh:
+            for line in fh:
+                if line.startswith("model name"):
+                    return line.partition(":")[2].strip()
+    except (IOError, OSError):
+        pass
+    return platform.processor() or "unknown"
+
+_host_key = None
+
+def _get_host_key():
+    """return string identifying cpu, python, and passlib version"""
+    global _host_key
+    if _host_key is None:
+        _host_key = "%s/%s/%s-%s/passlib-%s" % (
+            platform.machine(), _get_cpu_name(),
+            platform.python_implementation(),
+            ".".join(str(v) for v in sys.version_info[:2]),
+            __version__)
+    return _host_key
+
+def _get_handler_key(handler):
+    """return cache key for handler's current backend on this host"""
+    get_backend = getattr(handler, "get_backend", None)
+    backend = get_backend() if get_backend else None
+    return "%s|%s|%s" % (_get_host_key(), handler.name, backend)
+
+def _load_cache(path):
+    """read cache file into memory (returns empty dict on error).
+    if *path* is ``None``, returns process-local cache.
+    """
+    try:
+        return _memory_cache[path]
+    except KeyError:
+        pass
+    if not path:
+        data = _memory_cache[None] = {}
+        return data
+    try:
+        with open(path) as fh:
+            data = json.load(fh)
+        if not isinstance(data, dict):
+            raise ValueError("expected dict")
+    except (IOError, OSError):
+        data = {}
+    except ValueError as err:
+        log.warning("ignoring invalid calibration cache %r: %s", path, err)
+        data = {}
+    _memory_cache[path] = data
+    return data
+
+def _save_cache(path, data):
+    """write cache file, ignoring errors (cache is just an optimization)"""
+    try:
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        # write to tempfile & rename, so other processes never see partial file.
+        fd, tmp = tempfile.mkstemp(dir=dirname or None, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump(data, fh, indent=0, sort_keys=True)
+            if os.name == "nt" and os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp, path)
+        except:
+            os.remove(tmp)
+            raise
+    except (IOError, OSError) as err:
+        log.warning("couldn't write calibration cache %r: %s", path, err)
+
+def clear_cache(path=None):
+    """clear in-memory calibration cache (and remove *path*, if specified)"""
+    with _cache_lock:
+        _memory_cache.clear()
+        if path and os.path.exists(path):
+            os.remove(path)
+
+#=============================================================================
+# calibration
+#=============================================================================
+def get_speed(handler, target_time=.25, cache_path=None):
+    """return speed of *handler* on this host, using cached value if possible.
+
+    :arg handler: handler which supports the ``rounds`` setting.
+    :param target_time: passed to :func:`estimate_speed` if measurement is needed.
+    :param cache_path:
+        path of on-disk cache to use,
+        defaults to :func:`get_default_cache_path`.
+        pass ``False`` to disable disk cache
+        (results are still cached for the life of the process).
+
+    :returns: speed, as per :func:`estimate_speed`.
+    """
+    if cache_path is None:
+        cache_path = get_default_cache_path()
+    cache_path = cache_path or None
+    key = _get_handler_key(handler)
+    with _cache_lock:
+        speed = _load_cache(cache_path).get(key)
+    if isinstance(speed, (int, float)) and speed > 0:
+        return speed
+    speed = estimate_speed(handler, target_time)
+    log.debug("calibrated %s: %r cost/sec", key, speed)
+    with _cache_lock:
+        if cache_path:
+            # NOTE: re-reading file, in case another process has updated it.
+            _memory_cache.pop(cache_path, None)
+        data = _load_cache(cache_path)
+        data[key] = speed
+        if cache_path:
+            _save_cache(cache_path, data)
+    return speed
+
+def calibrate_rounds(handler, target_time, speed=None, cache_path=None):
+    """return rounds value which should take *target_time* seconds to verify.
+
+    :arg handler: handler which supports the ``rounds`` setting.
+    :arg target_time: target time, in seconds.
+    :param speed:
+        speed to use (as returned by :func:`get_speed`),
+        measured via :func:`get_speed` if not specified.
+    :param cache_path: passed to :func:`get_speed`.
+
+    :returns:
+        integer rounds value, clamped to the handler's limits.
+        for linear handlers, this is rounded to the nearest value;
+        for log2 handlers, it's rounded down, so it won't exceed *target_time*.
+    """
+    if target_time <= 0:
+        raise ValueError("target_time must be > 0")
+    if speed is None:
+        speed = get_speed(handler, target_time, cache_path)
+    rounds = _cost_to_rounds(handler, speed * target_time)
+    if getattr(handler, "rounds_cost", "linear") != "log2":
+        rounds = round(rounds)
+    return _clamp_rounds(handler, rounds)
+
+#=============================================================================
+# eof
+#=============================================================================
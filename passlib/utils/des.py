@@ -44,16 +44,24 @@ The netbsd des-crypt implementation has some nice notes on how this all works -
 # imports
 #=============================================================================
 # core
+from itertools import repeat
+from operator import xor
 import struct
+import threading
 # pkg
 from passlib import exc
 from passlib.utils.compat import join_byte_values, byte_elem_value, \
-                                 irange, irange, int_types
+                                 irange, irange, int_types, OrderedDict
 from passlib.utils import deprecated_function
 # local
 __all__ = [
     "expand_des_key",
     "des_encrypt_block",
+    "des_encrypt_int_block",
+    "des_encrypt_int_blocks",
+    "get_des_engine",
+    "DesCache",
+    "get_des_cache",
     "mdes_encrypt_int_block",
 ]
 
@@ -651,6 +659,54 @@ def shrink_des_key(key):
     assert not (result & ~INT_64_MASK)
     return result
 
+#=============================================================================
+# des encryption helpers
+#=============================================================================
+# NOTE: these helpers are shared by all the DES engines below,
+#       and assume _load_tables() has already been called.
+
+def _key_schedule(key):
+    """given 64-bit key, return list of the 8 (even,odd) key schedule pairs"""
+    # NOTE: generation was modified to output two elements at a time,
+    # so that per-round loop could do two passes at once.
+    ks_list = []
+    ks_odd = key
+    for p_even, p_odd in PCXROT:
+        ks_even = _permute(ks_odd, p_even)
+        ks_odd = _permute(ks_even, p_odd)
+        ks_list.append((ks_even & _KS_MASK, ks_odd & _KS_MASK))
+    return ks_list
+
+def _expand_salt(salt):
+    """expand 24 bit salt -> 32 bit per des_crypt & bsdi_crypt"""
+    return (
+        ((salt & 0x00003f) << 26) |
+        ((salt & 0x000fc0) << 12) |
+        ((salt & 0x03f000) >> 2) |
+        ((salt & 0xfc0000) >> 16)
+        )
+
+def _initial_block(input):
+    """return initial (L, R) values for 64-bit input block"""
+    if input == 0:
+        return 0, 0
+    L = ((input >> 31) & 0xaaaaaaaa) | (input & 0x55555555)
+    R = ((input >> 32) & 0xaaaaaaaa) | ((input >> 1) & 0x55555555)
+    return _permute(L, IE3264), _permute(R, IE3264)
+
+def _final_block(L, R):
+    """return 64-bit output block for final (L, R) values"""
+    C = (
+            ((L>>3) &  0x0f0f0f0f00000000)
+            |
+            ((L<<33) & 0xf0f0f0f000000000)
+            |
+            ((R>>35) & 0x000000000f0f0f0f)
+            |
+            ((R<<1) &  0x00000000f0f0f0f0)
+        )
+    return _permute(C, CF6464)
+
 #=============================================================================
 # des encryption
 #=============================================================================
@@ -765,7 +821,6 @@ def des_encrypt_int_block(key, input, salt=0, rounds=1):
     # DES setup
     #---------------------------------------------------------------
     # load tables if not already done
-    global SPE, PCXROT, IE3264, CF6464
     if PCXROT is None:
         _load_tables()
 
@@ -774,35 +829,9 @@ def des_encrypt_int_block(key, input, salt=0, rounds=1):
 
     # NOTE: parity bits are ignored completely
     # (UTs do fuzz testing to ensure this)
-
-    # generate key schedule
-    # NOTE: generation was modified to output two elements at a time,
-    # so that per-round loop could do two passes at once.
-    def _iter_key_schedule(ks_odd):
-        """given 64-bit key, iterates over the 8 (even,odd) key schedule pairs"""
-        for p_even, p_odd in PCXROT:
-            ks_even = _permute(ks_odd, p_even)
-            ks_odd = _permute(ks_even, p_odd)
-            yield ks_even & _KS_MASK, ks_odd & _KS_MASK
-    ks_list = list(_iter_key_schedule(key))
-
-    # expand 24 bit salt -> 32 bit per des_crypt & bsdi_crypt
-    salt = (
-        ((salt & 0x00003f) << 26) |
-        ((salt & 0x000fc0) << 12) |
-        ((salt & 0x03f000) >> 2) |
-        ((salt & 0xfc0000) >> 16)
-        )
-
-    # init L & R
-    if input == 0:
-        L = R = 0
-    else:
-        L = ((input >> 31) & 0xaaaaaaaa) | (input & 0x55555555)
-        L = _permute(L, IE3264)
-
-        R = ((input >> 32) & 0xaaaaaaaa) | ((input >> 1) & 0x55555555)
-        R = _permute(R, IE3264)
+    ks_list = _key_schedule(key)
+    salt = _expand_salt(salt)
+    L, R = _initial_block(input)
 
     #---------------------------------------------------------------
     # main DES loop - run for specified number of rounds
@@ -834,16 +863,516 @@ def des_encrypt_int_block(key, input, salt=0, rounds=1):
     #---------------------------------------------------------------
     # return final result
     #---------------------------------------------------------------
-    C = (
-            ((L>>3) &  0x0f0f0f0f00000000)
-            |
-            ((L<<33) & 0xf0f0f0f000000000)
-            |
-            ((R>>35) & 0x000000000f0f0f0f)
-            |
-            ((R<<1) &  0x00000000f0f0f0f0)
+    return _final_block(L, R)
+
+#=============================================================================
+# combined SP tables
+#=============================================================================
+
+# combined SP tables, filled in by _load_combined_tables().
+# each table merges two adjacent SPE tables, and is indexed by the 14 bits
+# starting at the lower table's offset (the 2 unused bits in between are
+# always 0, so only 4096 of the entries are actually reached).
+_SPE01 = _SPE23 = _SPE45 = _SPE67 = None
+
+# filler for unreachable entries of the combined tables
+_COMBINED_PAD = [0] * 192
+
+def _combine_tables(spe):
+    """build the four combined tables from list of eight SPE-style tables"""
+    tables = []
+    pad = _COMBINED_PAD
+    for idx in irange(0, 8, 2):
+        low = spe[idx+1]
+        table = []
+        for value in spe[idx]:
+            table.extend(map(xor, repeat(value, 64), low))
+            table.extend(pad)
+        tables.append(table)
+    return tables
+
+def _load_combined_tables():
+    """build combined SP tables from SPE"""
+    global _SPE01, _SPE23, _SPE45, _SPE67
+    if PCXROT is None:
+        _load_tables()
+    _SPE01, _SPE23, _SPE45, _SPE67 = _combine_tables(SPE)
+
+def _swap_salt_bits(value, salt):
+    """swap bits ``i`` & ``i+32`` of value for each bit ``i`` set in (expanded) salt"""
+    k = ((value >> 32) ^ value) & salt
+    return value ^ k ^ (k << 32)
+
+def _build_salt_tables(salt):
+    """
+    build combined tables specialized for the specified (expanded) salt.
+
+    the salt swaps bits in the E-box output (i.e. the table index).
+    since that swap is linear, running DES with the L & R halves
+    stored pre-swapped is equivalent -- as long as the table *outputs*
+    are swapped too. so these tables are the combined tables with every
+    entry pre-swapped, and the DES loop doesn't have to touch the salt at all.
+    """
+    if PCXROT is None:
+        _load_tables()
+    return _combine_tables([[_swap_salt_bits(value, salt) for value in table]
+                            for table in SPE])
+
+#=============================================================================
+# table & key schedule cache
+#=============================================================================
+class DesCache(object):
+    """bounded LRU cache used by the table-driven DES engine.
+
+    this holds two kinds of entries:
+
+    * combined SP tables specialized for a given salt, which let the engine
+      skip the salt operations in each round. these take 1-2ms to build,
+      and around 1MB of memory each, so only 8 are kept by default,
+      and they're only built once a salt has been seen twice.
+      so these only help when work is grouped by salt (e.g. repeated logins
+      against the same hash, or an audit processing hashes in salt order). if the cache is evicting tables before they get
+      reused (e.g. hashes with random salts), building is throttled.
+
+    * key schedules, keyed by the DES key. since des_crypt's key is just
+      the first 8 characters of the password, this is disabled by default,
+      and should only be enabled for things like bulk audits, where the
+      same candidate passwords are checked against many hashes.
+      each takes up under 1KB.
+
+    :param max_salts:
+        max number of salt-specialized tables to keep (defaults to 8).
+        ``0`` disables them. each one costs around 1MB of memory.
+
+    :param max_keys:
+        max number of key schedules to keep (defaults to ``0``, disabled).
+
+    instances are thread-safe.
+
+    .. versionadded:: 1.7
+    """
+    #===================================================================
+    # instance attrs
+    #===================================================================
+
+    #: max number of salt-specialized tables (~1MB each)
+    max_salts = 8
+
+    #: max number of key schedules
+    max_keys = 0
+
+    #: max number of salts remembered while waiting to be seen again
+    max_pending = 4096
+
+    #: hit & miss counters (see :meth:`stats`)
+    salt_hits = salt_misses = salt_builds = key_hits = key_misses = 0
+
+    # map of expanded salt -> tables, ordered by least recently used
+    _salts = None
+
+    # map of expanded salt -> None for salts seen once
+    _pending = None
+
+    # map of key -> key schedule, ordered by least recently used
+    _keys = None
+
+    # build credit; each build costs _BUILD_COST, each hit earns one credit.
+    # builds are skipped while it's <= 0. (a build takes about as long as
+    # the time saved by 16-20 hits, so that's roughly the break-even point).
+    _credit = 0
+    _BUILD_COST = 16
+    _MAX_CREDIT = 64
+
+    # credit earned each time a build is skipped, so building
+    # resumes (slowly) if the access pattern changes.
+    _SKIP_CREDIT = 0.05
+
+    #===================================================================
+    # init
+    #===================================================================
+    def __init__(self, max_salts=None, max_keys=None):
+        self._salts = OrderedDict()
+        self._pending = OrderedDict()
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self._credit = self._MAX_CREDIT // 2
+        self.set_limits(max_salts, max_keys)
+
+    def __repr__(self):
+        return "<DesCache max_salts=%d max_keys=%d salts=%d keys=%d>" % (
+            self.max_salts, self.max_keys, len(self._salts), len(self._keys))
+
+    def set_limits(self, max_salts=None, max_keys=None):
+        """change cache size limits, evicting entries as needed"""
+        if max_salts is not None:
+            if max_salts < 0:
+                raise ValueError("max_salts must be >= 0")
+            self.max_salts = max_salts
+        if max_keys is not None:
+            if max_keys < 0:
+                raise ValueError("max_keys must be >= 0")
+            self.max_keys = max_keys
+        with self._lock:
+            self._trim(self._salts, self.max_salts)
+            self._trim(self._keys, self.max_keys)
+
+    @staticmethod
+    def _trim(entries, size):
+        """evict least recently used entries until size is reached"""
+        while len(entries) > size:
+            entries.popitem(last=False)
+
+    #===================================================================
+    # lookups
+    #===================================================================
+    def salt_tables(self, salt):
+        """return combined tables specialized for (expanded) salt,
+        or ``None`` if they haven't been built."""
+        if not self.max_salts:
+            return None
+        with self._lock:
+            salts = self._salts
+            tables = salts.pop(salt, None)
+            if tables is not None:
+                salts[salt] = tables
+                self.salt_hits += 1
+                if self._credit < self._MAX_CREDIT:
+                    self._credit += 1
+                return tables
+            self.salt_misses += 1
+            pending = self._pending
+            if pending.pop(salt, True):
+                # first time salt has been seen -- just remember it
+                pending[salt] = None
+                self._trim(pending, self.max_pending)
+                return None
+            if self._credit <= 0:
+                # recent builds haven't been reused, hold off for now
+                self._credit += self._SKIP_CREDIT
+                pending[salt] = None
+                return None
+            self._credit -= self._BUILD_COST
+            self.salt_builds += 1
+
+        # build tables outside of lock
+        tables = _build_salt_tables(salt)
+        with self._lock:
+            salts[salt] = tables
+            self._trim(salts, self.max_salts)
+        return tables
+
+    def key_schedule(self, key):
+        """return key schedule for 64-bit key"""
+        if not self.max_keys:
+            return _key_schedule(key)
+        keys = self._keys
+        with self._lock:
+            ks_list = keys.pop(key, None)
+            if ks_list is not None:
+                keys[key] = ks_list
+                self.key_hits += 1
+                return ks_list
+            self.key_misses += 1
+        ks_list = _key_schedule(key)
+        with self._lock:
+            keys[key] = ks_list
+            self._trim(keys, self.max_keys)
+        return ks_list
+
+    #===================================================================
+    # stats
+    #===================================================================
+    def stats(self):
+        """return dict of cache statistics.
+
+        this includes the hit & miss counts, and hit rates (from ``0.0`` to ``1.0``)
+        for each kind of entry (``salt_hits``, ``salt_misses``, ``salt_hit_rate``,
+        ``key_hits``, ``key_misses``, ``key_hit_rate``), as well as the
+        number of salt tables built (``salt_builds``), and the current
+        number of entries (``salts``, ``keys``).
+        """
+        def rate(hits, misses):
+            total = hits + misses
+            return float(hits) / total if total else 0.0
+        return dict(
+            salt_hits=self.salt_hits,
+            salt_misses=self.salt_misses,
+            salt_hit_rate=rate(self.salt_hits, self.salt_misses),
+            salt_builds=self.salt_builds,
+            salts=len(self._salts),
+            key_hits=self.key_hits,
+            key_misses=self.key_misses,
+            key_hit_rate=rate(self.key_hits, self.key_misses),
+            keys=len(self._keys),
         )
-    return _permute(C, CF6464)
+
+    def clear(self):
+        """remove all entries, and reset statistics"""
+        with self._lock:
+            self._salts.clear()
+            self._pending.clear()
+            self._keys.clear()
+            self._credit = self._MAX_CREDIT // 2
+            self.salt_hits = self.salt_misses = self.salt_builds = 0
+            self.key_hits = self.key_misses = 0
+
+    #===================================================================
+    # eoc
+    #===================================================================
+
+# cache used by the table-driven engine
+_des_cache = DesCache()
+
+def get_des_cache():
+    """return the :class:`DesCache` instance used by the table-driven DES engine
+    (e.g. to check :meth:`~DesCache.stats`, or adjust its size via :meth:`~DesCache.set_limits`).
+
+    by default this keeps tables for up to 8 salts. each salt entry costs
+    around 1MB of memory, and each key schedule (disabled by default) under 1KB;
+    so e.g. ``get_des_cache().set_limits(max_salts=16)`` would use up to ~16MB.
+    the speedup depends on salt locality: work spread across more salts
+    than the cache holds won't see any benefit.
+    use ``set_limits(max_salts=0)`` to disable the cache entirely.
+
+    .. versionadded:: 1.7
+    """
+    return _des_cache
+
+#=============================================================================
+# table-driven engine
+#=============================================================================
+def _table_encrypt_int_block(key, input, salt, rounds):
+    """table-driven DES engine.
+
+    returns same result as :func:`des_encrypt_int_block`, but doesn't
+    validate its inputs. instead of the eight SPE lookups per half-round,
+    this does four lookups into the combined SP tables. if the cache
+    has tables specialized for the salt, those are used instead,
+    letting the salt operations be skipped as well.
+    """
+    if _SPE01 is None:
+        _load_combined_tables()
+    cache = _des_cache
+    ks_list = cache.key_schedule(key)
+    L, R = _initial_block(input)
+
+    if salt:
+        salt = _expand_salt(salt)
+        tables = cache.salt_tables(salt)
+        if tables is None:
+            # use generic tables, and apply salt each round
+            SPE01, SPE23, SPE45, SPE67 = _SPE01, _SPE23, _SPE45, _SPE67
+            while rounds:
+                rounds -= 1
+                for ks_even, ks_odd in ks_list:
+                    k = ((R>>32) ^ R) & salt
+                    B = (k<<32) ^ k ^ R ^ ks_even
+                    L ^= (SPE01[(B>>50)&0x3fff] ^ SPE23[(B>>34)&0x3fff] ^
+                          SPE45[(B>>18)&0x3fff] ^ SPE67[(B>>2)&0x3fff])
+
+                    k = ((L>>32) ^ L) & salt
+                    B = (k<<32) ^ k ^ L ^ ks_odd
+                    R ^= (SPE01[(B>>50)&0x3fff] ^ SPE23[(B>>34)&0x3fff] ^
+                          SPE45[(B>>18)&0x3fff] ^ SPE67[(B>>2)&0x3fff])
+                L, R = R, L
+            return _final_block(L, R)
+
+        # L & R are stored pre-swapped while using salt-specific tables
+        SPE01, SPE23, SPE45, SPE67 = tables
+        L = _swap_salt_bits(L, salt)
+        R = _swap_salt_bits(R, salt)
+    else:
+        SPE01, SPE23, SPE45, SPE67 = _SPE01, _SPE23, _SPE45, _SPE67
+
+    while rounds:
+        rounds -= 1
+        for ks_even, ks_odd in ks_list:
+            B = R ^ ks_even
+            L ^= (SPE01[(B>>50)&0x3fff] ^ SPE23[(B>>34)&0x3fff] ^
+                  SPE45[(B>>18)&0x3fff] ^ SPE67[(B>>2)&0x3fff])
+
+            B = L ^ ks_odd
+            R ^= (SPE01[(B>>50)&0x3fff] ^ SPE23[(B>>34)&0x3fff] ^
+                  SPE45[(B>>18)&0x3fff] ^ SPE67[(B>>2)&0x3fff])
+        L, R = R, L
+
+    if salt:
+        L = _swap_salt_bits(L, salt)
+        R = _swap_salt_bits(R, salt)
+    return _final_block(L, R)
+
+#: map of engine name -> function(key, input, salt, rounds),
+#: used by :func:`get_des_engine`.
+_des_engines = {
+    "table": _table_encrypt_int_block,
+    "reference": des_encrypt_int_block,
+}
+
+def get_des_engine(name="table"):
+    """return function implementing the specified DES engine.
+
+    :param name:
+        ``"table"`` (the default) selects the table-driven engine,
+        which precomputes combined SP-box tables.
+        ``"reference"`` selects :func:`des_encrypt_int_block`.
+
+    :raises ValueError: if the engine name is unknown.
+
+    :returns:
+        function with the signature ``(key, input, salt, rounds) -> int``,
+        which behaves like :func:`des_encrypt_int_block`.
+        the table engine doesn't validate its arguments, so this is
+        mainly of use to the :mod:`~passlib.hash.des_crypt` family of handlers.
+
+    .. versionadded:: 1.7
+    """
+    try:
+        return _des_engines[name]
+    except KeyError:
+        raise ValueError("unknown DES engine: %r" % (name,))
+
+#=============================================================================
+# bitsliced engine
+#=============================================================================
+
+#: max number of keys processed by each pass of the bitsliced engine
+_BITSLICE_LANES = 4096
+
+def _transpose_in(values, width):
+    """convert list of *width*-bit ints (one per lane)
+    into list of *width* bitsliced ints (one per bit)"""
+    # NOTE: rows are msb first, so column ``width-1-bit`` holds that bit
+    #       for each lane; it's reversed so lane 0 becomes the slice's lsb.
+    fmt = "0%db" % width
+    columns = list(zip(*[format(value, fmt) for value in values]))
+    return [int("".join(reversed(columns[width-1-bit])), 2) for bit in irange(width)]
+
+def _transpose_out(data, bit_index, count):
+    """convert bitsliced data bits back into list of 64-bit L/R values"""
+    fmt = "0%db" % count
+    zeros = "0" * count
+    columns = [zeros if idx is None else format(data[idx], fmt)
+               for idx in reversed(bit_index)]
+    # each column is msb first (i.e. last lane first)
+    values = [int("".join(row), 2) for row in zip(*columns)]
+    values.reverse()
+    return values
+
+def _spread_block(value, bit_index, ALL):
+    """convert 64-bit L/R value into bitsliced data bits, same for every lane"""
+    data = [0] * 32
+    for pos, idx in enumerate(bit_index):
+        if idx is not None and (value >> pos) & 1:
+            data[idx] = ALL
+    return data
+
+def _bitslice_encrypt_int_blocks(keys, input, salts, rounds):
+    """bitsliced DES engine -- encrypts *input* under each of *keys*,
+    processing all of them in each pass. no validation is performed."""
+    from passlib.utils._des_bitslice import BIT_INDEX, KEY_MAP, half_round
+    count = len(keys)
+    ALL = (1 << count) - 1
+
+    # key schedule is just a bit permutation of the key,
+    # so it can be built directly from the bitsliced key.
+    K = _transpose_in(keys, 64)
+    ks_list = [[0 if bit is None else K[bit] for bit in entry] for entry in KEY_MAP]
+    S = _transpose_in([_expand_salt(salt) for salt in salts], 32)
+
+    # initial block is the same for every lane
+    L, R = _initial_block(input)
+    L = _spread_block(L, BIT_INDEX, ALL)
+    R = _spread_block(R, BIT_INDEX, ALL)
+
+    while rounds:
+        rounds -= 1
+        for idx in irange(0, 16, 2):
+            L = half_round(R, L, ks_list[idx], S, ALL)
+            R = half_round(L, R, ks_list[idx+1], S, ALL)
+        L, R = R, L
+
+    return [_final_block(left, right) for left, right in
+            zip(_transpose_out(L, BIT_INDEX, count), _transpose_out(R, BIT_INDEX, count))]
+
+#: batches smaller than this are handed to the table-driven engine,
+#: since the bitsliced engine has a higher fixed cost per pass.
+_BITSLICE_MIN_LANES = 96
+
+def des_encrypt_int_blocks(keys, input=0, salts=None, rounds=1):
+    """encrypt the same block of data under many keys, operates on 64-bit integers.
+
+    this is equivalent to calling :func:`des_encrypt_int_block` for each
+    key (and salt), but uses a bitsliced DES implementation, which encrypts
+    up to 4096 blocks at a time using boolean operations on large integers.
+    for large batches this is many times faster than calling
+    :func:`!des_encrypt_int_block` repeatedly.
+
+    :arg keys:
+        sequence of DES keys as 64-bit integers (the parity bits are ignored).
+
+    :arg input:
+        input block as 64-bit integer, used for every key.
+        defaults to ``0`` (as used by :class:`~passlib.hash.des_crypt` and its variants).
+
+    :arg salts:
+        optional sequence of 24-bit integers (see :func:`des_encrypt_block`),
+        one per key. defaults to ``0`` for every key.
+
+    :arg rounds:
+        optional number of rounds of to apply the DES key schedule.
+        defaults to ``1``.
+
+    :raises TypeError: if any of the provided args are of the wrong type.
+    :raises ValueError:
+        if any of the keys or input are the wrong size,
+        or the salt/rounds values are out of range.
+
+    :returns:
+        list of ciphertexts as 64-bit integers, in the same order as *keys*.
+
+    .. versionadded:: 1.7
+    """
+    # validate inputs
+    keys = list(keys)
+    if salts is None:
+        salts = [0] * len(keys)
+    else:
+        salts = list(salts)
+        if len(salts) != len(keys):
+            raise ValueError("keys and salts must have same length")
+    if rounds < 1:
+        raise ValueError("rounds must be positive integer")
+    for salt in salts:
+        if salt < 0 or salt > INT_24_MASK:
+            raise ValueError("salt must be 24-bit non-negative integer")
+    for key in keys:
+        if not isinstance(key, int_types):
+            raise exc.ExpectedTypeError(key, "int", "key")
+        elif key < 0 or key > INT_64_MASK:
+            raise ValueError("key must be 64-bit non-negative integer")
+    if not isinstance(input, int_types):
+        raise exc.ExpectedTypeError(input, "int", "input")
+    elif input < 0 or input > INT_64_MASK:
+        raise ValueError("input must be 64-bit non-negative integer")
+
+    # small batches aren't worth bitslicing.
+    # NOTE: these are processed in salt order, so the table engine's
+    #       salt cache gets reused (results are returned in original order).
+    if len(keys) < _BITSLICE_MIN_LANES:
+        result = [None] * len(keys)
+        for idx in sorted(irange(len(keys)), key=salts.__getitem__):
+            result[idx] = _table_encrypt_int_block(keys[idx], input, salts[idx], rounds)
+        return result
+
+    # process keys in chunks
+    if PCXROT is None:
+        _load_tables()
+    size = _BITSLICE_LANES
+    result = []
+    for start in irange(0, len(keys), size):
+        result.extend(_bitslice_encrypt_int_blocks(keys[start:start+size], input,
+                                                   salts[start:start+size], rounds))
+    return result
 
 @deprecated_function(deprecated="1.6", removed="1.8",
                      replacement="des_encrypt_int_block()")
@@ -0,0 +1,304 @@
+"""passlib.utils.filewatch - background watcher for changes to a file
+
+this implements a small helper which sets a flag whenever a file changes,
+so callers such as :meth:`HtpasswdFile.load_if_changed() <passlib.apache.HtpasswdFile.load_if_changed>`
+can check for changes without making a system call every time.
+
+on linux, this uses inotify (via ctypes) to watch the file's directory,
+so files which are replaced via rename are detected as well as ones
+modified in place. elsewhere (or if inotify isn't available),
+it falls back to a thread which periodically stat()s the file.
+
+notes:
+
+* the flag is only ever *set* by the watcher; callers are expected
+  to clear it before re-reading the file, so changes made while
+  the file is being read aren't lost.
+
+* background threads don't survive a fork(). under python 3.7+,
+  watchers inherited by a child process are marked as changed & closed,
+  so callers can detect this and create a new one.
+  under older versions, watchers should be created after forking.
+"""
+#=============================================================================
+# imports
+#=============================================================================
+# core
+import errno
+import logging; log = logging.getLogger(__name__)
+import os
+import select
+import struct
+import sys
+import threading
+import weakref
+# site
+# pkg
+# local
+__all__ = [
+    "FileWatcher",
+    "file_signature",
+    "has_inotify",
+]
+
+#=============================================================================
+# helpers
+#=============================================================================
+def file_signature(st):
+    """return tuple identifying a file's contents, from :func:`os.stat` result.
+
+    this includes the inode & size as well as the mtime, since mtime may only
+    have 1 second resolution, and files which are replaced via rename
+    may well have an older mtime than the original.
+    """
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+
+def _stat_signature(path):
+    """return :func:`file_signature` of path, or ``None`` if it doesn't exist"""
+    try:
+        return file_signature(os.stat(path))
+    except OSError:
+        return None
+
+#=============================================================================
+# inotify support
+#=============================================================================
+
+# inotify constants (from <sys/inotify.h>)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# events on directory entries which indicate watched file has changed
+_FILE_EVENTS = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+                _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+
+# events indicating the directory itself has gone away
+_DIR_EVENTS = _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED
+
+# struct inotify_event header (followed by *len* bytes of NUL-padded name)
+_EVENT_HEADER = struct.Struct("iIII")
+
+_libc = None
+
+def _load_libc():
+    """return libc handle w/ inotify functions, or ``None`` if not available"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith("linux"):
+            try:
+                import ctypes
+                import ctypes.util
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                                   use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_init1.restype = ctypes.c_int
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                                   ctypes.c_uint32]
+                libc.inotify_add_watch.restype = ctypes.c_int
+            except (ImportError, OSError, AttributeError) as err:
+                log.debug("inotify not available: %s", err)
+            else:
+                _libc = libc
+    return _libc or None
+
+def has_inotify():
+    """return ``True`` if inotify is available on this system"""
+    return _load_libc() is not None
+
+def _inotify_open(dirname):
+    """return inotify fd watching *dirname*, or ``None`` if that fails"""
+    libc = _load_libc()
+    if libc is None:
+        return None
+    import ctypes
+    fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:
+        log.debug("inotify_init1() failed: %s", os.strerror(ctypes.get_errno()))
+        return None
+    if not isinstance(dirname, bytes):
+        dirname = dirname.encode(sys.getfilesystemencoding())
+    if libc.inotify_add_watch(fd, dirname, _FILE_EVENTS | _DIR_EVENTS) < 0:
+        log.debug("inotify_add_watch(%r) failed: %s", dirname,
+                  os.strerror(ctypes.get_errno()))
+        os.close(fd)
+        return None
+    return fd
+
+def _iter_event_names(data):
+    """iterate over (mask, name) for each event in data read from inotify fd"""
+    pos = 0
+    end = len(data)
+    size = _EVENT_HEADER.size
+    while pos + size <= end:
+        _, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+        pos += size
+        yield mask, data[pos:pos+length].rstrip(b"\x00")
+        pos += length
+
+#=============================================================================
+# watcher threads
+#=============================================================================
+def _watch_inotify(ref, fd, name, interval):
+    """thread which sets ``changed`` flag when inotify reports change to file"""
+    try:
+        while True:
+            try:
+                ready = select.select([fd], [], [], interval)[0]
+            except (OSError, select.error) as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+            self = ref()
+            if self is None or self.closed:
+                return
+            if not ready:
+                continue
+            try:
+                data = os.read(fd, 65536)
+            except OSError as err:
+                if err.errno in (errno.EAGAIN, errno.EINTR):
+                    continue
+                raise
+            for mask, event_name in _iter_event_names(data):
+                if mask & (_IN_Q_OVERFLOW | _DIR_EVENTS) or event_name == name:
+                    self.changed = True
+                if mask & _DIR_EVENTS:
+                    # directory is gone, nothing more to watch
+                    log.debug("watched directory removed: %r", self.path)
+                    self.closed = True
+                    return
+            self = None
+    finally:
+        os.close(fd)
+
+def _watch_poll(ref, event, path, last, interval):
+    """thread which sets ``changed`` flag when file's signature changes"""
+    while not event.wait(interval):
+        self = ref()
+        if self is None or self.closed:
+            return
+        current = _stat_signature(path)
+        if current != last:
+            last = current
+            self.changed = True
+        self = None
+
+#=============================================================================
+# watcher
+#=============================================================================
+
+# set of live watchers, used to mark them closed after fork()
+_watchers = weakref.WeakValueDictionary()
+
+def _after_fork_in_child():
+    """mark watchers inherited from parent as changed & closed,
+    since their threads don't exist in the child process."""
+    for watcher in list(_watchers.values()):
+        watcher.changed = True
+        watcher.closed = True
+    _watchers.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+class FileWatcher(object):
+    """watches a file, setting :attr:`changed` whenever it's modified,
+    replaced, or deleted.
+
+    :arg path: path of file to watch (need not exist yet).
+
+    :param interval:
+        how often (in seconds) polling thread checks the file.
+        when using inotify, this is how often the thread checks
+        whether the watcher has been closed.
+
+    :param use_inotify:
+        whether to use inotify: ``None`` (the default) uses it if available,
+        ``False`` forces polling.
+
+    the background thread only holds a weak reference to the watcher,
+    and exits once the watcher is closed or garbage collected.
+    """
+    #===================================================================
+    # instance attrs
+    #===================================================================
+
+    #: path being watched
+    path = None
+
+    #: set to ``True`` whenever the file changes (callers should clear it)
+    changed = False
+
+    #: set once :meth:`close` is called (or the watcher has been inherited
+    #: across a fork, and is no longer running)
+    closed = False
+
+    #: ``"inotify"`` or ``"poll"``, depending on mechanism in use
+    mode = None
+
+    # event used to stop polling thread
+    _stop = None
+
+    #===================================================================
+    # init
+    #===================================================================
+    def __init__(self, path, interval=1.0, use_inotify=None):
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        self.path = path
+        ref = weakref.ref(self)
+        fd = None
+        if use_inotify or use_inotify is None:
+            dirname = os.path.dirname(os.path.abspath(path))
+            fd = _inotify_open(dirname)
+            if fd is None and use_inotify:
+                raise RuntimeError("inotify not available")
+        if fd is not None:
+            self.mode = "inotify"
+            name = os.path.basename(path)
+            if not isinstance(name, bytes):
+                name = name.encode(sys.getfilesystemencoding())
+            target, args = _watch_inotify, (ref, fd, name, interval)
+        else:
+            self.mode = "poll"
+            self._stop = threading.Event()
+            # NOTE: initial signature is read here rather than by thread,
+            #       so changes made right after the watcher is created are caught.
+            target, args = _watch_poll, (ref, self._stop, path,
+                                         _stat_signature(path), interval)
+        thread = threading.Thread(target=target, args=args,
+                                  name="passlib-filewatch")
+        thread.daemon = True
+        thread.start()
+        _watchers[id(self)] = self
+
+    def __repr__(self):
+        return "<FileWatcher path=%r mode=%r changed=%r>" % (
+            self.path, self.mode, self.changed)
+
+    def close(self):
+        """stop watching file"""
+        self.closed = True
+        if self._stop is not None:
+            self._stop.set()
+        _watchers.pop(id(self), None)
+
+    #===================================================================
+    # eoc
+    #===================================================================
+
+#=============================================================================
+# eof
+#=============================================================================
@@ -0,0 +1,297 @@
+"""passlib.utils.oscrypt - thread-friendly access to the host's crypt()
+
+stdlib's :func:`!crypt.crypt` holds the GIL for the entire call
+(the C-level ``crypt()`` it wraps isn't reentrant on every libc),
+so threaded servers using the ``os_crypt`` backends effectively hash
+one password at a time. this module provides the function which
+:func:`~passlib.utils.safe_crypt` uses to call the host's crypt(),
+and lets applications choose how that call is made:
+
+* ``"crypt_r"`` -- calls the reentrant ``crypt_r()`` directly via ctypes,
+  with a separate ``struct crypt_data`` buffer for each thread.
+  ctypes releases the GIL for the duration of the call,
+  so threads can hash in parallel across cores.
+
+* ``"process"`` -- runs :func:`!crypt.crypt` in a dedicated pool of worker
+  processes. calling threads release the GIL while they wait, so up to
+  *processes* hashes can run in parallel. this is meant for hosts which
+  lack ``crypt_r()``; each call pays for a round trip to the worker process.
+
+* ``"stdlib"`` -- calls :func:`!crypt.crypt` directly,
+  serializing all calls on the GIL.
+
+the default (``"auto"``) uses ``"crypt_r"`` if available,
+and ``"stdlib"`` otherwise; the process pool is never started
+unless it's explicitly requested via :func:`set_crypt_mode`.
+
+nothing is loaded when this module is imported: the default mode
+is resolved the first time it's needed (e.g. by the first :func:`host_crypt` call).
+"""
+#=============================================================================
+# imports
+#=============================================================================
+from __future__ import with_statement
+# core
+import logging; log = logging.getLogger(__name__)
+import os
+import sys
+import threading
+# site
+# pkg
+from passlib.utils.compat import PY3
+# local
+__all__ = [
+    "host_crypt",
+    "has_host_crypt",
+    "has_crypt_r",
+    "get_crypt_mode",
+    "set_crypt_mode",
+]
+
+#=============================================================================
+# stdlib crypt
+#=============================================================================
+try:
+    from crypt import crypt as _stdlib_crypt
+except ImportError: # pragma: no cover
+    _stdlib_crypt = None
+
+#=============================================================================
+# crypt_r support
+#=============================================================================
+
+# size of buffer allocated for each thread's ``struct crypt_data``.
+# this is larger than any known implementation needs
+# (libxcrypt uses 32k, older glibc releases ~128k, musl & the BSDs < 1k).
+_CRYPT_DATA_SIZE = 256 * 1024
+
+# known des_crypt hash used to sanity check crypt_r() binding.
+_TEST_SECRET = b"test"
+_TEST_HASH = b"aaqPiZY5xR5l."
+
+# names of libraries to try loading crypt_r() from, before falling back
+# to find_library() (which may run a subprocess, e.g. ``ldconfig -p``).
+# glibc & the BSDs provide crypt_r() in libcrypt, while musl includes it in libc.
+_crypt_r_libs = ("libcrypt.so.1", "libcrypt.so.2", "libcrypt.so.5", "libcrypt.so")
+
+_crypt_r = None
+
+# lock held while loading crypt_r()
+_crypt_r_lock = threading.Lock()
+
+def _iter_crypt_r_libs():
+    """yield paths of libraries which may contain crypt_r()"""
+    for path in _crypt_r_libs:
+        yield path
+    import ctypes.util
+    for name in ("crypt", "c"):
+        path = ctypes.util.find_library(name)
+        if path:
+            yield path
+
+def _load_crypt_r():
+    """return ctypes binding for crypt_r(), or ``None`` if not available"""
+    global _crypt_r
+    if _crypt_r is None:
+        with _crypt_r_lock:
+            # NOTE: _crypt_r isn't set until the search is finished,
+            #       so other threads can't see a partial result.
+            if _crypt_r is None:
+                _crypt_r = _find_crypt_r() or False
+    return _crypt_r or None
+
+def _find_crypt_r():
+    """search for working crypt_r(), returning ctypes binding or ``None``"""
+    if sys.platform.startswith("win") or sys.platform.startswith("java"):
+        return None
+    try:
+        import ctypes
+    except ImportError as err: # pragma: no cover
+        log.debug("crypt_r not available: %s", err)
+        return None
+    for path in _iter_crypt_r_libs():
+        try:
+            func = ctypes.CDLL(path, use_errno=True).crypt_r
+        except (OSError, AttributeError) as err:
+            log.debug("crypt_r not found in %r: %s", path, err)
+            continue
+        func.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p]
+        func.restype = ctypes.c_char_p
+        buf = ctypes.create_string_buffer(_CRYPT_DATA_SIZE)
+        if func(_TEST_SECRET, _TEST_HASH, buf) != _TEST_HASH:
+            log.debug("crypt_r in %r failed self-test", path)
+            continue
+        log.debug("using crypt_r from %r", path)
+        return func
+    return None
+
+def has_crypt_r():
+    """return ``True`` if ``crypt_r()`` can be used on this system"""
+    return _load_crypt_r() is not None
+
+# per-thread crypt_data buffers
+_local = threading.local()
+
+def _crypt_r_bytes(secret, config):
+    """call crypt_r() w/ bytes, returning bytes or ``None``"""
+    buf = getattr(_local, "buf", None)
+    if buf is None:
+        import ctypes
+        # NOTE: crypt_r() requires the buffer be zeroed before first use,
+        #       after that it can be reused by the same thread.
+        buf = _local.buf = ctypes.create_string_buffer(_CRYPT_DATA_SIZE)
+    return _crypt_r(secret, config, buf)
+
+if PY3:
+    def _crypt_r_native(secret, config):
+        # NOTE: this mimics stdlib crypt(), which encodes arguments as utf-8,
+        #       and decodes result using filesystem encoding.
+        result = _crypt_r_bytes(secret.encode("utf-8"), config.encode("utf-8"))
+        if result is None:
+            return None
+        return os.fsdecode(result)
+else:
+    def _crypt_r_native(secret, config):
+        return _crypt_r_bytes(secret, config)
+
+#=============================================================================
+# process pool support
+#=============================================================================
+
+# pool used by "process" mode, and pid of process which created it
+_pool = None
+_pool_pid = None
+_pool_size = None
+
+# lock held when creating / replacing pool
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """return process pool, creating it if needed (or if we've forked)"""
+    global _pool, _pool_pid
+    pool = _pool
+    if pool is not None and _pool_pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            import multiprocessing
+            # NOTE: a pool inherited across fork() doesn't have any
+            #       worker threads in the child, so it's discarded rather than closed.
+            _pool = multiprocessing.Pool(_pool_size)
+            _pool_pid = os.getpid()
+        return _pool
+
+def _close_pool():
+    """shut down process pool (if running)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        pool = _pool
+        if pool is not None and _pool_pid == os.getpid():
+            pool.terminate()
+        _pool = _pool_pid = None
+
+def _process_crypt(secret, config):
+    return _get_pool().apply(_stdlib_crypt, (secret, config))
+
+#=============================================================================
+# mode selection
+#=============================================================================
+_crypt_modes = ("auto", "crypt_r", "process", "stdlib")
+
+# currently selected mode & implementation
+# (until set_crypt_mode() has been called, _impl resolves the default mode)
+_mode = None
+_impl = None
+
+# lock held while selecting mode
+# NOTE: reentrant, since set_crypt_mode() may be called by _resolve_mode()
+_mode_lock = threading.RLock()
+
+def has_host_crypt():
+    """return ``True`` if the host provides crypt() in any form"""
+    return _stdlib_crypt is not None or has_crypt_r()
+
+def _resolve_mode():
+    """select default mode if no mode has been selected yet"""
+    if _impl is _unresolved:
+        with _mode_lock:
+            if _impl is _unresolved:
+                set_crypt_mode()
+
+def get_crypt_mode():
+    """return name of mode currently used by :func:`host_crypt`
+    (one of ``"crypt_r"``, ``"process"``, ``"stdlib"``;
+    or ``None`` if no crypt() is available)."""
+    _resolve_mode()
+    return _mode
+
+def set_crypt_mode(mode="auto", processes=None):
+    """select how :func:`host_crypt` (and thus :func:`~passlib.utils.safe_crypt`)
+    calls the host's crypt().
+
+    :param mode:
+        one of ``"auto"``, ``"crypt_r"``, ``"process"``, or ``"stdlib"``
+        (see :mod:`passlib.utils.oscrypt` for details).
+
+    :param processes:
+        number of worker processes to use for ``"process"`` mode
+        (defaults to the number of cpus).
+
+    :raises ValueError: if mode is not known.
+    :raises RuntimeError: if mode isn't available on this host.
+
+    :returns: name of mode selected.
+    """
+    if mode not in _crypt_modes:
+        raise ValueError("unknown crypt mode: %r" % (mode,))
+    if processes is not None and processes < 1:
+        raise ValueError("processes must be >= 1")
+    with _mode_lock:
+        return _set_crypt_mode(mode, processes)
+
+def _set_crypt_mode(mode, processes):
+    """set_crypt_mode() backend, called with _mode_lock held"""
+    global _mode, _impl, _pool_size
+    if mode == "auto":
+        if has_crypt_r():
+            mode = "crypt_r"
+        elif _stdlib_crypt is not None:
+            mode = "stdlib"
+        else:
+            mode = None
+    if mode == "crypt_r":
+        if not has_crypt_r():
+            raise RuntimeError("crypt_r() not available")
+        impl = _crypt_r_native
+    elif mode in ("process", "stdlib"):
+        if _stdlib_crypt is None:
+            raise RuntimeError("crypt.crypt() not available")
+        impl = _process_crypt if mode == "process" else _stdlib_crypt
+    else:
+        impl = None
+    if _mode == "process" and (mode != "process" or processes != _pool_size):
+        _close_pool()
+    _pool_size = processes
+    _mode = mode
+    _impl = impl
+    return mode
+
+def host_crypt(secret, config):
+    """call host's crypt() using the current mode.
+
+    this has the same interface as stdlib's :func:`!crypt.crypt`
+    (native strings in and out); most code should use
+    :func:`~passlib.utils.safe_crypt` instead.
+    """
+    return _impl(secret, config)
+
+def _unresolved(secret, config):
+    """placeholder for _impl, which resolves default mode on first call"""
+    _resolve_mode()
+    return _impl(secret, config)
+
+_impl = _unresolved
+
+#=============================================================================
+# eof
+#=============================================================================
@@ -19,7 +19,8 @@ except ImportError:
     _EVP = None
 #_EVP = None
 # pkg
-from passlib.exc import PasslibRuntimeWarning, ExpectedTypeError
+from passlib.exc import PasslibRuntimeWarning, ExpectedTypeError, \
+                        MissingBackendError
 from passlib.utils import join_bytes, to_native_str, bytes_to_int, int_to_bytes, join_byte_values
 from passlib.utils.compat import BytesIO, irange, int_types
 # local
@@ -35,12 +36,20 @@ __all__ = [
     # kdfs
     "pbkdf1",
     "pbkdf2",
+    "pbkdf2_many",
+
+    # pbkdf2 backends
+    "pbkdf2_backends",
+    "get_pbkdf2_backend",
+    "has_pbkdf2_backend",
+    "set_pbkdf2_backend",
 ]
 
 def _clear_caches():
-    """unittest helper -- clears get_hash_info() / get_prf() caches"""
+    """unittest helper -- clears get_hash_info() / get_prf() / pbkdf2 backend caches"""
     _ghi_cache.clear()
     _prf_cache.clear()
+    _pbkdf2_backend_cache.clear()
 
 #=============================================================================
 # hash helpers
@@ -354,9 +363,12 @@ def get_prf(name):
 # keyed prf generation
 #------------------------------------------------------------------------
 
-def _get_keyed_hmac_prf(digest, key):
-    """get_keyed_prf() helper -- returns efficent hmac() function
-    hardcoded with specific digest and key.
+def _get_hmac_states(digest, key):
+    """helper for keyed hmac functions -- normalizes key,
+    and returns digest objects which have already absorbed the inner & outer
+    padded keys. callers should only ever ``.copy()`` these objects.
+
+    :returns: ``(inner_proto, outer_proto, digest_size)``
     """
     # all the following was adapted from stdlib's hmac module
 
@@ -372,9 +384,15 @@ def _get_keyed_hmac_prf(digest, key):
     if klen < block_size:
         key += _BNULL * (block_size - klen)
 
+    return const(key.translate(_TRANS_36)), const(key.translate(_TRANS_5C)), \
+           digest_size
+
+def _get_keyed_hmac_prf(digest, key):
+    """get_keyed_prf() helper -- returns efficent hmac() function
+    hardcoded with specific digest and key.
+    """
     # return optimized hmac function for given key
-    inner_proto = const(key.translate(_TRANS_36))
-    outer_proto = const(key.translate(_TRANS_5C))
+    inner_proto, outer_proto, digest_size = _get_hmac_states(digest, key)
     def kprf(msg):
         inner = inner_proto.copy()
         inner.update(msg)
@@ -499,6 +517,11 @@ def pbkdf2(secret, salt, rounds, keylen=None, prf="hmac-sha1"):
 
     :returns:
         raw bytes of generated key
+
+    .. versionchanged:: 1.7
+
+        HMAC-based prfs are now handed off to the fastest available
+        backend for the given digest (see :func:`get_pbkdf2_backend`).
     """
     # validate secret & salt
     if not isinstance(secret, bytes):
@@ -506,14 +529,31 @@ def pbkdf2(secret, salt, rounds, keylen=None, prf="hmac-sha1"):
     if not isinstance(salt, bytes):
         raise ExpectedTypeError(salt, "bytes", "salt")
 
+    return _get_pbkdf2_calc(rounds, keylen, prf)[0](secret, salt)
+
+def _get_pbkdf2_calc(rounds, keylen, prf):
+    """helper for pbkdf2() & pbkdf2_many() -- validates all the
+    options which don't depend on the secret or salt.
+
+    :returns:
+        ``(calc, backend)`` tuple, where ``calc(secret, salt) -> key``
+        performs the actual derivation; and *backend* is the name
+        of the backend it uses (``None`` for non-hmac prfs).
+    """
     # validate rounds
     if not isinstance(rounds, int_types):
         raise ExpectedTypeError(rounds, "int", "rounds")
     if rounds < 1:
         raise ValueError("rounds must be at least 1")
 
-    # generated keyed prf helper
-    keyed_prf, digest_size = get_keyed_prf(prf, secret)
+    # resolve prf -- hmac prfs are handled by backend, everything else
+    # uses the generic builtin loop.
+    if isinstance(prf, str) and prf.startswith(_HMAC_PREFIXES):
+        digest = prf[5:]
+        digest_size = get_hash_info(digest)[1]
+    else:
+        digest = None
+        prf_func, digest_size = get_prf(prf)
 
     # validate keylen
     if keylen is None:
@@ -522,20 +562,82 @@ def pbkdf2(secret, salt, rounds, keylen=None, prf="hmac-sha1"):
         raise ExpectedTypeError(keylen, "int or None", "keylen")
     elif keylen < 0:
         raise ValueError("keylen must be at least 0")
-
-    # m2crypto's pbkdf2-hmac-sha1 is faster than ours, so use it if available.
-    # NOTE: as of 2012-4-4, m2crypto has buffer overflow issue which frequently
-    #       causes segfaults if keylen > 32 (EVP_MAX_KEY_LENGTH).
-    #       therefore we're avoiding m2crypto for large keys until that's fixed.
-    #       (https://bugzilla.osafoundation.org/show_bug.cgi?id=13052)
-    if prf == "hmac-sha1" and _EVP and keylen < 32:
-        return _EVP.pbkdf2(secret, salt, rounds, keylen)
+    elif keylen == 0:
+        return (lambda secret, salt: b''), None
 
     # work out min block count s.t. keylen <= block_count * digest_size
     block_count = (keylen + digest_size - 1) // digest_size
     if block_count >= _MAX_BLOCKS:
         raise ValueError("keylen too long for digest")
 
+    # bind backend
+    if digest is None:
+        def calc(secret, salt):
+            def keyed_prf(msg):
+                return prf_func(secret, msg)
+            return _pbkdf2_builtin_loop(keyed_prf, digest_size, salt, rounds,
+                                        keylen)
+        return calc, None
+    name, backend = _get_pbkdf2_backend(digest)
+    def calc(secret, salt):
+        return backend(secret, salt, rounds, keylen)
+    return calc, name
+
+# backends which release the GIL, allowing pbkdf2_many() to use threads.
+_pbkdf2_gil_free_backends = frozenset(["hashlib", "cryptography"])
+
+def pbkdf2_many(secrets, salts, rounds, keylen=None, prf="hmac-sha1",
+                workers=None):
+    """derive keys for a batch of secrets using PBKDF2.
+
+    This is equivalent to calling :func:`pbkdf2` for each ``(secret, salt)``
+    pair, but only looks up the prf and validates the options once.
+
+    :arg secrets: sequence of passphrases (as bytes).
+    :arg salts: sequence of salts (as bytes), one per secret.
+    :param rounds: number of rounds to use for all keys.
+    :arg keylen: number of bytes to generate for each key (see :func:`pbkdf2`).
+    :param prf: psuedo-random family to use (see :func:`pbkdf2`).
+
+    :type workers: int or None
+    :param workers:
+        If set, and the selected backend releases the GIL
+        (e.g. the ``"hashlib"`` backend), the keys will be derived
+        in parallel using this many threads.
+        Otherwise the keys are derived serially.
+
+    :returns:
+        list of raw keys, in the same order as *secrets*.
+
+    .. versionadded:: 1.7
+    """
+    secrets = list(secrets)
+    salts = list(salts)
+    if len(secrets) != len(salts):
+        raise ValueError("secrets and salts must have same length")
+    for secret in secrets:
+        if not isinstance(secret, bytes):
+            raise ExpectedTypeError(secret, "bytes", "secret")
+    for salt in salts:
+        if not isinstance(salt, bytes):
+            raise ExpectedTypeError(salt, "bytes", "salt")
+
+    calc, backend = _get_pbkdf2_calc(rounds, keylen, prf)
+    if workers and workers > 1 and len(secrets) > 1 and \
+            backend in _pbkdf2_gil_free_backends:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(lambda args: calc(*args), zip(secrets, salts))
+        finally:
+            pool.terminate()
+    return [calc(secret, salt) for secret, salt in zip(secrets, salts)]
+
+def _pbkdf2_builtin_loop(keyed_prf, digest_size, salt, rounds, keylen):
+    """pure-python pbkdf2 implementation, used by the builtin backend,
+    and for any prfs which aren't HMAC-based.
+    """
+    block_count = (keylen + digest_size - 1) // digest_size
     # build up result from blocks
     def gen():
         for i in irange(block_count):
@@ -549,6 +651,220 @@ def pbkdf2(secret, salt, rounds, keylen=None, prf="hmac-sha1"):
             yield int_to_bytes(accum, digest_size)
     return join_bytes(gen())[:keylen]
 
+#=============================================================================
+# pbkdf2 backends
+#=============================================================================
+
+# NOTE: this mirrors the HasManyBackends api used by the hash handlers,
+#       except that a backend is selected separately for each digest;
+#       since not every backend supports every digest.
+#       each backend is loaded via a ``_load_pbkdf2_backend_{name}(digest)``
+#       function, which returns ``None`` if the backend isn't available for that
+#       digest, or a function with the signature
+#       ``backend(secret, salt, rounds, keylen) -> key``.
+#       the arguments will already have been validated by pbkdf2().
+
+#: names of pbkdf2 backends, in order of preference
+pbkdf2_backends = ("hashlib", "cryptography", "m2crypto", "builtin")
+
+# cache mapping digest -> (name, backend function); filled in by _get_pbkdf2_backend()
+_pbkdf2_backend_cache = {}
+
+# mapping of digest (or None for all digests) -> backend name,
+# set by set_pbkdf2_backend()
+_pbkdf2_backend_forced = {}
+
+def _load_pbkdf2_backend_hashlib(digest):
+    """pbkdf2 backend using :func:`!hashlib.pbkdf2_hmac` (python 2.7.8+ / 3.4+)"""
+    func = getattr(hashlib, "pbkdf2_hmac", None)
+    if func is None:
+        return None
+    try:
+        func(digest, b'', b'', 1)
+    except ValueError:
+        # digest not supported (or disabled by FIPS policy)
+        return None
+    def backend(secret, salt, rounds, keylen):
+        return func(digest, secret, salt, rounds, keylen)
+    return backend
+
+def _load_pbkdf2_backend_cryptography(digest):
+    """pbkdf2 backend using the ``cryptography`` package's OpenSSL bindings"""
+    try:
+        from cryptography.exceptions import UnsupportedAlgorithm
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    except ImportError:
+        return None
+    algorithm = getattr(hashes, digest.upper(), None)
+    if algorithm is None:
+        return None
+    openssl = default_backend()
+    def backend(secret, salt, rounds, keylen):
+        return PBKDF2HMAC(algorithm(), keylen, salt, rounds,
+                          openssl).derive(secret)
+    try:
+        backend(b'', b'', 1, 1)
+    except UnsupportedAlgorithm:
+        return None
+    return backend
+
+def _load_pbkdf2_backend_m2crypto(digest):
+    """pbkdf2 backend using M2Crypto (only supports hmac-sha1)"""
+    if not _EVP or digest != "sha1":
+        return None
+    builtin = _load_pbkdf2_backend_builtin(digest)
+    def backend(secret, salt, rounds, keylen):
+        # NOTE: as of 2012-4-4, m2crypto has buffer overflow issue which frequently
+        #       causes segfaults if keylen > 32 (EVP_MAX_KEY_LENGTH).
+        #       therefore we're avoiding m2crypto for large keys until that's fixed.
+        #       (https://bugzilla.osafoundation.org/show_bug.cgi?id=13052)
+        if keylen < 32:
+            return _EVP.pbkdf2(secret, salt, rounds, keylen)
+        return builtin(secret, salt, rounds, keylen)
+    return backend
+
+def _load_pbkdf2_backend_builtin(digest):
+    """pure-python pbkdf2 backend (always available)"""
+    get_hash_info(digest)
+    def backend(secret, salt, rounds, keylen):
+        # NOTE: this is _pbkdf2_builtin_loop() with the hmac calculation
+        #       inlined: the key is only normalized once, and each round
+        #       just copies the precomputed inner & outer digest states.
+        inner_proto, outer_proto, digest_size = _get_hmac_states(digest, secret)
+        inner_copy = inner_proto.copy
+        outer_copy = outer_proto.copy
+        block_count = (keylen + digest_size - 1) // digest_size
+        def gen():
+            for i in irange(block_count):
+                inner = inner_copy()
+                inner.update(salt + pack(">L", i+1))
+                outer = outer_copy()
+                outer.update(inner.digest())
+                block = outer.digest()
+                accum = bytes_to_int(block)
+                # speed-critical loop of pbkdf2
+                for _ in irange(rounds-1):
+                    inner = inner_copy()
+                    inner.update(block)
+                    outer = outer_copy()
+                    outer.update(inner.digest())
+                    block = outer.digest()
+                    accum ^= bytes_to_int(block)
+                yield int_to_bytes(accum, digest_size)
+        return join_bytes(gen())[:keylen]
+    return backend
+
+# reference inputs used to sanity check backends against the builtin one.
+_PBKDF2_TEST_ARGS = (b'password', b'salt', 2)
+
+def _load_pbkdf2_backend(name, digest):
+    """helper used by has_pbkdf2_backend() & _get_pbkdf2_backend(),
+    loads specified backend for digest.
+
+    :raises ValueError: if invalid backend name or digest is provided
+
+    :returns:
+        * ``None`` if backend can't be loaded for digest.
+        * backend function on success.
+    """
+    if name not in pbkdf2_backends:
+        raise ValueError("unknown pbkdf2 backend: %r" % (name,))
+    digest_size = get_hash_info(digest)[1]
+    backend = globals()["_load_pbkdf2_backend_" + name](digest)
+    if backend is not None and name != "builtin":
+        # make sure output matches builtin backend (using 2 blocks)
+        keylen = digest_size + 1
+        builtin = _load_pbkdf2_backend_builtin(digest)
+        if backend(*_PBKDF2_TEST_ARGS + (keylen,)) != \
+                builtin(*_PBKDF2_TEST_ARGS + (keylen,)):
+            raise RuntimeError("%s pbkdf2 backend failed sanity check "
+                               "for %r digest" % (name, digest))
+    return backend
+
+def _get_pbkdf2_backend(digest):
+    """return ``(name, backend)`` tuple for digest (cached)
+
+    :raises MissingBackendError:
+        if a backend was forced via :func:`set_pbkdf2_backend`,
+        but isn't available for this digest.
+    """
+    try:
+        return _pbkdf2_backend_cache[digest]
+    except KeyError:
+        pass
+    forced = _pbkdf2_backend_forced.get(digest) or \
+             _pbkdf2_backend_forced.get(None)
+    for name in ((forced,) if forced else pbkdf2_backends):
+        backend = _load_pbkdf2_backend(name, digest)
+        if backend:
+            break
+    else:
+        raise MissingBackendError("pbkdf2: backend not available for "
+                                  "%r digest: %s" % (digest, forced))
+    record = _pbkdf2_backend_cache[digest] = (name, backend)
+    return record
+
+def get_pbkdf2_backend(digest="sha1"):
+    """return name of backend :func:`pbkdf2` will use for :samp:`hmac-{digest}`.
+
+    :arg digest: hashlib-compatible name of digest (defaults to ``"sha1"``).
+
+    :raises ValueError: if digest is unknown.
+    :raises passlib.exc.MissingBackendError:
+        if backend forced by :func:`set_pbkdf2_backend` isn't available.
+
+    :returns: name of backend (one of :data:`pbkdf2_backends`).
+
+    .. versionadded:: 1.7
+    """
+    return _get_pbkdf2_backend(digest)[0]
+
+def has_pbkdf2_backend(name, digest="sha1"):
+    """check if specified pbkdf2 backend is available for given digest.
+
+    :arg name: name of backend (one of :data:`pbkdf2_backends`).
+    :arg digest: hashlib-compatible name of digest (defaults to ``"sha1"``).
+
+    :raises ValueError: if backend name or digest is unknown.
+
+    :returns: ``True`` if backend is available, else ``False``.
+
+    .. versionadded:: 1.7
+    """
+    return _load_pbkdf2_backend(name, digest) is not None
+
+def set_pbkdf2_backend(name="default", digest=None):
+    """force :func:`pbkdf2` to use a specific backend.
+
+    :arg name:
+        name of backend to use (one of :data:`pbkdf2_backends`);
+        or ``"default"`` to restore automatic selection of the
+        fastest available backend.
+
+    :arg digest:
+        hashlib-compatible name of digest to set backend for.
+        if omitted, the backend will be used for all digests
+        (which don't have a backend set explicitly).
+
+    :raises ValueError: if backend name or digest is unknown.
+    :raises passlib.exc.MissingBackendError:
+        if *digest* is specified, and the backend isn't available for it.
+
+    .. versionadded:: 1.7
+    """
+    if name == "default":
+        _pbkdf2_backend_forced.pop(digest, None)
+    else:
+        if name not in pbkdf2_backends:
+            raise ValueError("unknown pbkdf2 backend: %r" % (name,))
+        if digest is not None and not has_pbkdf2_backend(name, digest):
+            raise MissingBackendError("pbkdf2: backend not available for "
+                                      "%r digest: %s" % (digest, name))
+        _pbkdf2_backend_forced[digest] = name
+    _pbkdf2_backend_cache.clear()
+
 #=============================================================================
 # eof
 #=============================================================================
@@ -0,0 +1,192 @@
+"""passlib.utils.verify_cache - bounded cache of successful verify() results
+
+this implements a small LRU / TTL cache used to skip repeated verifications
+of the same (secret, hash) pair -- e.g. when clients re-send HTTP Basic auth
+credentials with every request. it's used by :meth:`bcrypt.enable_verify_cache`,
+and the CryptContext ``verify_cache`` option.
+
+security notes:
+
+* entries are keyed by an HMAC of the secret + hash, using a random key
+  generated when the cache is created; so the plaintext is never retained,
+  and cache keys can't be precomputed or correlated with other processes.
+
+* only *successful* verifications are cached -- caching failures would let
+  clients flood the cache with garbage, evicting legitimate entries.
+
+* entries expire *ttl* seconds after they were added (hits don't extend this),
+  and are deleted once noticed to have expired.
+"""
+#=============================================================================
+# imports
+#=============================================================================
+from __future__ import with_statement
+# core
+from hashlib import sha256
+import hmac
+import threading
+try:
+    from time import monotonic as _monotonic
+except ImportError: # pragma: no cover -- py < 3.3
+    from time import time as _monotonic
+# site
+# pkg
+from passlib.utils import getrandbytes, rng
+from passlib.utils.compat import OrderedDict, unicode
+# local
+__all__ = [
+    "VerifyCache",
+]
+
+#=============================================================================
+# cache
+#=============================================================================
+class VerifyCache(object):
+    """bounded cache of successful verifications.
+
+    :param max_entries:
+        maximum number of entries to keep;
+        once exceeded, the least recently used entries are evicted.
+
+    :param ttl:
+        number of seconds an entry remains valid for.
+
+    instances are thread-safe.
+    """
+    #===================================================================
+    # instance attrs
+    #===================================================================
+
+    #: max number of entries
+    max_entries = 1024
+
+    #: seconds entries are valid for
+    ttl = 60
+
+    #: timer function used to measure ttl (overridable for testing).
+    #: this is monotonic where possible, so stepping the wall clock
+    #: backwards can't keep entries alive past their ttl.
+    _timer = staticmethod(_monotonic)
+
+    # per-instance random HMAC key
+    _key = None
+
+    # map of key -> expiration time, ordered by least recently used.
+    _entries = None
+
+    # lock guarding _entries
+    _lock = None
+
+    #: number of hits & misses since cache was created
+    hits = misses = 0
+
+    #===================================================================
+    # init
+    #===================================================================
+    def __init__(self, max_entries=None, ttl=None):
+        if max_entries is not None:
+            if max_entries < 1:
+                raise ValueError("max_entries must be >= 1")
+            self.max_entries = int(max_entries)
+        if ttl is not None:
+            if ttl <= 0:
+                raise ValueError("ttl must be > 0")
+            self.ttl = ttl
+        self._key = getrandbytes(rng, 32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<VerifyCache max_entries=%d ttl=%r size=%d>" % (
+            self.max_entries, self.ttl, len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    #===================================================================
+    # keys
+    #===================================================================
+    def digest(self, *parts):
+        """return HMAC digest of the specified strings (unicode or bytes),
+        using this cache's private key.
+        """
+        mac = hmac.new(self._key, digestmod=sha256)
+        for part in parts:
+            if isinstance(part, unicode):
+                part = part.encode("utf-8")
+            # length-prefix each part, so the boundaries are unambiguous.
+            mac.update(("%d:" % len(part)).encode("ascii"))
+            mac.update(part)
+        return mac.digest()
+
+    #===================================================================
+    # lookup & storage
+    #===================================================================
+    def check(self, key):
+        """return ``True`` if *key* is present & hasn't expired"""
+        entries = self._entries
+        with self._lock:
+            expires = entries.pop(key, None)
+            if expires is None:
+                self.misses += 1
+                return False
+            if expires <= self._timer():
+                self.misses += 1
+                return False
+            # re-insert to mark as most recently used
+            entries[key] = expires
+            self.hits += 1
+            return True
+
+    def add(self, key):
+        """add *key* to the cache, evicting old entries as needed"""
+        entries = self._entries
+        with self._lock:
+            now = self._timer()
+            entries.pop(key, None)
+            entries[key] = now + self.ttl
+            # evict least recently used entries which are over quota,
+            # or which have expired. NOTE: hits move entries to the back
+            # without extending their expiry, so this only catches expired
+            # entries at the front; any others are removed when they're
+            # next looked up (or by purge()), and never count as hits.
+            max_entries = self.max_entries
+            while entries:
+                first = next(iter(entries))
+                if len(entries) <= max_entries and entries[first] > now:
+                    break
+                del entries[first]
+
+    def discard(self, key):
+        """remove *key* from the cache, if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_matching(self, func):
+        """remove all keys for which ``func(key)`` returns true"""
+        with self._lock:
+            entries = self._entries
+            for key in [key for key in entries if func(key)]:
+                del entries[key]
+
+    def purge(self):
+        """remove all expired entries"""
+        with self._lock:
+            now = self._timer()
+            entries = self._entries
+            for key in [key for key, expires in entries.items()
+                        if expires <= now]:
+                del entries[key]
+
+    def clear(self):
+        """remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    #===================================================================
+    # eoc
+    #===================================================================
+
+#=============================================================================
+# eof
+#=============================================================================